@@ -0,0 +1,70 @@
+"""
+Benchmark CountryRecord (array-backed, interned commodities) against the nested dicts it replaced.
+
+Reports Python heap per country (tracemalloc; the memory-mapped arrays live in the page
+cache and are shared between workers) and the cost of the lookups the app makes.
+
+Run from the repo root: python -m adhoc.benchmark_country_records
+"""
+import gc
+import json
+import timeit
+import tracemalloc
+
+from app.config.config import Config
+from app.services.processed_data_store import ProcessedDataStore
+from app.services.trade_data_loader import TradeDataLoader
+
+
+def measure_heap(build):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return result, used
+
+
+def main():
+    loader = TradeDataLoader(Config.TRADE_DATA_PATH, Config.COUNTRY_METADATA_PATH)
+    if not loader.is_processed_data_current(Config.PROCESSED_DATA_PATH):
+        loader.load_data()
+        loader.save_processed_data(Config.PROCESSED_DATA_PATH)
+    serialized = json.dumps(dict(ProcessedDataStore(Config.PROCESSED_DATA_PATH)), default=dict)
+
+    dicts, dict_bytes = measure_heap(lambda: json.loads(serialized))
+    store, record_bytes = measure_heap(lambda: ProcessedDataStore(Config.PROCESSED_DATA_PATH))
+    mapped = sum(array.nbytes for array in store.arrays.values())
+
+    countries = len(store)
+    entries = len(store.arrays['commodity_ids'])
+    print(f"{countries} countries, {entries} country/commodity entries, {len(store.commodities)} commodities")
+    print(f"nested dicts:   {dict_bytes / countries / 1024:8.1f} KiB/country heap")
+    print(f"CountryRecord:  {record_bytes / countries / 1024:8.1f} KiB/country heap "
+          f"(+ {mapped / countries / 1024:.1f} KiB/country of shared mapped arrays)")
+
+    name = 'France'
+    commodity = next(iter(dicts[name]['exports']))
+    record = store[name]
+    record.positions()
+
+    cases = {
+        "data['coordinates']['lat']": lambda data: data['coordinates']['lat'],
+        "data['exports'][commodity]": lambda data: data['exports'][commodity],
+        "data['top_exports']": lambda data: data['top_exports'],
+        "data['exports'].items()": lambda data: list(data['exports'].items()),
+        "data.get('iso')": lambda data: data.get('iso'),
+    }
+    print(f"\n{'access':<30} {'dict':>10} {'record':>10}")
+    for label, case in cases.items():
+        timings = []
+        for data in (dicts[name], record):
+            number, total = timeit.Timer(lambda: case(data)).autorange()
+            timings.append(total / number * 1e6)
+        print(f"{label:<30} {timings[0]:>8.2f}us {timings[1]:>8.2f}us")
+
+
+if __name__ == '__main__':
+    main()
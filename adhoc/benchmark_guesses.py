@@ -0,0 +1,80 @@
+"""
+Benchmark guess evaluation: per-request haversine/direction (legacy) vs GuessMatrix lookups.
+
+Run from the repo root: python -m adhoc.benchmark_guesses
+"""
+import random
+import time
+from math import radians, cos, sin, asin, sqrt
+
+from app.services.trade_data_loader import TradeDataLoader
+from app.services.guess_matrix import GuessMatrix
+from app.config.config import Config
+
+
+def legacy_compare(countries_data, guess, target):
+    """The original TradleGame.check_guess computation"""
+    guess_data = countries_data[guess]
+    target_data = countries_data[target]
+
+    lat1, lon1 = guess_data['coordinates']['lat'], guess_data['coordinates']['lng']
+    lat2, lon2 = target_data['coordinates']['lat'], target_data['coordinates']['lng']
+
+    rlat1, rlon1, rlat2, rlon2 = map(radians, [lat1, lon1, lat2, lon2])
+    a = sin((rlat2 - rlat1) / 2) ** 2 + cos(rlat1) * cos(rlat2) * sin((rlon2 - rlon1) / 2) ** 2
+    distance = 2 * asin(sqrt(a)) * 6371
+
+    lat_diff, lon_diff = lat2 - lat1, lon2 - lon1
+    if abs(lat_diff) < 0.001 and abs(lon_diff) < 0.001:
+        direction = "same"
+    else:
+        direction = ("N" if lat_diff > 0 else "S" if lat_diff < 0 else "") + \
+                    ("E" if lon_diff > 0 else "W" if lon_diff < 0 else "")
+
+    common_exports = set(guess_data.get('top_exports', [])) & set(target_data.get('top_exports', []))
+
+    return {
+        'distance': int(round(distance)),
+        'direction': direction,
+        'common_exports': list(common_exports),
+        'region_match': guess_data.get('region', '') == target_data.get('region', ''),
+        'subregion_match': guess_data.get('subregion', '') == target_data.get('subregion', '')
+    }
+
+
+def main(n_guesses=200000):
+    loader = TradeDataLoader(Config.TRADE_DATA_PATH, Config.COUNTRY_METADATA_PATH)
+    loader.load_data()
+    countries_data = loader.countries_data
+    countries = list(countries_data)
+
+    start = time.perf_counter()
+    matrix = GuessMatrix(countries_data)
+    print(f"GuessMatrix build for {len(countries)} countries: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    # Every pair must give the same feedback as the legacy computation
+    for guess in countries:
+        for target in countries:
+            old, new = legacy_compare(countries_data, guess, target), matrix.compare(guess, target)
+            assert set(old.pop('common_exports')) == set(new.pop('common_exports')), (guess, target)
+            # Trade proximity has no legacy counterpart
+            new.pop('trade_proximity')
+            assert old == new, (guess, target, old, new)
+    print("All pairs match the legacy computation")
+
+    rng = random.Random(0)
+    pairs = [(rng.choice(countries), rng.choice(countries)) for _ in range(n_guesses)]
+
+    for label, compare in (
+        ('legacy', lambda g, t: legacy_compare(countries_data, g, t)),
+        ('matrix', matrix.compare),
+    ):
+        start = time.perf_counter()
+        for guess, target in pairs:
+            compare(guess, target)
+        elapsed = time.perf_counter() - start
+        print(f"{label}: {n_guesses / elapsed:,.0f} guesses/sec")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Scaling of partitioned ingest with the number of worker processes.
+
+Writes a directory of synthetic Comtrade partitions (the bundled CSV with jittered values,
+one file per simulated year) and loads it with 1, 2, 4 and 8 workers, checking every run
+produces the same countries_data.
+
+Run from the repo root: python -m adhoc.benchmark_parallel_ingest --partitions 16 --copies 20
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.config.config import Config
+from app.services.trade_data_loader import TradeDataLoader
+
+
+def build_partitions(directory, partitions, copies, seed=0):
+    """partitions files of copies x the bundled CSV each"""
+    base = pd.read_csv(Config.TRADE_DATA_PATH, encoding_errors='ignore')
+    rng = np.random.default_rng(seed)
+    for p in range(partitions):
+        frame = pd.concat([base] * copies, ignore_index=True)
+        frame['refYear'] = base['refYear'].iloc[0] - p
+        jitter = rng.uniform(0.5, 1.5, len(frame))
+        frame['fobvalue'] = (frame['fobvalue'] * jitter).round(2)
+        frame['primaryValue'] = (frame['primaryValue'] * jitter).round(2)
+        frame.to_csv(os.path.join(directory, f'comtrade_{p:03d}.csv'), index=False)
+    return partitions * copies * len(base)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--partitions', type=int, default=16)
+    parser.add_argument('--copies', type=int, default=20, help="Repetitions of the bundled CSV per partition")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    print(f"CPUs available: {len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()}")
+    with tempfile.TemporaryDirectory() as directory:
+        rows = build_partitions(directory, args.partitions, args.copies)
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)) / 2 ** 20
+        print(f"{args.partitions} partitions, {rows} rows, {size:.0f}MB")
+
+        reference = None
+        baseline = None
+        for workers in args.workers:
+            loader = TradeDataLoader(directory, Config.COUNTRY_METADATA_PATH, workers=workers)
+            start = time.perf_counter()
+            loader.load_data()
+            elapsed = time.perf_counter() - start
+
+            output = json.dumps(loader.countries_data)
+            reference = reference or output
+            baseline = baseline or elapsed
+            print(f"{workers:>2} workers {elapsed:>7.2f}s  speedup {baseline / elapsed:>4.2f}x  "
+                  f"identical {output == reference}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Compare peak memory and time of the vectorized and streaming ingest engines on large CSVs.
+
+Builds synthetic Comtrade extracts by repeating the bundled CSV (one copy per simulated
+year, with jittered values), then loads each with both engines in a fresh process and
+reports wall time and peak RSS.
+
+Run from the repo root: python -m adhoc.benchmark_streaming_ingest --copies 10 100 400
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.config.config import Config
+from app.services.trade_data_loader import TradeDataLoader
+
+
+def build_csv(path, copies, seed=0):
+    base = pd.read_csv(Config.TRADE_DATA_PATH, encoding_errors='ignore')
+    rng = np.random.default_rng(seed)
+    with open(path, 'w') as f:
+        for i in range(copies):
+            chunk = base.copy()
+            chunk['refYear'] = base['refYear'] - i
+            jitter = rng.uniform(0.5, 1.5, len(base))
+            chunk['fobvalue'] = (base['fobvalue'] * jitter).round(2)
+            chunk['primaryValue'] = (base['primaryValue'] * jitter).round(2)
+            chunk.to_csv(f, header=(i == 0), index=False)
+
+
+def run_engine(csv_path, engine, chunk_size):
+    """Load once in this process and print 'seconds peak_kib'"""
+    loader = TradeDataLoader(csv_path, Config.COUNTRY_METADATA_PATH, engine=engine, chunk_size=chunk_size)
+    start = time.perf_counter()
+    loader.load_data()
+    elapsed = time.perf_counter() - start
+    print(f"{elapsed} {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}")
+
+
+def measure(csv_path, engine, chunk_size):
+    output = subprocess.run(
+        [sys.executable, '-m', 'adhoc.benchmark_streaming_ingest', '--run', csv_path, engine, str(chunk_size)],
+        check=True, capture_output=True, text=True
+    ).stdout.split()
+    return float(output[-2]), int(output[-1]) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--copies', type=int, nargs='+', default=[10, 100, 400], help="Repetitions of the bundled CSV")
+    parser.add_argument('--chunk-size', type=int, default=250000)
+    parser.add_argument('--run', nargs=3, metavar=('CSV', 'ENGINE', 'CHUNK_SIZE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_engine(args.run[0], args.run[1], int(args.run[2]))
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'rows':>10} {'file':>9} {'engine':>11} {'time':>8} {'peak RSS':>10}")
+        for copies in args.copies:
+            path = os.path.join(directory, f'trade_{copies}.csv')
+            build_csv(path, copies)
+            rows = sum(1 for _ in open(path, 'rb')) - 1
+            size = os.path.getsize(path) / 2 ** 20
+            for engine in ('vectorized', 'streaming'):
+                elapsed, peak = measure(path, engine, args.chunk_size)
+                print(f"{rows:>10} {size:>7.0f}MB {engine:>11} {elapsed:>7.2f}s {peak:>8.0f}MB")
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark the export-profile similarity matrices behind a guess's trade proximity.
+
+Times the full N x N cosine and weighted Jaccard computation on the bundled data and on
+synthetic profiles at HS4-like width, and the per-guess lookup in a built GuessMatrix.
+
+Run from the repo root: python -m adhoc.benchmark_trade_similarity --countries 250 --commodities 1250
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from app.config.config import Config
+from app.services.guess_matrix import GuessMatrix
+from app.services.trade_data_loader import TradeDataLoader
+from app.services.trade_similarity import SIMILARITY_METRICS, export_profile_matrix
+
+
+def best_of(function, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def synthetic_profiles(countries, commodities, exported=200, seed=0):
+    """Each country exports a random subset of commodities with skewed shares"""
+    rng = np.random.default_rng(seed)
+    profiles = np.zeros((countries, commodities))
+    for row in profiles:
+        columns = rng.choice(commodities, size=min(exported, commodities), replace=False)
+        row[columns] = rng.pareto(1.2, len(columns))
+    return profiles / profiles.sum(axis=1, keepdims=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--countries', type=int, default=250, help="Synthetic matrix rows")
+    parser.add_argument('--commodities', type=int, default=1250, help="Synthetic matrix columns")
+    parser.add_argument('--guesses', type=int, default=200000, help="Lookups for the per-guess timing")
+    args = parser.parse_args()
+
+    loader = TradeDataLoader(Config.TRADE_DATA_PATH, Config.COUNTRY_METADATA_PATH)
+    loader.load_data()
+    countries_data = loader.countries_data
+    countries = list(countries_data)
+
+    profiles, commodities = export_profile_matrix(countries_data, countries)
+    print(f"bundled profiles: {profiles.shape[0]} x {profiles.shape[1]}, "
+          f"build {best_of(lambda: export_profile_matrix(countries_data, countries)) * 1000:.1f} ms")
+
+    synthetic = synthetic_profiles(args.countries, args.commodities)
+    for name, metric in SIMILARITY_METRICS.items():
+        print(f"{name:<17} bundled {best_of(lambda: metric(profiles)) * 1000:8.2f} ms   "
+              f"synthetic {args.countries}x{args.commodities} {best_of(lambda: metric(synthetic), 3) * 1000:8.2f} ms")
+
+    matrix = GuessMatrix(countries_data)
+    pairs = [(random.choice(countries), random.choice(countries)) for _ in range(args.guesses)]
+    start = time.perf_counter()
+    for guess, target in pairs:
+        matrix.compare(guess, target)
+    elapsed = time.perf_counter() - start
+    print(f"GuessMatrix.compare: {elapsed / args.guesses * 1e6:.2f} us per guess")
+
+
+if __name__ == '__main__':
+    main()
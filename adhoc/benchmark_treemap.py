@@ -0,0 +1,83 @@
+"""
+Benchmark treemap rendering: plotly.express figure + PlotlyJSONEncoder vs the direct JSON generator.
+
+Times every country's treemap on the bundled data both ways and reports the mean per
+country and the payload size; the generator is also timed in 'hs' mode.
+
+Run from the repo root: python -m adhoc.benchmark_treemap --threshold 1
+"""
+import argparse
+import json
+import time
+
+import pandas
+import plotly
+import plotly.express
+
+from app.config.config import Config
+from app.services.trade_data_loader import TradeDataLoader
+from app.services.treemap_payload import treemap_json
+
+
+def express_treemap(country_data):
+    """The original TradeTreemap figure and serialization"""
+    commodities, values, percentages = [], [], []
+    for commodity_name in country_data['exports'].keys():
+        commodities.append(commodity_name)
+        values.append(country_data['exports'].get(commodity_name, 0))
+        percentages.append(country_data['export_percentages'].get(commodity_name, 0))
+    df = pandas.DataFrame({'commodity': commodities, 'value': values, 'percentage': percentages})
+
+    fig = plotly.express.treemap(
+        df,
+        path=['commodity'],
+        values='value',
+        color='percentage',
+        color_continuous_scale='viridis_r',
+        hover_data=['percentage']
+    )
+    fig.update_layout(margin=dict(t=50, l=25, r=25, b=25), font=dict(size=14))
+
+    data_json = json.dumps(fig.data, cls=plotly.utils.PlotlyJSONEncoder)
+    layout_json = json.dumps(fig.layout, cls=plotly.utils.PlotlyJSONEncoder)
+    return data_json, layout_json
+
+
+def measure(render, countries_data):
+    """Mean seconds and payload bytes per country"""
+    total_bytes = 0
+    start = time.perf_counter()
+    for data in countries_data.values():
+        data_json, layout_json = render(data)
+        total_bytes += len(data_json) + len(layout_json)
+    elapsed = time.perf_counter() - start
+    return elapsed / len(countries_data), total_bytes / len(countries_data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threshold', type=float, default=1.0, help='"Other" threshold (%%) for the hs mode')
+    args = parser.parse_args()
+
+    loader = TradeDataLoader(Config.TRADE_DATA_PATH, Config.COUNTRY_METADATA_PATH)
+    loader.load_data()
+    countries_data = {name: data for name, data in loader.countries_data.items() if data['total_exports'] > 0}
+    codes = loader.commodity_codes
+
+    # Warm up plotly's lazy imports and validators
+    express_treemap(next(iter(countries_data.values())))
+
+    cases = {
+        'express': express_treemap,
+        'generator flat': treemap_json,
+        'generator hs': lambda data: treemap_json(data, 'hs', 0, codes),
+        f'generator hs {args.threshold:g}%': lambda data: treemap_json(data, 'hs', args.threshold, codes)
+    }
+    print(f"{len(countries_data)} countries")
+    for name, render in cases.items():
+        seconds, size = measure(render, countries_data)
+        print(f"{name:<20} {seconds * 1000:8.2f} ms/country  {size / 1024:6.1f} KiB")
+
+
+if __name__ == '__main__':
+    main()
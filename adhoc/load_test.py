@@ -0,0 +1,174 @@
+"""
+Load test the hot API endpoints: GET /api/countries and POST /api/guess.
+
+Opens N keep-alive HTTP/1.1 connections and sends requests back to back on each for a
+fixed duration, then reports requests/s and p50/p99 latency per endpoint. With --spawn it
+starts the WSGI server (gunicorn, threaded workers) and the ASGI server (uvicorn) itself
+so both are measured with the same worker count.
+
+Run from the repo root:
+    python -m adhoc.load_test --spawn --workers 2 --concurrency 64
+    python -m adhoc.load_test --url http://127.0.0.1:8000 --concurrency 64
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+GUESSES = ['France', 'Germany', 'Japan', 'Brazil', 'Kenya', 'Canada']
+
+
+def build_requests(host):
+    """Raw request bytes for each endpoint; guesses start a new session each time"""
+    countries = (f"GET /api/countries HTTP/1.1\r\nHost: {host}\r\n"
+                 f"Accept-Encoding: gzip\r\n\r\n").encode('ascii')
+    guesses = []
+    for guess in GUESSES:
+        body = json.dumps({'guess': guess}).encode('utf-8')
+        guesses.append((f"POST /api/guess HTTP/1.1\r\nHost: {host}\r\n"
+                        f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n").encode('ascii') + body)
+    return {'countries': [countries], 'guess': guesses}
+
+
+async def read_response(reader):
+    """Read one response, returning its status code"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Connection closed")
+    status = int(status_line.split()[1])
+
+    length, chunked = 0, False
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name = name.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'transfer-encoding' and 'chunked' in value.lower():
+            chunked = True
+
+    if chunked:
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif length:
+        await reader.readexactly(length)
+    return status
+
+
+async def worker(host, port, requests, deadline, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    i = 0
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            writer.write(requests[i % len(requests)])
+            i += 1
+            status = await read_response(reader)
+            if status >= 400:
+                errors.append(status)
+            latencies.append(time.perf_counter() - start)
+    except (ConnectionError, asyncio.IncompleteReadError) as e:
+        errors.append(str(e))
+    finally:
+        writer.close()
+
+
+async def run_endpoint(url, requests, concurrency, duration):
+    parts = urlsplit(url)
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        worker(parts.hostname, parts.port or 80, requests, deadline, latencies, errors)
+        for _ in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else None,
+        'p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else None,
+        'errors': len(errors)
+    }
+
+
+def run_all(url, concurrency, duration):
+    requests = build_requests(urlsplit(url).netloc)
+    results = {}
+    for name, endpoint_requests in requests.items():
+        results[name] = asyncio.run(run_endpoint(url, endpoint_requests, concurrency, duration))
+    return results
+
+
+def print_results(label, results):
+    for name, r in results.items():
+        print(f"{label:<6} {name:<10} {r['rps']:>9.0f} req/s  p50 {r['p50_ms']:>7.2f} ms  "
+              f"p99 {r['p99_ms']:>7.2f} ms  errors {r['errors']}")
+
+
+def wait_for_server(url, timeout=60):
+    parts = urlsplit(url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            asyncio.run(asyncio.wait_for(asyncio.open_connection(parts.hostname, parts.port), 1))
+            return
+        except (OSError, asyncio.TimeoutError):
+            time.sleep(0.5)
+    raise RuntimeError(f"Server at {url} did not start")
+
+
+def spawn_servers(workers, threads, wsgi_port, asgi_port):
+    env = dict(os.environ, PYTHONUNBUFFERED='1')
+    commands = {
+        'wsgi': [sys.executable, '-m', 'gunicorn', '-k', 'gthread', '-w', str(workers), '--threads', str(threads),
+                 '-b', f'127.0.0.1:{wsgi_port}', '--log-level', 'warning', 'run:app'],
+        'asgi': [sys.executable, '-m', 'uvicorn', '--workers', str(workers), '--port', str(asgi_port),
+                 '--log-level', 'warning', '--no-access-log', 'asgi:app'],
+    }
+    return {name: subprocess.Popen(command, env=env) for name, command in commands.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help="Server to test (ignored with --spawn)")
+    parser.add_argument('--spawn', action='store_true', help="Start and compare the WSGI and ASGI servers")
+    parser.add_argument('--workers', type=int, default=2, help="Server worker processes with --spawn")
+    parser.add_argument('--threads', type=int, default=8, help="Threads per gunicorn worker with --spawn")
+    parser.add_argument('--concurrency', type=int, default=64, help="Concurrent keep-alive connections")
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds per endpoint")
+    args = parser.parse_args()
+
+    if not args.spawn:
+        if not args.url:
+            parser.error("--url or --spawn is required")
+        print_results('server', run_all(args.url, args.concurrency, args.duration))
+        return
+
+    urls = {'wsgi': 'http://127.0.0.1:8101', 'asgi': 'http://127.0.0.1:8102'}
+    servers = spawn_servers(args.workers, args.threads, 8101, 8102)
+    try:
+        for name, url in urls.items():
+            wait_for_server(url)
+        for name, url in urls.items():
+            print_results(name, run_all(url, args.concurrency, args.duration))
+    finally:
+        for server in servers.values():
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
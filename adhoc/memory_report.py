@@ -0,0 +1,123 @@
+"""
+Report per-worker memory of a gunicorn deployment with and without pre-fork preloading.
+
+Prebuilds the next puzzles, then for each worker count starts gunicorn (gunicorn.conf.py) once with GUNICORN_PRELOAD=false,
+where every worker builds the app itself, and once with preloading, where workers inherit
+the master's frozen state. After exercising the API it reads /proc/<pid>/smaps_rollup of
+every worker: RSS (resident), USS (private to the worker) and PSS (proportional share).
+
+Linux only. Run from the repo root: python -m adhoc.memory_report --workers 8 32
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import json
+import urllib.request
+
+
+def read_smaps(pid):
+    """Rss, Pss and Uss of a process in kB"""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            name, _, rest = line.partition(':')
+            if rest.strip().endswith('kB'):
+                values[name] = int(rest.split()[0])
+    return {
+        'rss': values['Rss'],
+        'pss': values['Pss'],
+        'uss': values['Private_Clean'] + values['Private_Dirty']
+    }
+
+
+def worker_pids(master_pid):
+    with open(f'/proc/{master_pid}/task/{master_pid}/children') as f:
+        return [int(pid) for pid in f.read().split()]
+
+
+def exercise(url, requests):
+    """Hit the page and the hot API endpoints so workers touch the shared data"""
+    for i in range(requests):
+        urllib.request.urlopen(f'{url}/api/countries').read()
+        urllib.request.urlopen(f'{url}/api/countries/search?q=ger').read()
+        body = json.dumps({'guess': 'Germany'}).encode('utf-8')
+        request = urllib.request.Request(f'{url}/api/guess', body, {'Content-Type': 'application/json'})
+        urllib.request.urlopen(request).read()
+        if i % 4 == 0:
+            urllib.request.urlopen(f'{url}/').read()
+
+
+def wait_until_up(url, process, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("gunicorn exited")
+        try:
+            urllib.request.urlopen(f'{url}/api/countries', timeout=5).read()
+            return
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError("gunicorn did not start")
+
+
+def wait_until_settled(pids, interval=2.0, tolerance=0.01):
+    """Wait for workers still loading the app: until total USS stops growing"""
+    previous = None
+    while True:
+        total = sum(read_smaps(pid)['uss'] for pid in pids)
+        if previous is not None and abs(total - previous) <= tolerance * previous:
+            return
+        previous = total
+        time.sleep(interval)
+
+
+def measure(workers, preload, port, requests):
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), BIND=f'127.0.0.1:{port}',
+               GUNICORN_PRELOAD='true' if preload else 'false', GUNICORN_THREADS='2')
+    # Workers booting the app on their own can take longer than gunicorn's default timeout
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--log-level', 'warning',
+                                '--timeout', '600'],
+                               env=env)
+    url = f'http://127.0.0.1:{port}'
+    try:
+        wait_until_up(url, process, timeout=60 + 5 * workers)
+        while len(worker_pids(process.pid)) < workers:
+            time.sleep(0.5)
+        pids = worker_pids(process.pid)
+        wait_until_settled(pids)
+        exercise(url, requests * workers)
+        time.sleep(1)
+        master = read_smaps(process.pid)
+        samples = [read_smaps(pid) for pid in pids]
+    finally:
+        process.terminate()
+        process.wait()
+
+    mean = {key: sum(s[key] for s in samples) / len(samples) / 1024 for key in ('rss', 'uss', 'pss')}
+    total = (sum(s['pss'] for s in samples) + master['pss']) / 1024
+    return mean, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[8, 32], help="Worker counts to measure")
+    parser.add_argument('--requests', type=int, default=5, help="Request rounds per worker before measuring")
+    parser.add_argument('--port', type=int, default=8111)
+    args = parser.parse_args()
+
+    # Workers should load today's treemap rather than each render it
+    subprocess.run([sys.executable, '-m', 'flask', 'build-puzzles', '--days', '2', '--no-png'],
+                   env=dict(os.environ, FLASK_APP='run.py'), check=True)
+
+    print(f"{'workers':>7} {'preload':>8} {'RSS/worker':>11} {'USS/worker':>11} {'PSS/worker':>11} {'total PSS':>10}")
+    for workers in args.workers:
+        for preload in (False, True):
+            mean, total = measure(workers, preload, args.port, args.requests)
+            print(f"{workers:>7} {str(preload):>8} {mean['rss']:>9.1f}MB {mean['uss']:>9.1f}MB "
+                  f"{mean['pss']:>9.1f}MB {total:>8.0f}MB")
+
+
+if __name__ == '__main__':
+    main()
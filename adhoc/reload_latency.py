@@ -0,0 +1,61 @@
+"""
+Request latency while the data snapshot is being reloaded.
+
+Runs the app in-process with threads sending guesses and searches back to back, triggers
+a number of snapshot reloads while they run, and prints the app's own snapshot stats:
+reload durations and p50/p99 latency of requests that overlapped a reload versus the rest.
+Prebuild today's puzzle first (flask build-puzzles --days 1) so reloads don't include a
+treemap render.
+
+Run from the repo root: python -m adhoc.reload_latency --threads 8 --reloads 5
+"""
+import argparse
+import json
+import threading
+import time
+
+from app import create_app
+
+QUERIES = ['fra', 'ger', 'jap', 'bra', 'ken', 'can']
+
+
+def client_loop(app, deadline, errors):
+    client = app.test_client()
+    i = 0
+    while time.monotonic() < deadline:
+        if i % 2:
+            response = client.get(f'/api/countries/search?q={QUERIES[i % len(QUERIES)]}')
+        else:
+            response = client.post('/api/guess', json={'guess': 'France'})
+        if response.status_code >= 500:
+            errors.append(response.status_code)
+        i += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8, help="Concurrent client threads")
+    parser.add_argument('--reloads', type=int, default=5, help="Snapshot reloads to trigger")
+    parser.add_argument('--interval', type=float, default=2.0, help="Seconds between reloads")
+    args = parser.parse_args()
+
+    app = create_app()
+    deadline = time.monotonic() + args.interval * (args.reloads + 1)
+    errors = []
+    clients = [threading.Thread(target=client_loop, args=(app, deadline, errors)) for _ in range(args.threads)]
+    for client in clients:
+        client.start()
+
+    for _ in range(args.reloads):
+        time.sleep(args.interval)
+        app.snapshots.reload()
+
+    for client in clients:
+        client.join()
+
+    print(json.dumps(app.snapshots.stats(), indent=2))
+    print(f"server errors: {len(errors)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,7 @@
 # __init__.py
-from flask import Flask
+import os
+import atexit
+from flask import Flask, g
 
 def create_app(config_name='default'):
     app = Flask(__name__)
@@ -14,13 +16,86 @@ def create_app(config_name='default'):
     app.register_blueprint(api_bp)
     app.register_blueprint(views_bp)
     
+    # Register CLI commands
+    from app.commands import apply_delta_command, build_puzzles_command
+    app.cli.add_command(build_puzzles_command)
+    app.cli.add_command(apply_delta_command)
+    
     # Initialize data
+    from app.services.progress_store import create_progress_store
+    from app.services.share_images import ShareImageCache
+    from app.services.snapshot import SnapshotManager
+
+    app.progress_store = create_progress_store(app.config)
+    if app.progress_store is not None:
+        atexit.register(app.progress_store.close)
+    
+    # Shared by every snapshot: images are addressed by content, not by data version
+    width, height = app.config['SHARE_IMAGE_SIZE']
+    app.share_images = ShareImageCache(
+        app.config['SHARE_IMAGE_CACHE_PATH'],
+        max_bytes=app.config['SHARE_IMAGE_CACHE_MAX_BYTES'],
+        width=width,
+        height=height
+    )
+    
+    # Requests read the data through the current snapshot, which is replaced when new data is published
+    app.snapshots = SnapshotManager(
+        app,
+        build_game_state,
+        check_interval=app.config['DATA_RELOAD_CHECK_INTERVAL'],
+        reload_signal=app.config['DATA_RELOAD_SIGNAL']
+    )
+    
+    @app.before_request
+    def start_request_timer():
+        g.request_timer = app.snapshots.request_started()
+    
+    @app.teardown_request
+    def record_request_latency(exception=None):
+        if 'request_timer' in g:
+            app.snapshots.request_finished(g.request_timer)
+    
+    return app
+
+def build_game_state(app, reload=False):
+    """Load the trade data and build the game and daily puzzles on it (reload: see TradeData.init_app)"""
     from app.models.trade_data import TradeData
     from app.services.game_logic import TradleGame
-    from app.services.trade_charts import TradeTreemap
+    from app.services.puzzle_artifacts import PuzzleArtifactStore
+    from app.services.daily_puzzle import DailyPuzzleProvider
 
-    app.trade_data = TradeData(app)
-    app.game = TradleGame(app.trade_data, app.config['MAX_GUESSES'])
-    app.treemap = TradeTreemap(app.trade_data, app.game)
-    
-    return app
\ No newline at end of file
+    trade_data = TradeData(app, reload=reload)
+    game = TradleGame(
+        trade_data,
+        app.config['MAX_GUESSES'],
+        app.config['SECRET_KEY'],
+        progress_store=app.progress_store,
+        year=app.config['PUZZLE_YEAR'],
+        flow=app.config['PUZZLE_FLOW'],
+        similarity=app.config['TRADE_PROXIMITY_METRIC']
+    )
+    # Puzzles for another year or flow have other targets, and other treemap modes other
+    # treemaps, so keep their artifacts apart
+    artifacts_path = app.config['PUZZLE_ARTIFACTS_PATH']
+    if game.puzzle_mode:
+        artifacts_path = os.path.join(artifacts_path, game.puzzle_mode)
+    treemap_mode = app.config['TREEMAP_MODE']
+    if treemap_mode != 'flat':
+        other_threshold = app.config['TREEMAP_OTHER_THRESHOLD']
+        artifacts_path = os.path.join(
+            artifacts_path, f"treemap-{treemap_mode}" + (f"-other{other_threshold:g}" if other_threshold else '')
+        )
+    puzzle_artifacts = PuzzleArtifactStore(artifacts_path)
+    puzzles = DailyPuzzleProvider(
+        trade_data,
+        game,
+        artifacts=puzzle_artifacts,
+        daily_reset=app.config['DAILY_RESET'],
+        reset_time=app.config['DAILY_RESET_TIME'],
+        prepare_ahead=app.config['DAILY_PREPARE_AHEAD'],
+        treemap_mode=treemap_mode,
+        treemap_other_threshold=app.config['TREEMAP_OTHER_THRESHOLD']
+    )
+    game.use_puzzle_provider(puzzles)
+    return trade_data, game, puzzle_artifacts, puzzles
\ No newline at end of file
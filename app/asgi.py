@@ -0,0 +1,100 @@
+# app/asgi.py
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Mount, Route
+
+from app import create_app
+from app.routes.responses import guess_error_body, payload_response_parts
+
+
+def create_asgi_app(config_name='default', wsgi_workers=10):
+    """
+    Build an ASGI app around the Flask app
+
+    The hot read/guess endpoints of the api blueprint are served by native async Starlette
+    handlers that share the Flask app's data snapshots (TradeData, TradleGame and puzzle
+    provider); every other route (the page, stats, static files) is passed through to
+    Flask unchanged.
+
+    Args:
+        config_name: Key into config_by_name, as for create_app
+        wsgi_workers: Threads used to run the mounted Flask app
+    """
+    flask_app = create_app(config_name)
+    snapshots = flask_app.snapshots
+
+    def timed(handler):
+        """Record a native handler's latency with the snapshot stats, as Flask's request hooks do"""
+        async def wrapper(request):
+            token = snapshots.request_started()
+            try:
+                return await handler(request)
+            finally:
+                snapshots.request_finished(token)
+        wrapper.__doc__ = handler.__doc__
+        return wrapper
+
+    def payload_response(request, payload, max_age, immutable=False):
+        status, body, headers = payload_response_parts(payload, request.headers, max_age, immutable=immutable)
+        return Response(body, status_code=status, headers=headers)
+
+    async def get_countries(request):
+        """Get list of all countries for autocomplete"""
+        return payload_response(
+            request,
+            snapshots.current().trade_data.get_countries_payload(),
+            flask_app.config['COUNTRIES_CACHE_MAX_AGE']
+        )
+
+    async def search_countries(request):
+        """Search countries by name prefix, ISO code or alias, tolerating typos"""
+        query = request.query_params.get('q', '')
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), 50)
+        except ValueError:
+            limit = 10
+
+        return JSONResponse(snapshots.current().trade_data.get_search_index().search(query, limit))
+
+    async def get_puzzle_treemap(request):
+        """Treemap data and layout for a puzzle; immutable, so browsers and CDNs can keep it"""
+        game_number = request.path_params['game_number']
+
+        puzzle = snapshots.current().puzzles.get_puzzle(game_number)
+        if puzzle is None:
+            return JSONResponse({'error': f'Unknown puzzle: {game_number}'}, status_code=404)
+
+        # The first call may wait on a background render, so keep it off the event loop
+        payload = await run_in_threadpool(puzzle.treemap_payload)
+        return payload_response(request, payload, 31536000, immutable=True)
+
+    async def check_guess(request):
+        try:
+            data = await request.json()
+        except ValueError:
+            data = None
+        guess = data.get('guess') if isinstance(data, dict) else None
+
+        if not guess:
+            return JSONResponse({'error': 'No guess provided'}, status_code=400)
+
+        try:
+            result = snapshots.current().game.play_guess(guess, data.get('session'))
+            return JSONResponse(result)
+        except ValueError as e:
+            return JSONResponse(guess_error_body(e), status_code=400)
+
+    routes = [
+        Route('/api/countries', timed(get_countries)),
+        Route('/api/countries/search', timed(search_countries)),
+        Route('/api/puzzle/{game_number:int}/treemap.json', timed(get_puzzle_treemap)),
+        Route('/api/guess', timed(check_guess), methods=['POST']),
+        Mount('/', app=WSGIMiddleware(flask_app, workers=wsgi_workers)),
+    ]
+
+    asgi_app = Starlette(routes=routes)
+    asgi_app.state.flask_app = flask_app
+    return asgi_app
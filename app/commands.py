@@ -0,0 +1,53 @@
+# app/commands.py
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+
+@click.command('build-puzzles')
+@click.option('--start', 'start_date', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='First date to build (YYYY-MM-DD), defaults to the current puzzle date')
+@click.option('--days', type=int, default=7, show_default=True, help='Number of consecutive days to build')
+@click.option('--overwrite', is_flag=True, help='Rebuild dates that already have an artifact')
+@click.option('--no-png', is_flag=True, help='Skip rendering the PNG share images')
+@with_appcontext
+def build_puzzles_command(start_date, days, overwrite, no_png):
+    """Prebuild daily puzzle artifacts (treemap JSON and PNG) for upcoming dates"""
+    from app.services.puzzle_artifacts import build_puzzles
+
+    snapshot = current_app.snapshots.current()
+    start_date = start_date.date() if start_date else snapshot.puzzles.current().date
+
+    results = build_puzzles(
+        snapshot.trade_data,
+        snapshot.game,
+        snapshot.puzzle_artifacts,
+        start_date,
+        days,
+        overwrite=overwrite,
+        render_png=not no_png,
+        treemap_mode=current_app.config['TREEMAP_MODE'],
+        other_threshold=current_app.config['TREEMAP_OTHER_THRESHOLD']
+    )
+    for date, target_country, built in results:
+        click.echo(f"{date.isoformat()}  {'built  ' if built else 'exists '}  {target_country}")
+
+
+@click.command('apply-delta')
+@click.argument('delta_paths', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@with_appcontext
+def apply_delta_command(delta_paths):
+    """Upsert delta CSVs (revised or added trade data rows) into the processed data and publish it"""
+    processed_path = current_app.config.get('PROCESSED_DATA_PATH')
+    if not processed_path:
+        raise click.UsageError("PROCESSED_DATA_PATH is not set")
+
+    loader = current_app.snapshots.current().trade_data.data_loader
+    for path in delta_paths:
+        changed = loader.apply_delta(path)
+        click.echo(f"{path}  {len(changed)} slices updated")
+
+    # Renamed into place, so running workers build a new snapshot from it on their next check
+    loader.save_processed_data(processed_path)
+    click.echo(f"Published {processed_path}")
@@ -13,18 +13,49 @@ class Config:
     TEMPLATES_FOLDER = 'templates'
     
     # Data settings
-    TRADE_DATA_PATH = os.path.join('app', STATIC_FOLDER, 'data', 'tradedata_uncomtrade.csv')
+    # A CSV file, or a directory or glob pattern of CSV partitions (e.g. one per reporter/year)
+    TRADE_DATA_PATH = os.environ.get('TRADE_DATA_PATH', os.path.join('app', STATIC_FOLDER, 'data', 'tradedata_uncomtrade.csv'))
     COUNTRY_METADATA_PATH = os.path.join('app', STATIC_FOLDER, 'data', 'country_metadata.csv')
-    PROCESSED_DATA_PATH = os.path.join('app', STATIC_FOLDER, 'data', 'trade_data.json')
-    FORCE_DATA_RELOAD = os.environ.get('FORCE_DATA_RELOAD', True)
+    COUNTRY_ALIASES_PATH = os.path.join('app', STATIC_FOLDER, 'data', 'country_aliases.csv')
+    PROCESSED_DATA_PATH = os.path.join('app', STATIC_FOLDER, 'data', 'trade_data.bin')
+    # Processed data is rebuilt automatically when the input files change; set to force a rebuild
+    FORCE_DATA_RELOAD = os.environ.get('FORCE_DATA_RELOAD', 'false').lower() in ('1', 'true', 'yes')
+    DATA_INGEST_ENGINE = os.environ.get('DATA_INGEST_ENGINE', 'vectorized')  # 'vectorized', 'streaming' or 'legacy'
+    DATA_INGEST_CHUNK_SIZE = int(os.environ.get('DATA_INGEST_CHUNK_SIZE', 250000))  # CSV rows per chunk when streaming
+    DATA_INGEST_WORKERS = int(os.environ.get('DATA_INGEST_WORKERS', 0)) or None  # Processes for partitioned input (default: CPU count)
+    DATA_RELOAD_CHECK_INTERVAL = float(os.environ.get('DATA_RELOAD_CHECK_INTERVAL', 5))  # Seconds between checks for a newly published data file (0 disables)
+    DATA_RELOAD_SIGNAL = os.environ.get('DATA_RELOAD_SIGNAL')  # e.g. 'SIGHUP' to reload on a signal (single-process servers)
+    PUZZLE_ARTIFACTS_PATH = os.path.join('app', STATIC_FOLDER, 'puzzles')  # Built by `flask build-puzzles`
+    SHARE_IMAGE_CACHE_PATH = os.environ.get('SHARE_IMAGE_CACHE_PATH', os.path.join('instance', 'share_images'))
+    SHARE_IMAGE_CACHE_MAX_BYTES = int(os.environ.get('SHARE_IMAGE_CACHE_MAX_BYTES', 64 << 20))  # Least recently used images are evicted past this
+    SHARE_IMAGE_SIZE = (1200, 630)  # Width and height of the treemap share image (PNG)
+    PUBLIC_BASE_URL = os.environ.get('PUBLIC_BASE_URL')  # e.g. 'https://tradle.example.com', for absolute og:image links
     
     # Game settings
     MAX_GUESSES = 6
+    PUZZLE_FLOW = os.environ.get('PUZZLE_FLOW', 'Export')  # Trade flow the puzzles show, e.g. 'Import'
+    TRADE_PROXIMITY_METRIC = 'cosine'  # Export profile similarity shown per guess: 'cosine' or 'weighted_jaccard'
+    PUZZLE_YEAR = int(os.environ.get('PUZZLE_YEAR', 0)) or None  # Year the puzzles show (default: each country's latest)
     DAILY_RESET = True
     DAILY_RESET_TIME = "00:00:00"  # UTC time for daily country reset
+    DAILY_PREPARE_AHEAD = 600  # Seconds before the reset to prepare the next puzzle
+    TREEMAP_MODE = os.environ.get('TREEMAP_MODE', 'flat')  # 'flat' (a tile per commodity) or 'hs' (grouped by HS section)
+    TREEMAP_OTHER_THRESHOLD = float(os.environ.get('TREEMAP_OTHER_THRESHOLD', 0))  # 'hs' mode: merge tiles under this % of the total into "Other"
+    
+    # Progress/stats settings
+    PROGRESS_STORE = os.environ.get('PROGRESS_STORE', 'sqlite')  # 'sqlite', or empty to disable
+    PROGRESS_DB_PATH = os.environ.get('PROGRESS_DB_PATH', os.path.join('instance', 'progress.sqlite3'))
+    PROGRESS_BATCH_SIZE = 500  # Guess events written per transaction
+    PROGRESS_FLUSH_INTERVAL = 1.0  # Max seconds a guess event waits before being written
     
     # API settings
     JSON_SORT_KEYS = False  # Preserve the order of JSON keys in responses
+    COUNTRIES_CACHE_MAX_AGE = 86400  # Seconds clients/CDNs may cache /api/countries (revalidated by ETag)
+    NEIGHBORS_CACHE_MAX_AGE = 3600  # Seconds clients/CDNs may cache /api/countries/<name>/neighbors
+    
+    # Page settings
+    INLINE_TREEMAP = os.environ.get('INLINE_TREEMAP', 'true').lower() in ('1', 'true', 'yes')  # False serves /api/puzzle/<n>/treemap.json
+    PAGE_CACHE_MAX_AGE = 300  # Seconds the page may be cached when DAILY_RESET is off
     
     # Rate limiting to prevent abuse
     RATELIMIT_DEFAULT = "100 per day;30 per hour;5 per minute"
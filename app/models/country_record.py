@@ -0,0 +1,199 @@
+# app/models/country_record.py
+
+from collections.abc import Mapping
+
+# Keys a CountryRecord derives from its arrays rather than its attributes
+ARRAY_KEYS = ('exports', 'export_percentages', 'top_exports', 'total_exports', 'coordinates', 'hs_aggregates')
+
+
+class CommodityValues(Mapping):
+    """
+    Read-only commodity name -> value mapping over one country's slice of an array
+
+    Used for a record's 'exports' and 'export_percentages'; iterates in the record's
+    commodity order (largest export first).
+    """
+
+    __slots__ = ('record', 'array')
+
+    def __init__(self, record, array):
+        self.record = record
+        self.array = array
+
+    def __getitem__(self, commodity):
+        return self.array[self.record.position(commodity)].item()
+
+    def __iter__(self):
+        return iter(self.record.commodity_names())
+
+    def __len__(self):
+        return len(self.array)
+
+    def __contains__(self, commodity):
+        return commodity in self.record.positions()
+
+    def items(self):
+        return zip(self.record.commodity_names(), self.array.tolist())
+
+    def values(self):
+        return self.array.tolist()
+
+
+class NodeValues(Mapping):
+    """Read-only HS node code -> value mapping over one record's slice of the node arrays"""
+
+    __slots__ = ('record', 'array')
+
+    def __init__(self, record, array):
+        self.record = record
+        self.array = array
+
+    def __getitem__(self, node):
+        return self.array[self.record.node_position(node)].item()
+
+    def __iter__(self):
+        return iter(self.record.node_names())
+
+    def __len__(self):
+        return len(self.array)
+
+    def __contains__(self, node):
+        return node in self.record.node_positions()
+
+    def items(self):
+        return zip(self, self.array.tolist())
+
+    def values(self):
+        return self.array.tolist()
+
+
+class CountryRecord(Mapping):
+    """
+    One country's processed trade data for a year and flow, backed by arrays instead of nested dicts
+
+    Commodities are held as ids into the shared commodity name table, and export values
+    and percentages as array slices (views of the memory-mapped ProcessedDataStore arrays,
+    so nothing is copied). As a Mapping it keeps the countries_data contract: 'exports' and
+    'export_percentages' are CommodityValues views, 'coordinates' a small dict and every
+    other key comes from the country's metadata attributes. The keys keep their export
+    names whatever the flow: for an import record 'exports' holds the import values.
+    'hs_aggregates', when the data has HS codes, is a NodeValues view of the values summed
+    up the HS hierarchy.
+    """
+
+    __slots__ = ('name', 'commodities', 'commodity_ids', 'export_values', 'percentages',
+                 'lat', 'lng', 'total_exports', 'attributes', 'year', 'flow',
+                 'hs_nodes', 'hs_node_ids', 'hs_values', '_positions', '_node_positions')
+
+    def __init__(self, name, commodities, commodity_ids, export_values, percentages,
+                 lat, lng, total_exports, attributes, year=None, flow=None,
+                 hs_nodes=None, hs_node_ids=None, hs_values=None):
+        """
+        Args:
+            name: Country name
+            commodities: Shared sequence of commodity names that commodity_ids index into
+            commodity_ids: Integer array of this country's commodity ids, largest export first
+            export_values: Float array of export values, aligned with commodity_ids
+            percentages: Float array of each commodity's share of total exports
+            lat, lng: Country coordinates
+            total_exports: Sum of export values
+            attributes: Dict of metadata (iso, region, subregion, ...)
+            year, flow: The slice of trade data this record holds (year 0 when not split by year)
+            hs_nodes: Shared sequence of HS node codes that hs_node_ids index into
+            hs_node_ids: Integer array of this record's HS nodes, in depth-first order
+            hs_values: Float array of the values summed per HS node, aligned with hs_node_ids
+        """
+        self.name = name
+        self.commodities = commodities
+        self.commodity_ids = commodity_ids
+        self.export_values = export_values
+        self.percentages = percentages
+        self.lat = lat
+        self.lng = lng
+        self.total_exports = total_exports
+        self.attributes = attributes
+        self.year = year
+        self.flow = flow
+        self.hs_nodes = hs_nodes
+        self.hs_node_ids = hs_node_ids
+        self.hs_values = hs_values
+        self._positions = None
+        self._node_positions = None
+
+    def commodity_names(self):
+        """Commodity names in order, largest export first"""
+        commodities = self.commodities
+        return [commodities[c] for c in self.commodity_ids.tolist()]
+
+    def positions(self):
+        """Commodity name -> index into this record's arrays, built on first lookup by name"""
+        if self._positions is None:
+            self._positions = {name: i for i, name in enumerate(self.commodity_names())}
+        return self._positions
+
+    def position(self, commodity):
+        return self.positions()[commodity]
+
+    def node_names(self):
+        """HS node codes in order (depth first)"""
+        nodes = self.hs_nodes
+        return [nodes[i] for i in self.hs_node_ids.tolist()]
+
+    def node_positions(self):
+        """HS node code -> index into this record's node arrays, built on first lookup by code"""
+        if self._node_positions is None:
+            self._node_positions = {node: i for i, node in enumerate(self.node_names())}
+        return self._node_positions
+
+    def node_position(self, node):
+        return self.node_positions()[node]
+
+    def top_exports(self, n=5):
+        commodities = self.commodities
+        return [commodities[c] for c in self.commodity_ids[:n].tolist()]
+
+    def has_hs_aggregates(self):
+        return self.hs_values is not None and len(self.hs_values) > 0
+
+    def __getitem__(self, key):
+        if key == 'exports':
+            return CommodityValues(self, self.export_values)
+        if key == 'export_percentages':
+            if self.total_exports > 0:
+                return CommodityValues(self, self.percentages)
+            raise KeyError(key)
+        if key == 'top_exports':
+            return self.top_exports()
+        if key == 'total_exports':
+            return self.total_exports
+        if key == 'coordinates':
+            return {'lat': self.lat, 'lng': self.lng}
+        if key == 'hs_aggregates':
+            if self.has_hs_aggregates():
+                return NodeValues(self, self.hs_values)
+            raise KeyError(key)
+        return self.attributes[key]
+
+    def __iter__(self):
+        yield 'exports'
+        yield 'coordinates'
+        yield from self.attributes
+        if self.total_exports > 0:
+            yield 'export_percentages'
+        yield 'top_exports'
+        yield 'total_exports'
+        if self.has_hs_aggregates():
+            yield 'hs_aggregates'
+
+    def __len__(self):
+        return len(self.attributes) + (5 if self.total_exports > 0 else 4) + self.has_hs_aggregates()
+
+    def __contains__(self, key):
+        if key == 'export_percentages':
+            return self.total_exports > 0
+        if key == 'hs_aggregates':
+            return self.has_hs_aggregates()
+        return key in ARRAY_KEYS or key in self.attributes
+
+    def __repr__(self):
+        return f"CountryRecord({self.name!r}, {self.year}, {self.flow!r}, {len(self.commodity_ids)} commodities)"
@@ -1,46 +1,197 @@
 # app/models/trade_data.py
 
 import os
+import csv
+from collections import defaultdict
 from app.services.trade_data_loader import TradeDataLoader
+from app.services.processed_data_store import DEFAULT_FLOW, select_slices
+from app.services.payloads import PrecompressedPayload
+from app.services.country_search import CountrySearchIndex
 
 class TradeData:
-    def __init__(self, app=None):
+    def __init__(self, app=None, reload=False):
         self.app = app
         self.data_loader = None
+        self._countries_list = None
+        self._countries_payload = None
+        self._search_index = None
+        self._slices = {}
+        self._data_fingerprint = None
+        self._loaded_file = None
         
         if app is not None:
-            self.init_app(app)
+            self.init_app(app, reload=reload)
             
-    def init_app(self, app):
-        """Initialize with Flask app config"""
+    def init_app(self, app, reload=False):
+        """
+        Initialize with Flask app config
+        
+        Args:
+            app: The Flask app
+            reload: Load the published processed data file as it is, without checking it
+                against the inputs or FORCE_DATA_RELOAD (used when a running app picks up
+                a new file)
+        """
         self.app = app
+        self._countries_list = None
+        self._countries_payload = None
+        self._search_index = None
+        self._slices = {}
+        self._data_fingerprint = None
         
         csv_path = app.config['TRADE_DATA_PATH']
         metadata_path = app.config.get('COUNTRY_METADATA_PATH')
         processed_path = app.config.get('PROCESSED_DATA_PATH')
         
         force_data_reload = app.config['FORCE_DATA_RELOAD']
+        ingest_engine = app.config.get('DATA_INGEST_ENGINE', 'vectorized')
+        chunk_size = app.config.get('DATA_INGEST_CHUNK_SIZE', 250000)
+        ingest_workers = app.config.get('DATA_INGEST_WORKERS')
         
         # Initialize data loader
         self.data_loader = TradeDataLoader(
             csv_path=csv_path,
-            country_metadata_path=metadata_path
+            country_metadata_path=metadata_path,
+            engine=ingest_engine,
+            chunk_size=chunk_size,
+            workers=ingest_workers
         )
         
-        # If we have a path for processed data, try to load it
-        if processed_path and os.path.exists(processed_path) and not force_data_reload:
-            self.data_loader.load_processed_data(processed_path)
+        self._loaded_file = None
+        if reload and processed_path and os.path.exists(processed_path):
+            # Re-ingesting here would publish yet another file, which every worker would
+            # reload again, and drop the deltas applied to this one
+            self._load_processed_file(processed_path)
+        # If we have processed data built from the current inputs, load it
+        elif (processed_path and not force_data_reload
+                and self.data_loader.is_processed_data_current(processed_path)):
+            self._load_processed_file(processed_path)
         else:
             self.data_loader.load_data()
-            self.data_loader.save_processed_data(processed_path)
+            if processed_path:
+                self.data_loader.save_processed_data(processed_path)
+                # Serve from the saved file so workers share its pages instead of private dicts
+                self._load_processed_file(processed_path)
+    
+    def _load_processed_file(self, path):
+        """Load a processed data file, remembering which file it was for has_newer_data"""
+        # Taken before opening, so a file published meanwhile still counts as newer
+        identity = self._file_identity(path)
+        self.data_loader.load_processed_data(path)
+        # A memory-mapped store knows the file it actually mapped
+        self._loaded_file = getattr(self.data_loader.countries_data, 'file_identity', identity)
+    
+    def has_newer_data(self):
+        """Whether another processed data file was published since this data was loaded"""
+        processed_path = self.app.config.get('PROCESSED_DATA_PATH')
+        return bool(processed_path) and self._file_identity(processed_path) != self._loaded_file
+    
+    @staticmethod
+    def _file_identity(path):
+        """Inode and mtime of a file (None if missing); a file renamed into place has a new inode"""
+        try:
+            stat = os.stat(path)
+        except (OSError, TypeError):
+            return None
+        return stat.st_ino, stat.st_mtime_ns
         
     def get_countries_list(self):
         """Return a sorted list of all countries"""
-        return sorted(list(self.data_loader.countries_data.keys()))
+        if self._countries_list is None:
+            self._countries_list = tuple(sorted(self.data_loader.countries_data.keys()))
+        return list(self._countries_list)
+    
+    def get_countries_payload(self):
+        """Return the sorted country list as a precompressed JSON payload, built once per data load"""
+        if self._countries_payload is None:
+            self._countries_payload = PrecompressedPayload.from_json(self.get_countries_list())
+        return self._countries_payload
+    
+    def get_search_index(self):
+        """Return the country name/code/alias search index, built once per data load"""
+        if self._search_index is None:
+            self._search_index = CountrySearchIndex(self.data_loader.countries_data, self._load_aliases())
+        return self._search_index
+    
+    def _load_aliases(self):
+        """Alternative names per country from the metadata names and the aliases file, matched by ISO code"""
+        iso_to_country = {data.get('iso'): name for name, data in self.data_loader.countries_data.items()}
+        aliases = defaultdict(list)
+        
+        sources = (
+            (self.app.config.get('COUNTRY_METADATA_PATH'), 'country_name'),
+            (self.app.config.get('COUNTRY_ALIASES_PATH'), 'alias')
+        )
+        for path, column in sources:
+            if not path or not os.path.exists(path):
+                continue
+            with open(path, newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    country = iso_to_country.get(row.get('country_iso'))
+                    if country and row.get(column):
+                        aliases[country].append(row[column])
+        
+        return aliases
+    
+    def get_country_data(self, country_name, year=None, flow=DEFAULT_FLOW):
+        """Get data for a specific country, by default its latest year of exports"""
+        return self.get_slice(year, flow).get(country_name)
+    
+    def get_slice(self, year=None, flow=DEFAULT_FLOW):
+        """
+        Country name -> data for one year and flow, without copying any country's data
+        
+        Args:
+            year: Year to select, or None for each country's latest year with that flow
+            flow: Trade flow ('Export', 'Import', ...)
+            
+        Raises:
+            ValueError: When the data isn't split by year and flow (legacy engine, JSON cache)
+                and anything but the default view is asked for
+        """
+        countries_data = self.data_loader.countries_data
+        if hasattr(countries_data, 'slice'):
+            return countries_data.slice(year, flow)
+        if year is None and flow == DEFAULT_FLOW:
+            return countries_data
+        
+        view = self._slices.get((year, flow))
+        if view is None:
+            slices_data = self.data_loader.slices_data
+            if slices_data is None:
+                raise ValueError("Trade data is not split by year and flow")
+            keys = list(slices_data)
+            view = self._slices[(year, flow)] = {
+                country: slices_data[keys[i]] for country, i in select_slices(keys, year, flow).items()
+            }
+        return view
+    
+    def get_flows(self):
+        """Trade flows in the data, in order of first appearance"""
+        return list(dict.fromkeys(flow for _, _, flow in self._slice_keys()))
+    
+    def get_available_years(self, flow=DEFAULT_FLOW):
+        """Sorted years with data for a flow"""
+        return sorted({year for _, year, slice_flow in self._slice_keys() if slice_flow == flow})
+    
+    def _slice_keys(self):
+        """(country, year, flow) of every slice; the default view alone when not split by year"""
+        countries_data = self.data_loader.countries_data
+        if hasattr(countries_data, 'slice_keys'):
+            return countries_data.slice_keys
+        if self.data_loader.slices_data is not None:
+            return list(self.data_loader.slices_data)
+        return [(country, 0, DEFAULT_FLOW) for country in countries_data]
+    
+    def get_commodity_codes(self):
+        """Commodity name -> HS code (None where it isn't one); empty for data without codes"""
+        return self.data_loader.commodity_codes
     
-    def get_country_data(self, country_name):
-        """Get data for a specific country"""
-        return self.data_loader.countries_data.get(country_name)
+    def get_data_fingerprint(self):
+        """Content hash of the loaded data, computed once per data load; tags the puzzle artifacts built from it"""
+        if self._data_fingerprint is None:
+            self._data_fingerprint = self.data_loader.data_fingerprint()
+        return self._data_fingerprint
     
     def get_all_countries_data(self):
         """Return the complete processed dataset"""
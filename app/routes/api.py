@@ -1,4 +1,6 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request
+from app.routes.responses import guess_error_body, precompressed_response
+from app.services.snapshot import current_snapshot
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
@@ -6,12 +8,68 @@ api_bp = Blueprint('api', __name__, url_prefix='/api')
 def get_countries():
     """Get list of all countries for autocomplete"""
     from flask import current_app
-    return jsonify(current_app.trade_data.get_countries_list())
+    return precompressed_response(
+        current_snapshot().trade_data.get_countries_payload(),
+        current_app.config['COUNTRIES_CACHE_MAX_AGE']
+    )
 
-@api_bp.route('/guess', methods=['POST'])
-def check_guess():
+@api_bp.route('/countries/search')
+def search_countries():
+    """Search countries by name prefix, ISO code or alias, tolerating typos"""
+    query = request.args.get('q', '')
+    limit = min(request.args.get('limit', 10, type=int), 50)
+    
+    return jsonify(current_snapshot().trade_data.get_search_index().search(query, limit))
+
+@api_bp.route('/countries/<path:name>/neighbors')
+def get_country_neighbors(name):
+    """Nearest countries by great-circle distance (by=geo) or export profile (by=trade)"""
     from flask import current_app
     
+    game = current_snapshot().game
+    by = request.args.get('by', 'geo')
+    k = request.args.get('k', 5, type=int)
+    
+    # Accept codes, aliases and small typos, as guesses do
+    country = current_snapshot().trade_data.get_search_index().resolve(name)
+    if country is None or country not in game.guess_matrix:
+        return jsonify({'error': f'Unknown country: {name}'}), 404
+    
+    try:
+        payload = game.get_neighbor_index().payload(country, by, k)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return precompressed_response(payload, current_app.config['NEIGHBORS_CACHE_MAX_AGE'])
+
+@api_bp.route('/puzzle/<int:game_number>/treemap.json')
+def get_puzzle_treemap(game_number):
+    """Treemap data and layout for a puzzle; immutable, so browsers and CDNs can keep it"""
+    puzzle = current_snapshot().puzzles.get_puzzle(game_number)
+    if puzzle is None:
+        return jsonify({'error': f'Unknown puzzle: {game_number}'}), 404
+    
+    return precompressed_response(puzzle.treemap_payload(), 31536000, immutable=True)
+
+@api_bp.route('/puzzle/<int:game_number>/treemap.png')
+def get_puzzle_share_image(game_number):
+    """Treemap share image for a puzzle, rendered once and cached by content"""
+    from flask import current_app
+    
+    puzzle = current_snapshot().puzzles.get_puzzle(game_number)
+    if puzzle is None:
+        return jsonify({'error': f'Unknown puzzle: {game_number}'}), 404
+    
+    key, png = puzzle.share_image(current_app.share_images)
+    response = Response(png, mimetype='image/png')
+    response.set_etag(key)
+    response.cache_control.public = True
+    response.cache_control.max_age = 31536000
+    response.cache_control.immutable = True
+    return response.make_conditional(request)
+
+@api_bp.route('/guess', methods=['POST'])
+def check_guess():
     data = request.get_json()
     guess = data.get('guess')
     
@@ -19,8 +77,44 @@ def check_guess():
         return jsonify({'error': 'No guess provided'}), 400
         
     try:
-        result = current_app.game.check_guess(guess)
-        print(result)
+        result = current_snapshot().game.play_guess(guess, data.get('session'))
         return jsonify(result)
     except ValueError as e:
-        return jsonify({'error': str(e)}), 400
+        return jsonify(guess_error_body(e)), 400
+
+@api_bp.route('/stats')
+@api_bp.route('/stats/<int:game_number>')
+def get_day_stats(game_number=None):
+    """Aggregate results for a daily game (defaults to today's)"""
+    from flask import current_app
+    
+    if current_app.progress_store is None:
+        return jsonify({'error': 'Stats are not enabled'}), 404
+    
+    if game_number is None:
+        game_number = current_snapshot().game.get_current_game_number()
+    return jsonify(current_app.progress_store.get_day_stats(game_number))
+
+@api_bp.route('/stats/player', methods=['POST'])
+def get_player_stats():
+    """Played/won counts, streaks and guess distribution for the player holding a session token"""
+    from flask import current_app
+    
+    if current_app.progress_store is None:
+        return jsonify({'error': 'Stats are not enabled'}), 404
+    
+    data = request.get_json(silent=True) or {}
+    game = current_snapshot().game
+    player_id = game.get_player_id(data.get('session'))
+    if player_id is None:
+        return jsonify({'error': 'Invalid session'}), 400
+    
+    return jsonify(current_app.progress_store.get_player_stats(player_id, game.get_current_game_number()))
+
+
+@api_bp.route('/snapshot')
+def get_snapshot_stats():
+    """Data snapshot version, reload durations and request latency around reloads (this worker)"""
+    from flask import current_app
+    
+    return jsonify(current_app.snapshots.stats())
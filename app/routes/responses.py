@@ -0,0 +1,65 @@
+# app/routes/responses.py
+
+from flask import Response, request
+from werkzeug.http import http_date, parse_accept_header, parse_date, parse_etags, quote_etag
+
+
+def payload_response_parts(payload, request_headers, max_age, last_modified=None, immutable=False):
+    """
+    Status, body and headers for serving a PrecompressedPayload, independent of the web framework
+
+    Answers If-None-Match (or, without it, If-Modified-Since) with 304 and otherwise sends
+    the stored body in the best encoding the client accepts, without re-serializing or
+    compressing anything.
+
+    Args:
+        payload: PrecompressedPayload to send
+        request_headers: Mapping of the request's headers
+        max_age: Seconds the response may be cached
+        last_modified: Optional datetime sent as Last-Modified
+        immutable: Mark the response as never changing at this URL
+
+    Returns:
+        Tuple of (status code, body bytes, dict of response headers)
+    """
+    encoding = payload.select_encoding(parse_accept_header(request_headers.get('Accept-Encoding')))
+
+    if_none_match = request_headers.get('If-None-Match')
+    if if_none_match:
+        not_modified = payload.matches(parse_etags(if_none_match))
+    else:
+        if_modified_since = parse_date(request_headers.get('If-Modified-Since'))
+        not_modified = (last_modified is not None and if_modified_since is not None
+                        and last_modified.replace(microsecond=0) <= if_modified_since)
+
+    cache_control = f"public, max-age={max_age}" + (", immutable" if immutable else "")
+    headers = {
+        'ETag': quote_etag(payload.etags[encoding]),
+        'Vary': 'Accept-Encoding',
+        'Cache-Control': cache_control
+    }
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(last_modified)
+
+    if not_modified:
+        return 304, b'', headers
+
+    headers['Content-Type'] = payload.content_type
+    if encoding != 'identity':
+        headers['Content-Encoding'] = encoding
+    return 200, payload.bodies[encoding], headers
+
+
+def precompressed_response(payload, max_age, last_modified=None, immutable=False):
+    """Serve a PrecompressedPayload for the current Flask request (see payload_response_parts)"""
+    status, body, headers = payload_response_parts(payload, request.headers, max_age, last_modified, immutable)
+    return Response(body, status=status, headers=headers)
+
+
+def guess_error_body(error):
+    """JSON body for a rejected guess, listing the candidates when it could mean several countries"""
+    body = {'error': str(error)}
+    candidates = getattr(error, 'candidates', None)
+    if candidates:
+        body['candidates'] = candidates
+    return body
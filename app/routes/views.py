@@ -1,13 +1,59 @@
-from flask import Blueprint, render_template, current_app
+import datetime
+from flask import Blueprint, render_template, current_app, url_for
+from app.routes.responses import precompressed_response
+from app.services.payloads import PrecompressedPayload
+from app.services.snapshot import current_snapshot
 
 views_bp = Blueprint('views', __name__)
 
 @views_bp.route('/')
 def index():
-    """Main game page"""
-    print("loading page")    
+    """Main game page, rendered once per puzzle day"""
+    snapshot = current_snapshot()
+    puzzle = snapshot.puzzles.current()
+    
+    payload = puzzle.cache.get('index_page')
+    if payload is None:
+        payload = puzzle.cache.setdefault('index_page', PrecompressedPayload(
+            _render_index(snapshot, puzzle).encode('utf-8'),
+            mimetype='text/html'
+        ))
+    
+    # Cacheable until the puzzle changes
+    seconds_until_reset = snapshot.puzzles.seconds_until_reset()
+    max_age = current_app.config['PAGE_CACHE_MAX_AGE'] if seconds_until_reset is None else int(seconds_until_reset)
+    
+    return precompressed_response(
+        payload,
+        max_age,
+        # The page changes when the puzzle does or new data is loaded
+        last_modified=max(datetime.datetime.fromtimestamp(puzzle.starts_at, datetime.timezone.utc), snapshot.loaded_at)
+    )
+
+def _render_index(snapshot, puzzle):
+    """Render the game page, inlining the treemap or pointing at its cacheable JSON resource"""
+    # Which year and flow ('export', 'import', ...) the puzzles show
+    game = snapshot.game
+    mode = dict(flow_label=game.flow.lower(), puzzle_year=game.year)
+    # Link previews show the treemap's share image, versioned by its content address. The
+    # page is shared by every request of the day, so the host comes from the config, never
+    # from the request that happened to render it
+    share_image_key = current_app.share_images.key(puzzle.treemap.treemap_data)
+    share_image_url = url_for('api.get_puzzle_share_image', game_number=puzzle.game_number, v=share_image_key)
+    base_url = current_app.config.get('PUBLIC_BASE_URL')
+    mode['share_image_url'] = base_url.rstrip('/') + share_image_url if base_url else share_image_url
+    if current_app.config['INLINE_TREEMAP']:
+        return render_template(
+            'index.html',
+            treemap_data=puzzle.treemap.treemap_data, 
+            treemap_layout=puzzle.treemap.treemap_layout,
+            **mode
+            )
     return render_template(
         'index.html',
-        treemap_data=current_app.treemap.treemap_data, 
-        treemap_layout=current_app.treemap.treemap_layout
+        # Versioned by content, as the immutable treemap of a game can change when new data is
+        # loaded; the snapshot version is per process and restarts at 1
+        treemap_url=url_for('api.get_puzzle_treemap', game_number=puzzle.game_number,
+                            v=puzzle.treemap_payload().digest),
+        **mode
         )
@@ -0,0 +1,204 @@
+# app/services/country_search.py
+
+import re
+import bisect
+import unicodedata
+from collections import defaultdict
+
+
+def normalize(text):
+    """Case-fold, strip accents and punctuation, and collapse whitespace"""
+    text = unicodedata.normalize('NFKD', str(text))
+    text = ''.join(c for c in text if not unicodedata.combining(c)).casefold()
+    return ' '.join(re.sub(r'[^0-9a-z]+', ' ', text).split())
+
+
+def name_variants(name):
+    """A name plus its short form without a parenthetical or trailing ', ...' qualifier"""
+    variants = [name]
+    short = re.split(r'\s*[(,]', name, maxsplit=1)[0]
+    if short and short != name:
+        variants.append(short)
+    return variants
+
+
+def trigrams(key):
+    """Character trigrams of a normalized key, padded so short keys still produce some"""
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class AmbiguousCountry(ValueError):
+    """Raised for a guess that could mean several countries; candidates lists the likeliest"""
+
+    def __init__(self, message, candidates):
+        super().__init__(message)
+        self.candidates = candidates
+
+
+class CountrySearchIndex:
+    """
+    Prefix and typo-tolerant lookup of country names, ISO codes and aliases
+
+    Every searchable key (name, ISO code, numeric code, alias) is normalized once. Codes
+    only match exactly. Prefix matches of names and aliases come from a sorted key list
+    searched with bisect, which also covers word starts ("korea" finds "Rep. of Korea").
+    Misspellings fall back to a trigram index scored with the Dice coefficient, so only
+    countries sharing a trigram with the query are scored.
+    """
+
+    def __init__(self, countries_data, aliases=None, fuzzy_cutoff=0.5, fuzzy_margin=0.1):
+        """
+        Args:
+            countries_data: Mapping of country name -> country data
+            aliases: Optional mapping of country name -> iterable of alternative names
+            fuzzy_cutoff: Minimum trigram similarity (0-1) for a fuzzy match
+            fuzzy_margin: How much better than the runner-up the best fuzzy match must score
+                for resolve to pick it
+        """
+        self.countries = tuple(countries_data.keys())
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.fuzzy_margin = fuzzy_margin
+        aliases = aliases or {}
+
+        # Exact keys (full names, codes, aliases) -> country id
+        self.exact = {}
+        # (key, rank, country id) sorted by key; rank 0 is a whole name, 1 a later word in it
+        entries = set()
+        trigram_index = defaultdict(set)
+        keys_by_country = defaultdict(set)
+
+        for i, name in enumerate(self.countries):
+            data = countries_data[name]
+            names = [name] + list(aliases.get(name, ()))
+            codes = [data.get('iso'), data.get('country_code')]
+
+            # Codes only match exactly: a mistyped code is another country's code, not a typo
+            for text in codes:
+                key = normalize(text) if text is not None else ''
+                if key and key not in self.exact:
+                    self.exact[key] = i
+
+            for text in [variant for n in names for variant in name_variants(n)]:
+                if text is None or text == '':
+                    continue
+                key = normalize(text)
+                if not key:
+                    continue
+                # The country's own name wins over another country's alias or code
+                if key not in self.exact or text == name:
+                    self.exact[key] = i
+                keys_by_country[i].add(key)
+
+                words = key.split(' ')
+                for w in range(len(words)):
+                    entries.add((' '.join(words[w:]), 0 if w == 0 else 1, i))
+
+        # Trigram sets of each country's keys, for scoring fuzzy candidates
+        self.grams_by_country = {}
+        for i, keys in keys_by_country.items():
+            self.grams_by_country[i] = tuple(frozenset(trigrams(key)) for key in keys)
+            for grams in self.grams_by_country[i]:
+                for gram in grams:
+                    trigram_index[gram].add(i)
+
+        # Built once and never mutated, so kept in compact immutable containers
+        self.keys_by_country = {i: frozenset(keys) for i, keys in keys_by_country.items()}
+        self.trigram_index = {gram: frozenset(ids) for gram, ids in trigram_index.items()}
+        self.entries = tuple(sorted(entries))
+        self.entry_keys = tuple(key for key, _, _ in self.entries)
+
+    def search(self, query, limit=10):
+        """
+        Countries matching a query, best first
+
+        Prefix matches (exact matches first, then whole-name before word-start matches,
+        then alphabetical) are followed by fuzzy matches to fill the limit.
+        """
+        key = normalize(query)
+        if not key or limit <= 0:
+            return []
+
+        ranked = {}
+        exact = self.exact.get(key)
+        if exact is not None:
+            ranked[exact] = (0, 0)
+
+        start = bisect.bisect_left(self.entry_keys, key)
+        for position in range(start, len(self.entries)):
+            entry_key, rank, i = self.entries[position]
+            if not entry_key.startswith(key):
+                break
+            best = ranked.get(i)
+            if best is None or (1, rank) < best:
+                ranked[i] = (1, rank)
+
+        results = sorted(ranked, key=lambda i: (ranked[i], self.countries[i]))[:limit]
+
+        if len(results) < limit:
+            seen = set(results)
+            for i, _ in self._fuzzy(key):
+                if i not in seen:
+                    results.append(i)
+                    if len(results) == limit:
+                        break
+
+        return [self.countries[i] for i in results]
+
+    def resolve(self, query):
+        """
+        Canonical country name for user input, or None unless it clearly means one country
+
+        Exact names, codes and aliases (ignoring case, accents and punctuation) resolve
+        directly. Otherwise the input resolves if it starts the names of a single country,
+        or if no name starts with it and its best fuzzy match scores at least fuzzy_margin
+        above the runner-up. Input that fits several countries
+        ('South', 'United', 'Island') resolves to None; search lists the candidates.
+        """
+        key = normalize(query)
+        if not key:
+            return None
+
+        exact = self.exact.get(key)
+        if exact is not None:
+            return self.countries[exact]
+
+        prefixed = self._prefixed(key)
+        if prefixed:
+            return self.countries[prefixed.pop()] if len(prefixed) == 1 else None
+
+        matches = self._fuzzy(key)
+        if matches and (len(matches) == 1 or matches[0][1] - matches[1][1] >= self.fuzzy_margin):
+            return self.countries[matches[0][0]]
+        return None
+
+    def _prefixed(self, key):
+        """Ids of the countries with a whole name, code or alias starting with key"""
+        ids = set()
+        for position in range(bisect.bisect_left(self.entry_keys, key), len(self.entries)):
+            entry_key, rank, i = self.entries[position]
+            if not entry_key.startswith(key):
+                break
+            if rank == 0:
+                ids.add(i)
+        return ids
+
+    def _fuzzy(self, key):
+        """(country id, score) pairs above the cutoff, best first"""
+        query_grams = trigrams(key)
+
+        candidates = set()
+        for gram in query_grams:
+            candidates |= self.trigram_index.get(gram, frozenset())
+
+        scores = []
+        for i in candidates:
+            score = max(
+                2 * len(query_grams & grams) / (len(query_grams) + len(grams))
+                for grams in self.grams_by_country[i]
+            )
+            if score >= self.fuzzy_cutoff:
+                scores.append((i, score))
+
+        scores.sort(key=lambda item: (-item[1], self.countries[item[0]]))
+        return scores
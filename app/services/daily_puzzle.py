@@ -0,0 +1,206 @@
+import datetime
+import logging
+import threading
+import time
+
+from app.services.trade_charts import TradeTreemap
+from app.services.payloads import PrecompressedPayload
+from app.services.prefork import register_after_fork
+
+
+class DailyPuzzle:
+    """
+    One day's puzzle: the date, game number, target country and its treemap
+
+    starts_at is the UNIX time the puzzle went live, and cache holds responses derived from
+    the puzzle (rendered pages, payloads) so they are built once per day.
+    """
+
+    __slots__ = ('date', 'game_number', 'target_country', 'treemap', 'starts_at', 'cache')
+
+    def __init__(self, date, game_number, target_country, treemap, starts_at):
+        self.date = date
+        self.game_number = game_number
+        self.target_country = target_country
+        self.treemap = treemap
+        self.starts_at = starts_at
+        self.cache = {}
+
+    def treemap_payload(self):
+        """The treemap as a precompressed {"data": ..., "layout": ...} JSON payload, built once"""
+        payload = self.cache.get('treemap_payload')
+        if payload is None:
+            body = f'{{"data":{self.treemap.treemap_data},"layout":{self.treemap.treemap_layout}}}'
+            payload = self.cache.setdefault('treemap_payload', PrecompressedPayload(body.encode('utf-8')))
+        return payload
+
+    def share_image(self, share_images):
+        """The treemap's PNG share image as (key, PNG bytes), from a ShareImageCache, fetched once"""
+        image = self.cache.get('share_image')
+        if image is None:
+            image = self.cache.setdefault('share_image', share_images.get(self.treemap.treemap_data))
+        return image
+
+
+class DailyPuzzleProvider:
+    """
+    Serves the current DailyPuzzle and rolls over to the next one at the daily reset
+
+    The current puzzle and the time of the next reset are held in a single tuple that is
+    swapped as a whole, so readers always see a consistent date/target/treemap. A
+    background thread prepares the next day's puzzle ahead of the reset (loading its
+    prebuilt artifact or rendering it), and swaps it in at the reset time. Requests only
+    compare the clock against the next reset timestamp, and roll over themselves if the
+    scheduler is late.
+    """
+
+    def __init__(self, trade_data, game, artifacts=None, daily_reset=True, reset_time="00:00:00",
+                 prepare_ahead=600, clock=time.time, treemap_mode='flat', treemap_other_threshold=0.0):
+        """
+        Args:
+            trade_data: Instance of TradeData
+            game: Instance of TradleGame, used to pick each date's target country
+            artifacts: Optional PuzzleArtifactStore with prebuilt puzzles
+            daily_reset: Roll over to a new puzzle every day; if False the start-up puzzle is kept
+            reset_time: UTC time of day ("HH:MM:SS") when the puzzle changes
+            prepare_ahead: Seconds before the reset to start preparing the next puzzle
+            clock: Function returning the current UNIX time (for testing)
+            treemap_mode, treemap_other_threshold: Treemap mode and "Other" threshold, as for TradeTreemap
+        """
+        self.trade_data = trade_data
+        self.game = game
+        self.artifacts = artifacts
+        self.daily_reset = daily_reset
+        self.prepare_ahead = prepare_ahead
+        self.clock = clock
+        self.treemap_mode = treemap_mode
+        self.treemap_other_threshold = treemap_other_threshold
+        self.logger = logging.getLogger(__name__)
+
+        reset = datetime.datetime.strptime(reset_time, '%H:%M:%S')
+        self.reset_offset = datetime.timedelta(hours=reset.hour, minutes=reset.minute, seconds=reset.second)
+
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._next = None
+        # Kept after a reset so pages rendered just before it can still load their treemap
+        self._previous = None
+
+        now = self.clock()
+        self._state = (self._build(self.puzzle_date_at(now)), self.next_reset_after(now))
+
+        if self.daily_reset:
+            self._start_scheduler()
+            register_after_fork(self)
+
+    def current(self):
+        """Get the puzzle for the current puzzle day"""
+        puzzle, next_reset = self._state
+        if self.daily_reset and self.clock() >= next_reset:
+            puzzle = self._roll_over()
+        return puzzle
+
+    def puzzle_date_at(self, timestamp):
+        """Puzzle date in effect at a UNIX timestamp"""
+        moment = datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc)
+        return (moment - self.reset_offset).date()
+
+    def next_reset_after(self, timestamp):
+        """UNIX timestamp of the first reset after the given one"""
+        return self.puzzle_starts_at(self.puzzle_date_at(timestamp) + datetime.timedelta(days=1))
+
+    def puzzle_starts_at(self, date):
+        """UNIX timestamp of the reset that starts a puzzle date"""
+        reset = datetime.datetime.combine(date, datetime.time(), datetime.timezone.utc) + self.reset_offset
+        return reset.timestamp()
+
+    def seconds_until_reset(self):
+        """Seconds until the current puzzle is replaced (None if the daily reset is off)"""
+        if not self.daily_reset:
+            return None
+        return max(0, self._state[1] - self.clock())
+
+    def get_puzzle(self, game_number):
+        """The current or just-replaced puzzle with this game number, or None"""
+        current = self.current()
+        if current.game_number == game_number:
+            return current
+        previous = self._previous
+        if previous is not None and previous.game_number == game_number:
+            return previous
+        return None
+
+    def stop(self):
+        """Stop the scheduler thread"""
+        self._stopped.set()
+
+    def _start_scheduler(self):
+        threading.Thread(target=self._run_scheduler, daemon=True, name='daily-puzzle-scheduler').start()
+
+    def _after_fork(self):
+        """Restart the scheduler in a forked worker, with locks the parent's threads can't be holding"""
+        stopped = self._stopped.is_set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        if stopped:
+            self._stopped.set()
+        else:
+            self._start_scheduler()
+
+    def _build(self, date):
+        """Build the puzzle for a date, loading or rendering its treemap"""
+        treemap = TradeTreemap(self.trade_data, self.game, artifacts=self.artifacts, date=date,
+                               mode=self.treemap_mode, other_threshold=self.treemap_other_threshold)
+        return DailyPuzzle(date, treemap.game_number, treemap.target_country, treemap, self.puzzle_starts_at(date))
+
+    def _prepare_next(self):
+        """Build the puzzle for the upcoming day ahead of the reset"""
+        date = self.puzzle_date_at(self._state[1])
+        with self._lock:
+            if self._next is not None and self._next.date == date:
+                return self._next
+        puzzle = self._build(date)
+        with self._lock:
+            self._next = puzzle
+        self.logger.info(f"Prepared puzzle #{puzzle.game_number} for {date}")
+        return puzzle
+
+    def _roll_over(self):
+        """Swap in the puzzle for the current day if the reset has passed"""
+        with self._lock:
+            now = self.clock()
+            puzzle, next_reset = self._state
+            if now < next_reset:
+                return puzzle
+
+            date = self.puzzle_date_at(now)
+            if self._next is not None and self._next.date == date:
+                puzzle = self._next
+            else:
+                puzzle = self._build(date)
+
+            self._previous = self._state[0]
+            self._state = (puzzle, self.next_reset_after(now))
+            self._next = None
+
+        self.logger.info(f"Rolled over to puzzle #{puzzle.game_number} for {puzzle.date}")
+        return puzzle
+
+    def _run_scheduler(self):
+        """Prepare each next puzzle ahead of time and swap it in at the reset"""
+        while not self._stopped.is_set():
+            try:
+                if self._stopped.wait(max(0, self._state[1] - self.prepare_ahead - self.clock())):
+                    return
+
+                puzzle = self._prepare_next()
+                # Let a background render finish now so the first request after the reset doesn't wait on it
+                puzzle.treemap.wait_until_ready(self.prepare_ahead)
+
+                if self._stopped.wait(max(0, self._state[1] - self.clock())):
+                    return
+                self.current()
+            except Exception as e:
+                self.logger.error(f"Error preparing the next daily puzzle: {str(e)}")
+                if self._stopped.wait(60):
+                    return
@@ -0,0 +1,54 @@
+# app/services/daily_selector.py
+
+import random
+import datetime
+import hashlib
+
+# Day 1 of the game; game numbers count days from here
+LAUNCH_DATE = datetime.date(2025, 3, 1)
+
+
+class DailyCountrySelector:
+    """
+    Deterministic date -> target country mapping
+
+    The country list is sorted once up front, and each date is mapped to an index with a
+    private random.Random seeded from the date's MD5, so selection never touches the global
+    random module and gives the same country on every worker and host. The mapping is the
+    same as the original random.seed()/random.choice() implementation.
+    """
+
+    def __init__(self, countries, launch_date=LAUNCH_DATE):
+        """
+        Args:
+            countries: Iterable of country names to choose from
+            launch_date: datetime.date of game number 1
+        """
+        self.countries = tuple(sorted(countries))
+        self.launch_date = launch_date
+
+        if not self.countries:
+            raise ValueError("No countries available in trade data")
+
+    def country_for(self, date):
+        """Target country for a datetime.date"""
+        seed = int(hashlib.md5(date.strftime('%Y-%m-%d').encode()).hexdigest(), 16) % 10000
+        return random.Random(seed).choice(self.countries)
+
+    def game_number_for(self, date):
+        """Game number (days since launch, starting at 1) for a datetime.date"""
+        return (date - self.launch_date).days + 1
+
+    def puzzle_for(self, date):
+        """Tuple of (target country, game number) for a datetime.date"""
+        return self.country_for(date), self.game_number_for(date)
+
+    def upcoming(self, start_date, days):
+        """
+        List the puzzles for a run of consecutive dates
+
+        Returns:
+            List of (date, target country, game number) tuples
+        """
+        dates = (start_date + datetime.timedelta(days=offset) for offset in range(days))
+        return [(date, *self.puzzle_for(date)) for date in dates]
@@ -1,148 +1,229 @@
 # app/services/game_logic.py
 
-import random
 import datetime
-import hashlib
-from math import radians, cos, sin, asin, sqrt
+import weakref
+from app.services.country_search import AmbiguousCountry
+from app.services.daily_selector import DailyCountrySelector
+from app.services.processed_data_store import DEFAULT_FLOW
+from app.services.guess_matrix import GuessMatrix
+from app.services.neighbors import NeighborIndex
+from app.services.game_session import GameSession, GameSessionCodec, InvalidSession
 
 class TradleGame:
-    def __init__(self, trade_data, max_guesses):
-        """Initialize game with trade data"""
+    def __init__(self, trade_data, max_guesses, secret_key=None, progress_store=None,
+                 year=None, flow=DEFAULT_FLOW, similarity='cosine'):
+        """
+        Initialize game with trade data
+        
+        secret_key signs player session tokens; progress_store (a ProgressStore) records guesses.
+        year and flow pick the trade data the puzzles show: by default each country's latest
+        year of exports. similarity is the metric for the trade proximity of a guess
+        ('cosine' or 'weighted_jaccard').
+        """
         self.trade_data = trade_data
         self.max_guesses = max_guesses
-        
-        # Get target country based on date (for daily challenge)
-        self.target_country = self._get_daily_country()
-        self.game_number = self._calculate_game_number()
-        
-    def _get_daily_country(self):
-        """Get the daily target country based on current date"""
-        # Get all countries
-        countries = self.trade_data.get_countries_list()
-        
-        if not countries:
-            raise ValueError("No countries available in trade data")
-            
-        # Use today's date as seed for random selection
-        today = datetime.datetime.now().strftime('%Y-%m-%d')
-        
-        # Create a consistent hash from the date
-        seed = int(hashlib.md5(today.encode()).hexdigest(), 16) % 10000
-        
-        # Use the seed to select a country
-        random.seed(seed)
-        country = random.choice(countries)
-        random.seed()  # Reset random seed
-        
-        return country
-        
-    def _calculate_game_number(self):
-        """Calculate game number (days since launch)"""
-        # Use a fixed start date (e.g., when you launched the game)
-        start_date = datetime.datetime(2025, 3, 1)  # Example launch date
-        today = datetime.datetime.now()
-        delta = today - start_date
-        return delta.days + 1
+        self.progress_store = progress_store
+        self.year = year
+        self.flow = flow
+        
+        # Country name -> data for the puzzles' year and flow (a view, nothing is copied)
+        self.puzzle_data = trade_data.get_slice(year, flow)
+        
+        # Maps dates to target countries without touching the global random module
+        self.selector = DailyCountrySelector(sorted(self.puzzle_data.keys()))
+        
+        # Player progress lives in signed tokens held by the client, not on the server
+        self.session_codec = GameSessionCodec(secret_key, self.selector.countries) if secret_key else None
+        
+        # Pairwise distances/directions/trade proximity for evaluating guesses
+        self.guess_matrix = GuessMatrix(self.puzzle_data, similarity)
+        self._neighbor_index = None
+        
+        # Set by use_puzzle_provider to follow the daily reset instead of the start-up date
+        self.puzzle_provider = None
+        
+        # Get target country based on date (for daily challenge); puzzle days are UTC days,
+        # as the DailyPuzzleProvider that takes over from use_puzzle_provider counts them
+        self._puzzle_date = datetime.datetime.now(datetime.timezone.utc).date()
+        self._target_country = self._get_daily_country(self._puzzle_date)
+        self._game_number = self._calculate_game_number(self._puzzle_date)
+        
+    @property
+    def puzzle_mode(self):
+        """Name for a non-default year/flow, e.g. 'import-2021' (None for the latest exports)"""
+        if self.year is None and self.flow == DEFAULT_FLOW:
+            return None
+        return f"{self.flow.lower()}-{self.year or 'latest'}"
+        
+    def use_puzzle_provider(self, puzzle_provider):
+        """Take the current target, game number and date from a DailyPuzzleProvider"""
+        # The provider holds the game, so it's referenced weakly to keep the pair out of a
+        # reference cycle; the snapshot holding both keeps the provider alive
+        self.puzzle_provider = weakref.proxy(puzzle_provider)
+        
+    @property
+    def target_country(self):
+        if self.puzzle_provider is not None:
+            return self.puzzle_provider.current().target_country
+        return self._target_country
+        
+    @property
+    def game_number(self):
+        if self.puzzle_provider is not None:
+            return self.puzzle_provider.current().game_number
+        return self._game_number
+        
+    @property
+    def puzzle_date(self):
+        if self.puzzle_provider is not None:
+            return self.puzzle_provider.current().date
+        return self._puzzle_date
+        
+    def _get_daily_country(self, date=None):
+        """Get the daily target country for a date (defaults to the current puzzle date)"""
+        return self.selector.country_for(date or self.puzzle_date)
+        
+    def _calculate_game_number(self, date=None):
+        """Calculate game number (days since launch) for a date (defaults to the current puzzle date)"""
+        return self.selector.game_number_for(date or self.puzzle_date)
+        
+    def get_puzzle_for_date(self, date):
+        """Get the target country and game number for a given date"""
+        return self.selector.puzzle_for(date)
+        
+    def get_upcoming_puzzles(self, start_date, days):
+        """List (date, target country, game number) for the next days starting at start_date"""
+        return self.selector.upcoming(start_date, days)
         
     def get_current_date_string(self):
         """Get formatted date string for display"""
-        return datetime.datetime.now().strftime('%Y-%m-%d')
+        return self.puzzle_date.strftime('%Y-%m-%d')
         
     def get_current_game_number(self):
         """Get current game number"""
         return self.game_number
         
-    def check_guess(self, guess):
-        """Process a guess and return results"""
-        # Get data for both countries
-        guess_data = self.trade_data.get_country_data(guess)
-        target_data = self.trade_data.get_country_data(self.target_country)
+    def _current_puzzle(self):
+        """Target country and game number, read together so a daily reset can't split them"""
+        if self.puzzle_provider is not None:
+            puzzle = self.puzzle_provider.current()
+            return puzzle.target_country, puzzle.game_number
+        return self._target_country, self._game_number
         
-        if not guess_data:
+    def check_guess(self, guess, target_country=None):
+        """Process a guess and return results"""
+        # Read the target once so a daily reset mid-request can't mix two puzzles
+        if target_country is None:
+            target_country = self.target_country
+        
+        # Accept codes, aliases and small typos, answering with the canonical name
+        search_index = self.trade_data.get_search_index()
+        country = search_index.resolve(guess)
+        if country is None:
+            candidates = search_index.search(guess, limit=5)
+            if candidates:
+                raise AmbiguousCountry(f"Ambiguous country: {guess}", candidates)
             raise ValueError(f"Unknown country: {guess}")
-            
-        # Check if correct
-        is_correct = (guess == self.target_country)
-        
-        # Calculate distance
-        distance = self._calculate_distance(
-            guess_data['coordinates']['lat'], 
-            guess_data['coordinates']['lng'],
-            target_data['coordinates']['lat'], 
-            target_data['coordinates']['lng']
-        )
-        
-        # Calculate direction
-        direction = self._calculate_direction(
-            guess_data['coordinates']['lat'], 
-            guess_data['coordinates']['lng'],
-            target_data['coordinates']['lat'], 
-            target_data['coordinates']['lng']
-        )
-        
-        # Check export/import similarities
-        common_exports = set(guess_data.get('top_exports', [])) & set(target_data.get('top_exports', []))
-        
-        # Check region matches
-        region_match = guess_data.get('region', '') == target_data.get('region', '')
-        subregion_match = guess_data.get('subregion', '') == target_data.get('subregion', '')
+        if country not in self.guess_matrix:
+            raise ValueError(f"No trade data for {country} in this puzzle")
+        guess = country
+        
+        # Distance, direction, common exports and region matches are precomputed lookups
+        comparison = self.guess_matrix.compare(guess, target_country)
         
         # Prepare response
         result = {
             'guess': guess,
-            'correct': is_correct,
-            'distance': int(round(distance)),
-            'direction': direction,
-            'common_exports': list(common_exports),
-            'region_match': region_match,
-            'subregion_match': subregion_match
+            'correct': guess == target_country,
+            **comparison
         }
             
         return result
         
-    def _calculate_distance(self, lat1, lon1, lat2, lon2):
-        """Calculate distance between two points using Haversine formula"""
-        # Convert decimal degrees to radians
-        lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-        
-        # Haversine formula
-        dlon = lon2 - lon1
-        dlat = lat2 - lat1
-        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-        c = 2 * asin(sqrt(a))
-        r = 6371  # Radius of earth in kilometers
-        
-        return c * r
-        
-    def _calculate_direction(self, lat1, lon1, lat2, lon2):
-        """Calculate direction from point 1 to point 2"""
-        # Calculate general direction
-        lat_diff = lat2 - lat1
-        lon_diff = lon2 - lon1
-        
-        # Determine cardinal direction
-        if abs(lat_diff) < 0.001 and abs(lon_diff) < 0.001:
-            return "same"
-            
-        directions = []
-        if lat_diff > 0:
-            directions.append("N")
-        elif lat_diff < 0:
-            directions.append("S")
-            
-        if lon_diff > 0:
-            directions.append("E")
-        elif lon_diff < 0:
-            directions.append("W")
-            
-        return "".join(directions)
+    def play_guess(self, guess, session_token=None):
+        """
+        Process a guess within a player's session
+        
+        The session token (None to start a game) is verified, the guess is checked against
+        the guesses already made and max_guesses, and the result includes the updated token.
+        Tokens from an earlier day start a new game for the same player; invalid tokens start
+        a new game for a new player, which gains nothing over sending no token.
+        
+        Raises:
+            ValueError: For unknown countries, repeated guesses and finished games
+        """
+        if self.session_codec is None:
+            raise ValueError("Game sessions are not configured")
+        
+        target_country, game_number = self._current_puzzle()
+        
+        session = None
+        if session_token:
+            try:
+                session = self.session_codec.decode(session_token)
+            except InvalidSession:
+                session = None
+        if session is None:
+            session = GameSession(game_number)
+        elif session.game_number != game_number:
+            session = GameSession(game_number, player_id=session.player_id)
+        
+        if target_country in session.guesses or len(session.guesses) >= self.max_guesses:
+            raise ValueError("Game is already over")
+        
+        result = self.check_guess(guess, target_country)
+        
+        if result['guess'] in session.guesses:
+            raise ValueError(f"Already guessed: {result['guess']}")
+        
+        session = session.add_guess(result['guess'])
+        game_over = result['correct'] or len(session.guesses) >= self.max_guesses
+        
+        result.update({
+            'session': self.session_codec.encode(session),
+            'game_number': game_number,
+            'guess_number': len(session.guesses),
+            'guesses_remaining': self.max_guesses - len(session.guesses),
+            'game_over': game_over,
+            'won': result['correct']
+        })
+        if game_over and not result['correct']:
+            result['answer'] = target_country
+        
+        self.save_progress({
+            'game_number': game_number,
+            'player_id': session.player_id.hex(),
+            'guess_number': len(session.guesses),
+            'country': result['guess'],
+            'correct': result['correct'],
+            'game_over': game_over,
+            'won': result['correct']
+        })
+        
+        return result
+        
+    def get_neighbor_index(self):
+        """Geo/trade nearest-neighbour index over the puzzle countries, built on first use"""
+        if self._neighbor_index is None:
+            self._neighbor_index = NeighborIndex(self.guess_matrix)
+        return self._neighbor_index
+        
+    def get_player_id(self, session_token):
+        """Anonymous player id (hex) from a session token, or None if the token is invalid"""
+        if self.session_codec is None or not session_token:
+            return None
+        try:
+            return self.session_codec.decode(session_token).player_id.hex()
+        except InvalidSession:
+            return None
         
     def get_target_country(self):
         """Get target country (only for testing)"""
         return self.target_country
         
     def save_progress(self, data):
-        """Save game progress"""
-        # This would typically save to a database or session
-        # For now, we just return success
+        """Queue a guess event for the progress store (written in the background)"""
+        if self.progress_store is None:
+            return False
+        self.progress_store.record_guess(data)
         return True
\ No newline at end of file
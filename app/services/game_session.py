@@ -0,0 +1,101 @@
+# app/services/game_session.py
+
+import os
+import base64
+import hashlib
+import hmac
+import struct
+
+TOKEN_VERSION = 2
+MAC_SIZE = 16
+PLAYER_ID_SIZE = 8
+
+# version, data tag, player id, game number, guess count
+HEADER = struct.Struct(f'>B4s{PLAYER_ID_SIZE}sIB')
+
+
+class InvalidSession(ValueError):
+    """Raised when a session token is malformed, tampered with or from other data"""
+
+
+class GameSession:
+    """
+    A player's progress in one daily game: the game number and the guesses made so far
+
+    player_id is a random anonymous id carried from one day's session to the next, so
+    progress can be linked into streaks without accounts.
+    """
+
+    __slots__ = ('game_number', 'guesses', 'player_id')
+
+    def __init__(self, game_number, guesses=(), player_id=None):
+        self.game_number = game_number
+        self.guesses = tuple(guesses)
+        self.player_id = player_id or os.urandom(PLAYER_ID_SIZE)
+
+    def add_guess(self, country):
+        """Return a new session with one more guess"""
+        return GameSession(self.game_number, self.guesses + (country,), self.player_id)
+
+
+class GameSessionCodec:
+    """
+    Encodes GameSessions as compact signed tokens so no player state is kept on the server
+
+    A token is base64url(version | data tag | player id | game number | guess count | guess indices | MAC),
+    where guesses are indices into the sorted country list and the MAC is a truncated
+    HMAC-SHA256 keyed with the app's SECRET_KEY. The data tag ties tokens to the country list
+    they were issued for, so indices can't be misread after the data changes.
+    """
+
+    def __init__(self, secret_key, countries):
+        """
+        Args:
+            secret_key: Key for signing tokens (the app's SECRET_KEY)
+            countries: Sorted sequence of country names that guesses index into
+        """
+        if not secret_key:
+            raise ValueError("SECRET_KEY is required to sign game sessions")
+
+        self.key = secret_key.encode('utf-8') if isinstance(secret_key, str) else secret_key
+        self.countries = tuple(countries)
+        self.index = {name: i for i, name in enumerate(self.countries)}
+        self.data_tag = hashlib.sha256('\n'.join(self.countries).encode('utf-8')).digest()[:4]
+
+    def encode(self, session):
+        """Serialize and sign a GameSession"""
+        body = HEADER.pack(TOKEN_VERSION, self.data_tag, session.player_id, session.game_number, len(session.guesses))
+        body += struct.pack(f'>{len(session.guesses)}H', *(self.index[c] for c in session.guesses))
+        return base64.urlsafe_b64encode(body + self._mac(body)).rstrip(b'=').decode('ascii')
+
+    def decode(self, token):
+        """
+        Verify and parse a token
+
+        Raises:
+            InvalidSession: If the token is malformed, its signature doesn't match or it was
+                issued for different data
+        """
+        try:
+            raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        except (TypeError, ValueError):
+            raise InvalidSession("Malformed session token")
+
+        body, mac = raw[:-MAC_SIZE], raw[-MAC_SIZE:]
+        if len(body) < HEADER.size or not hmac.compare_digest(mac, self._mac(body)):
+            raise InvalidSession("Invalid session token")
+
+        version, data_tag, player_id, game_number, count = HEADER.unpack_from(body)
+        if version != TOKEN_VERSION or data_tag != self.data_tag:
+            raise InvalidSession("Session token was issued for different game data")
+        if len(body) != HEADER.size + 2 * count:
+            raise InvalidSession("Malformed session token")
+
+        indices = struct.unpack_from(f'>{count}H', body, HEADER.size)
+        if any(i >= len(self.countries) for i in indices):
+            raise InvalidSession("Malformed session token")
+
+        return GameSession(game_number, (self.countries[i] for i in indices), player_id)
+
+    def _mac(self, body):
+        return hmac.new(self.key, body, hashlib.sha256).digest()[:MAC_SIZE]
@@ -0,0 +1,98 @@
+# app/services/guess_matrix.py
+
+import numpy as np
+
+from app.services.trade_similarity import SIMILARITY_METRICS, export_profile_matrix
+
+EARTH_RADIUS_KM = 6371
+
+# Direction codes: bit 0/1 for N/S, bit 2/3 for E/W; SAME marks coincident coordinates
+DIRECTION_NAMES = ('', 'N', 'S', '', 'E', 'NE', 'SE', '', 'W', 'NW', 'SW', '', '', '', '', '', 'same')
+SAME = 16
+
+
+class GuessMatrix:
+    """
+    Precomputed guess -> target feedback for every pair of countries
+
+    Distances (haversine, rounded to whole km), compass directions and the similarity of
+    the two countries' full export profiles ("trade proximity", in percent) are computed
+    once with NumPy into N x N arrays, and each country's top exports are kept as a
+    frozenset, so evaluating a guess is a couple of array lookups.
+    """
+
+    def __init__(self, countries_data, similarity='cosine'):
+        """
+        Args:
+            countries_data: Mapping of country name -> country data (as from TradeData.get_all_countries_data)
+            similarity: Export profile similarity metric, a key of SIMILARITY_METRICS
+        """
+        if similarity not in SIMILARITY_METRICS:
+            raise ValueError(f"Unknown similarity metric: {similarity}")
+
+        self.countries = list(countries_data.keys())
+        self.index = {name: i for i, name in enumerate(self.countries)}
+
+        records = [countries_data[name] for name in self.countries]
+        lat = np.array([data['coordinates']['lat'] for data in records], dtype=float)
+        lng = np.array([data['coordinates']['lng'] for data in records], dtype=float)
+
+        self.distances = self._haversine_matrix(lat, lng)
+        self.directions = self._direction_matrix(lat, lng)
+
+        profiles, _ = export_profile_matrix(countries_data, self.countries)
+        # Rounded once here so a guess only has to read its value out
+        self.trade_proximity = np.round(SIMILARITY_METRICS[similarity](profiles) * 100, 1)
+
+        self.top_exports = [data.get('top_exports', []) for data in records]
+        self.top_export_sets = [frozenset(exports) for exports in self.top_exports]
+        self.regions = [data.get('region', '') for data in records]
+        self.subregions = [data.get('subregion', '') for data in records]
+
+    def __contains__(self, country_name):
+        return country_name in self.index
+
+    def compare(self, guess, target):
+        """
+        Feedback for a guess against a target
+
+        Returns:
+            Dict with distance, direction, common_exports, trade_proximity, region_match and
+            subregion_match
+        """
+        g = self.index[guess]
+        t = self.index[target]
+
+        common = self.top_export_sets[g] & self.top_export_sets[t]
+
+        return {
+            'distance': int(self.distances[g, t]),
+            'direction': DIRECTION_NAMES[self.directions[g, t]],
+            'common_exports': [name for name in self.top_exports[t] if name in common],
+            'trade_proximity': self.trade_proximity[g, t].item(),
+            'region_match': self.regions[g] == self.regions[t],
+            'subregion_match': self.subregions[g] == self.subregions[t]
+        }
+
+    @staticmethod
+    def _haversine_matrix(lat, lng):
+        """Great-circle distance in km between every pair of points, rounded to int"""
+        lat, lng = np.radians(lat), np.radians(lng)
+
+        dlat = lat[None, :] - lat[:, None]
+        dlng = lng[None, :] - lng[:, None]
+        a = np.sin(dlat / 2) ** 2 + np.cos(lat[:, None]) * np.cos(lat[None, :]) * np.sin(dlng / 2) ** 2
+        distance = 2 * np.arcsin(np.sqrt(a)) * EARTH_RADIUS_KM
+
+        return np.round(distance).astype(np.int32)
+
+    @staticmethod
+    def _direction_matrix(lat, lng):
+        """Compass direction code from each row's point to each column's point"""
+        lat_diff = lat[None, :] - lat[:, None]
+        lng_diff = lng[None, :] - lng[:, None]
+
+        codes = ((lat_diff > 0) * 1 + (lat_diff < 0) * 2 + (lng_diff > 0) * 4 + (lng_diff < 0) * 8).astype(np.uint8)
+        codes[(np.abs(lat_diff) < 0.001) & (np.abs(lng_diff) < 0.001)] = SAME
+
+        return codes
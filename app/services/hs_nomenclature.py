@@ -0,0 +1,75 @@
+# app/services/hs_nomenclature.py
+
+# HS sections as (id, name, first chapter, last chapter). XXII is not part of the HS; it
+# gathers chapters 98-99, which countries reserve for national use and unspecified goods.
+HS_SECTIONS = (
+    ('I', 'Live animals; animal products', 1, 5),
+    ('II', 'Vegetable products', 6, 14),
+    ('III', 'Animal, vegetable or microbial fats and oils', 15, 15),
+    ('IV', 'Prepared foodstuffs; beverages, spirits and vinegar; tobacco', 16, 24),
+    ('V', 'Mineral products', 25, 27),
+    ('VI', 'Products of the chemical or allied industries', 28, 38),
+    ('VII', 'Plastics and rubber and articles thereof', 39, 40),
+    ('VIII', 'Raw hides and skins, leather, furskins and articles thereof', 41, 43),
+    ('IX', 'Wood, cork, straw and plaiting materials and articles thereof', 44, 46),
+    ('X', 'Pulp of wood; paper and paperboard and articles thereof', 47, 49),
+    ('XI', 'Textiles and textile articles', 50, 63),
+    ('XII', 'Footwear, headgear, umbrellas; prepared feathers; artificial flowers', 64, 67),
+    ('XIII', 'Articles of stone, plaster, cement, asbestos, mica; ceramic products; glass', 68, 70),
+    ('XIV', 'Pearls, precious stones, precious metals and articles thereof; jewellery; coin', 71, 71),
+    ('XV', 'Base metals and articles of base metal', 72, 83),
+    ('XVI', 'Machinery and mechanical appliances; electrical equipment', 84, 85),
+    ('XVII', 'Vehicles, aircraft, vessels and associated transport equipment', 86, 89),
+    ('XVIII', 'Optical, medical and precision instruments; clocks and watches; musical instruments', 90, 92),
+    ('XIX', 'Arms and ammunition', 93, 93),
+    ('XX', 'Miscellaneous manufactured articles', 94, 96),
+    ('XXI', "Works of art, collectors' pieces and antiques", 97, 97),
+    ('XXII', 'Commodities not specified according to kind', 98, 99),
+)
+
+SECTION_NAMES = {section: name for section, name, _, _ in HS_SECTIONS}
+SECTION_ORDER = {section: i for i, (section, _, _, _) in enumerate(HS_SECTIONS)}
+CHAPTER_SECTIONS = {
+    chapter: section for section, _, first, last in HS_SECTIONS for chapter in range(first, last + 1)
+}
+
+
+def hs_code(raw):
+    """
+    Normalise a cmdCode to its HS digits: '1' -> '01' (chapter), '101' -> '0101' (heading)
+
+    Codes lose their leading zero when the CSV stores them as numbers. Returns None for
+    codes that aren't HS (e.g. 'TOTAL').
+    """
+    code = str(raw).strip()
+    if code.endswith('.0'):
+        code = code[:-2]
+    if not code.isdigit() or len(code) > 6:
+        return None
+    return code.zfill(len(code) + len(code) % 2)
+
+
+def hs_parent(code):
+    """Parent node of an HS node: heading -> chapter -> section -> '' (the root)"""
+    if code in SECTION_NAMES:
+        return ''
+    if len(code) > 2:
+        return code[:-2]
+    return CHAPTER_SECTIONS.get(int(code), 'XXII')
+
+
+def hs_ancestors(code):
+    """The HS nodes above a commodity code, from its section down to its parent"""
+    ancestors = []
+    node = hs_parent(code)
+    while node:
+        ancestors.append(node)
+        node = hs_parent(node)
+    return ancestors[::-1]
+
+
+def hs_sort_key(code):
+    """Orders HS nodes depth first: a section, then each of its chapters followed by their headings"""
+    if code in SECTION_ORDER:
+        return SECTION_ORDER[code], ''
+    return SECTION_ORDER[hs_ancestors(code)[0]], code
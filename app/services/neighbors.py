@@ -0,0 +1,82 @@
+# app/services/neighbors.py
+
+import numpy as np
+
+from app.services.payloads import PrecompressedPayload
+
+NEIGHBOR_KINDS = ('geo', 'trade')
+
+
+class NeighborIndex:
+    """
+    k-nearest-neighbour lookups by geography or export profile
+
+    Built over a GuessMatrix, whose haversine distances and trade proximities are already
+    computed for every pair, by sorting each country's row once: geo neighbours by
+    ascending distance, trade neighbours by descending proximity. A query is then a slice
+    of one precomputed row rather than a scan over all countries. Responses are cached
+    as precompressed payloads for the life of the index, i.e. one data snapshot.
+    """
+
+    def __init__(self, guess_matrix, max_k=50):
+        """
+        Args:
+            guess_matrix: GuessMatrix of the game's countries
+            max_k: Largest number of neighbours a query may ask for
+        """
+        self.matrix = guess_matrix
+        self.max_k = max_k
+
+        n = len(guess_matrix.countries)
+        dtype = np.int16 if n < 2 ** 15 else np.int32
+        # Stable sorts, so ties keep country order; each row's own country is dropped at query time
+        self.orders = {
+            'geo': np.argsort(guess_matrix.distances, axis=1, kind='stable').astype(dtype),
+            'trade': np.argsort(-guess_matrix.trade_proximity, axis=1, kind='stable').astype(dtype)
+        }
+        self._payloads = {}
+
+    def neighbors(self, country, by='geo', k=5):
+        """
+        The k countries closest to a country
+
+        Args:
+            country: Country name (as in the guess matrix)
+            by: 'geo' for great-circle distance or 'trade' for export profile similarity
+            k: Number of neighbours, at most max_k
+
+        Returns:
+            List of dicts with country, distance (km) and trade_proximity (percent), closest first
+
+        Raises:
+            KeyError: For a country not in the index
+            ValueError: For an unknown kind or k out of range
+        """
+        if by not in NEIGHBOR_KINDS:
+            raise ValueError(f"Unknown neighbour kind: {by}")
+        if not 1 <= k <= self.max_k:
+            raise ValueError(f"k must be between 1 and {self.max_k}")
+
+        matrix = self.matrix
+        i = matrix.index[country]
+        row = self.orders[by][i, :k + 1]
+        row = row[row != i][:k].tolist()
+
+        distances = matrix.distances[i, row].tolist()
+        proximities = matrix.trade_proximity[i, row].tolist()
+        return [
+            {'country': matrix.countries[j], 'distance': distance, 'trade_proximity': proximity}
+            for j, distance, proximity in zip(row, distances, proximities)
+        ]
+
+    def payload(self, country, by='geo', k=5):
+        """neighbors() as a precompressed JSON payload, built once per (country, by, k)"""
+        key = (country, by, k)
+        payload = self._payloads.get(key)
+        if payload is None:
+            payload = self._payloads.setdefault(key, PrecompressedPayload.from_json({
+                'country': country,
+                'by': by,
+                'neighbors': self.neighbors(country, by, k)
+            }))
+        return payload
@@ -0,0 +1,59 @@
+# app/services/payloads.py
+
+import gzip
+import hashlib
+import json
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only gzip and identity bodies are offered
+    brotli = None
+
+
+class PrecompressedPayload:
+    """
+    An immutable response body serialized and compressed once
+
+    Holds the identity, gzip and (when the brotli package is installed) brotli encodings of
+    the same bytes, each with its own strong ETag derived from the content hash.
+    """
+
+    def __init__(self, body, mimetype='application/json'):
+        """
+        Args:
+            body: Response body as bytes
+            mimetype: Content type of the body
+        """
+        self.mimetype = mimetype
+        self.content_type = f"{mimetype}; charset=utf-8" if mimetype.startswith('text/') else mimetype
+        self.digest = hashlib.sha256(body).hexdigest()[:32]
+
+        self.bodies = {'identity': body, 'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            self.bodies['br'] = brotli.compress(body, quality=11)
+
+        self.etags = {
+            encoding: self.digest if encoding == 'identity' else f"{self.digest}-{encoding}"
+            for encoding in self.bodies
+        }
+
+    @classmethod
+    def from_json(cls, obj):
+        """Serialize a JSON-compatible object compactly into a payload"""
+        return cls(json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8'))
+
+    def select_encoding(self, accept_encodings):
+        """
+        Pick the smallest encoding the client accepts
+
+        Args:
+            accept_encodings: werkzeug Accept object from request.accept_encodings
+        """
+        for encoding in ('br', 'gzip'):
+            if encoding in self.bodies and accept_encodings[encoding] > 0:
+                return encoding
+        return 'identity'
+
+    def matches(self, etags):
+        """Whether any of the client's If-None-Match ETags identifies this payload"""
+        return any(etags.contains_weak(etag) for etag in self.etags.values()) or etags.star_tag
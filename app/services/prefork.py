@@ -0,0 +1,81 @@
+# app/services/prefork.py
+
+import gc
+import os
+import logging
+import weakref
+
+
+# Objects whose _after_fork method runs in each child process after a fork
+_after_fork_objects = weakref.WeakSet()
+_after_fork_registered = False
+
+
+def register_after_fork(obj):
+    """
+    Call obj._after_fork() in each child process after a fork, for as long as obj lives
+
+    Threads don't survive fork(), so objects that run background threads (the puzzle
+    scheduler, the progress writer, a treemap render) use this to restart them in workers
+    forked from a preloading master. Objects are held weakly by a single at-fork callback,
+    so the ones a reload replaces (and their snapshots) can be collected.
+    """
+    global _after_fork_registered
+    if not hasattr(os, 'register_at_fork'):
+        return
+    _after_fork_objects.add(obj)
+    if not _after_fork_registered:
+        os.register_at_fork(after_in_child=_run_after_fork)
+        _after_fork_registered = True
+
+
+def _run_after_fork():
+    for obj in list(_after_fork_objects):
+        obj._after_fork()
+
+
+def preload(app):
+    """
+    Build the shared read-only state in the master process and freeze it before forking workers
+
+    Everything workers would otherwise build on first use (country dicts, search index,
+    countries payload, neighbour index, today's treemap payload) is built once here.
+    gc.freeze() then moves it all to the permanent generation, so garbage collections in
+    the workers never write to those objects' headers and their pages stay shared
+    copy-on-write. Collection is left disabled in the master and re-enabled in each worker
+    after the fork. The master's watcher and scheduler still replace snapshots there; the
+    objects of a snapshot keep no reference cycles among themselves, so a replaced one is
+    freed by reference counting alone (frozen or not), with its memory map.
+
+    Args:
+        app: The Flask app, or an ASGI app from create_asgi_app wrapping one
+    """
+    logger = logging.getLogger(__name__)
+    flask_app = getattr(getattr(app, 'state', None), 'flask_app', app)
+
+    snapshot = flask_app.snapshots.current()
+    trade_data = snapshot.trade_data
+    for country_name in trade_data.get_countries_list():
+        trade_data.get_country_data(country_name)
+    # Records for the puzzles' year and flow, when that isn't the default view
+    puzzle_data = snapshot.game.puzzle_data
+    for country_name in puzzle_data:
+        puzzle_data.get(country_name)
+    snapshot.game.get_neighbor_index()
+    trade_data.get_countries_payload()
+    trade_data.get_search_index()
+
+    puzzle = snapshot.puzzles.current()
+    try:
+        puzzle.treemap_payload()
+    except RuntimeError as e:
+        logger.warning(f"Not preloading the treemap for puzzle #{puzzle.game_number}: {str(e)}")
+
+    gc.disable()
+    gc.collect()
+    gc.freeze()
+    if hasattr(os, 'register_at_fork'):
+        # Pick up anything the master allocated since, and let workers collect their own garbage
+        os.register_at_fork(before=gc.freeze, after_in_child=gc.enable)
+
+    logger.info(f"Preloaded app state, {gc.get_freeze_count()} objects frozen")
@@ -0,0 +1,331 @@
+import os
+import sys
+import mmap
+import json
+import struct
+import weakref
+from collections.abc import Mapping
+
+import numpy as np
+
+from app.models.country_record import ARRAY_KEYS, CountryRecord
+
+# File layout: MAGIC | header length (uint64) | JSON header | padding | aligned arrays
+MAGIC = b'TRDLBIN3'
+ALIGNMENT = 64
+
+# Flow of the default view (the classic puzzle: what a country exports)
+DEFAULT_FLOW = 'Export'
+
+
+def select_slices(keys, year=None, flow=DEFAULT_FLOW):
+    """
+    Pick one slice per country for a (year, flow) view
+
+    Parameters:
+    - keys: List of (country, year, flow) slice keys
+    - year: Year to select, or None for each country's latest year with that flow
+    - flow: Trade flow ('Export', 'Import', ...)
+
+    Returns:
+    - Dict of country -> index into keys, in order of each country's first matching slice
+    """
+    selected = {}
+    for i, (country, slice_year, slice_flow) in enumerate(keys):
+        if slice_flow != flow or (year is not None and slice_year != year):
+            continue
+        current = selected.get(country)
+        if current is None or slice_year > keys[current][1]:
+            selected[country] = i
+    return selected
+
+
+class TradeSlice(Mapping):
+    """
+    Country name -> CountryRecord for one year and flow of a ProcessedDataStore
+
+    Records are shared with the store and with every other view that selects the same
+    slice, so switching a puzzle to another year or flow copies nothing. The store, which
+    caches its slices, is only referenced weakly: without a cycle between them a replaced
+    store is freed as soon as it is dropped, even where the cyclic GC is off (a preloading
+    gunicorn master).
+    """
+
+    def __init__(self, store, year, flow, slice_ids):
+        self.store = weakref.proxy(store)
+        self.year = year
+        self.flow = flow
+        self.slice_ids = slice_ids
+
+    def __getitem__(self, country_name):
+        return self.store.record(self.slice_ids[country_name])
+
+    def __iter__(self):
+        return iter(self.slice_ids)
+
+    def __len__(self):
+        return len(self.slice_ids)
+
+    def __contains__(self, country_name):
+        return country_name in self.slice_ids
+
+
+class ProcessedDataStore(Mapping):
+    """
+    Read-only, memory-mapped view of processed trade data
+
+    Data is held per slice: one reporter's trade for a (country, year, flow). The file
+    holds a small JSON header (country, commodity, HS node and flow tables) followed by flat
+    NumPy arrays of slice keys, commodity ids, values and percentages, and of each slice's
+    values summed per HS node. The arrays are
+    memory-mapped, so every worker on a host shares one copy through the page cache. Each
+    slice is a CountryRecord holding views into those arrays.
+
+    As a Mapping the store is the default view, each country's latest year of exports,
+    which behaves like the usual countries_data dict; slice() gives any other year or flow.
+    """
+
+    def __init__(self, path):
+        """
+        Open a processed data file
+
+        Parameters:
+        - path: Path to a file written by ProcessedDataStore.write
+        """
+        self.path = path
+        # The header and every array come from one map of one open file, so a new file
+        # renamed over path while this one loads can't mix the two
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # An empty file can't be mapped
+                raise ValueError(f"Not a processed trade data file: {path}")
+        # Inode and mtime of the file actually mapped, to tell a newer file published at path
+        self.file_identity = (stat.st_ino, stat.st_mtime_ns)
+        self.header = self._read_header(self._map, path)
+        self.fingerprint = self.header.get('fingerprint')
+
+        self.countries = self.header['countries']
+        # Each commodity name exists once, however many countries export it
+        self.commodities = tuple(sys.intern(name) for name in self.header['commodities'])
+        self.commodity_codes = dict(zip(self.commodities, self.header['commodity_codes']))
+        self.hs_nodes = tuple(self.header['hs_nodes'])
+        self.flows = self.header['flows']
+        self.attributes = self.header['attributes']
+
+        # Plain ndarray views of the map, so the per-slice views stay lightweight
+        self.arrays = {name: self._map_array(spec) for name, spec in self.header['arrays'].items()}
+
+        self.slice_keys = [
+            (self.countries[country], year, self.flows[flow])
+            for country, year, flow in zip(
+                self.arrays['slice_country'].tolist(),
+                self.arrays['slice_year'].tolist(),
+                self.arrays['slice_flow'].tolist()
+            )
+        ]
+        self._records = [None] * len(self.slice_keys)
+        self._slices = {}
+
+        # The default view is built up front so a preloading master shares it with its workers
+        self.default = self.slice()
+        for slice_id in self.default.slice_ids.values():
+            self.record(slice_id)
+
+    def _map_array(self, spec):
+        """Read-only array over the mapped file, checked to lie within it"""
+        shape = tuple(spec['shape'])
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(shape))
+        if not count:
+            return np.empty(shape, dtype=dtype)
+        if spec['offset'] + count * dtype.itemsize > len(self._map):
+            raise ValueError(f"Truncated processed trade data file: {self.path}")
+        return np.frombuffer(self._map, dtype=dtype, count=count, offset=spec['offset']).reshape(shape)
+
+    @staticmethod
+    def read_header(path):
+        """Read only the JSON header of a processed data file"""
+        with open(path, 'rb') as f:
+            return ProcessedDataStore._read_header(f, path)
+
+    @staticmethod
+    def _read_header(f, path):
+        """Check the magic and read the JSON header from a file object or map positioned at its start"""
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not a processed trade data file: {path}")
+        length = f.read(8)
+        if len(length) != 8:
+            raise ValueError(f"Truncated processed trade data file: {path}")
+        (header_length,) = struct.unpack('<Q', length)
+        header = f.read(header_length)
+        if len(header) != header_length:
+            raise ValueError(f"Truncated processed trade data file: {path}")
+        return json.loads(header)
+
+    @staticmethod
+    def write(path, countries_data, fingerprint=None, slices=None, commodity_codes=None):
+        """
+        Write processed data to path in the binary layout
+
+        Parameters:
+        - path: Output file path (or an open binary file object)
+        - countries_data: Dict of country name -> country data as built by TradeDataLoader;
+          only written when slices isn't given, as export slices with year 0
+        - fingerprint: Optional description of the inputs, stored in the header for cache checks
+        - slices: Dict of (country, year, flow) -> country data, as TradeDataLoader.slices_data
+        - commodity_codes: Optional dict of commodity name -> HS code, as TradeDataLoader.commodity_codes
+        """
+        if slices is None:
+            slices = {(name, 0, DEFAULT_FLOW): data for name, data in countries_data.items()}
+
+        country_ids, commodity_ids, flow_ids, node_ids = {}, {}, {}, {}
+        attributes = []
+
+        slice_country, slice_year, slice_flow = [], [], []
+        offsets = [0]
+        ids, values, percentages, totals = [], [], [], []
+        lat, lng = [], []
+        hs_offsets, hs_ids, hs_values = [0], [], []
+
+        for (name, year, flow), data in slices.items():
+            if name not in country_ids:
+                country_ids[name] = len(country_ids)
+                lat.append(data['coordinates']['lat'])
+                lng.append(data['coordinates']['lng'])
+                attributes.append({key: value for key, value in data.items() if key not in ARRAY_KEYS})
+            slice_country.append(country_ids[name])
+            slice_year.append(year)
+            slice_flow.append(flow_ids.setdefault(flow, len(flow_ids)))
+
+            exports = data['exports']
+            export_percentages = data.get('export_percentages', {})
+            for commodity, value in exports.items():
+                ids.append(commodity_ids.setdefault(commodity, len(commodity_ids)))
+                values.append(value)
+                percentages.append(export_percentages.get(commodity, 0.0))
+            offsets.append(len(ids))
+            totals.append(data.get('total_exports', 0))
+
+            for node, value in data.get('hs_aggregates', {}).items():
+                hs_ids.append(node_ids.setdefault(node, len(node_ids)))
+                hs_values.append(value)
+            hs_offsets.append(len(hs_ids))
+
+        arrays = {
+            'slice_country': np.asarray(slice_country, dtype='<i4'),
+            'slice_year': np.asarray(slice_year, dtype='<i4'),
+            'slice_flow': np.asarray(slice_flow, dtype='<i4'),
+            'offsets': np.asarray(offsets, dtype='<i8'),
+            'commodity_ids': np.asarray(ids, dtype='<i4'),
+            'values': np.asarray(values, dtype='<f8'),
+            'percentages': np.asarray(percentages, dtype='<f8'),
+            'total_exports': np.asarray(totals, dtype='<f8'),
+            'lat': np.asarray(lat, dtype='<f8'),
+            'lng': np.asarray(lng, dtype='<f8'),
+            'hs_offsets': np.asarray(hs_offsets, dtype='<i8'),
+            'hs_node_ids': np.asarray(hs_ids, dtype='<i4'),
+            'hs_values': np.asarray(hs_values, dtype='<f8'),
+        }
+
+        header = {
+            'countries': list(country_ids.keys()),
+            'commodities': list(commodity_ids.keys()),
+            'commodity_codes': [(commodity_codes or {}).get(commodity) for commodity in commodity_ids],
+            'hs_nodes': list(node_ids.keys()),
+            'flows': list(flow_ids.keys()),
+            'attributes': attributes,
+            'fingerprint': fingerprint,
+            'arrays': {}
+        }
+        # Array offsets depend on the header length, so lay out the header until it is stable
+        data_start = 0
+        while True:
+            position = data_start
+            for name, array in arrays.items():
+                header['arrays'][name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': position}
+                position = _align(position + array.nbytes)
+            header_bytes = json.dumps(header).encode('utf-8')
+            required_start = _align(len(MAGIC) + 8 + len(header_bytes))
+            if required_start == data_start:
+                break
+            data_start = required_start
+
+        def _write(f):
+            start = f.tell()
+            f.write(MAGIC)
+            f.write(struct.pack('<Q', len(header_bytes)))
+            f.write(header_bytes)
+            for name, array in arrays.items():
+                f.write(b'\0' * (start + header['arrays'][name]['offset'] - f.tell()))
+                f.write(array.tobytes())
+
+        if hasattr(path, 'write'):
+            _write(path)
+        else:
+            with open(path, 'wb') as f:
+                _write(f)
+
+    def slice(self, year=None, flow=DEFAULT_FLOW):
+        """
+        Country name -> CountryRecord for one year and flow, cached per (year, flow)
+
+        Parameters:
+        - year: Year to select, or None for each country's latest year with that flow
+        - flow: Trade flow ('Export', 'Import', ...)
+        """
+        view = self._slices.get((year, flow))
+        if view is None:
+            view = self._slices.setdefault(
+                (year, flow), TradeSlice(self, year, flow, select_slices(self.slice_keys, year, flow))
+            )
+        return view
+
+    def record(self, slice_id):
+        """CountryRecord for a slice, built on first use"""
+        record = self._records[slice_id]
+        if record is None:
+            record = self._records[slice_id] = self._build_record(slice_id)
+        return record
+
+    def __getitem__(self, country_name):
+        return self.default[country_name]
+
+    def __iter__(self):
+        return iter(self.default)
+
+    def __len__(self):
+        return len(self.default)
+
+    def __contains__(self, country_name):
+        return country_name in self.default
+
+    def _build_record(self, i):
+        """CountryRecord for the i-th slice, over slices of the mapped arrays"""
+        start, end = self.arrays['offsets'][i:i + 2].tolist()
+        hs_start, hs_end = self.arrays['hs_offsets'][i:i + 2].tolist()
+        country = self.arrays['slice_country'][i].item()
+        name, year, flow = self.slice_keys[i]
+        return CountryRecord(
+            name,
+            self.commodities,
+            self.arrays['commodity_ids'][start:end],
+            self.arrays['values'][start:end],
+            self.arrays['percentages'][start:end],
+            self.arrays['lat'][country].item(),
+            self.arrays['lng'][country].item(),
+            self.arrays['total_exports'][i].item(),
+            self.attributes[country],
+            year=year,
+            flow=flow,
+            hs_nodes=self.hs_nodes,
+            hs_node_ids=self.arrays['hs_node_ids'][hs_start:hs_end],
+            hs_values=self.arrays['hs_values'][hs_start:hs_end]
+        )
+
+
+def _align(position):
+    """Round position up to the next array alignment boundary"""
+    return -(-position // ALIGNMENT) * ALIGNMENT
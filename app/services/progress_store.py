@@ -0,0 +1,333 @@
+# app/services/progress_store.py
+
+import os
+import time
+import queue
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+
+from app.services.prefork import register_after_fork
+
+
+class ProgressStore(ABC):
+    """
+    Interface for recording guesses and reading game statistics
+
+    Guess events are dicts with game_number, player_id (hex), guess_number, country,
+    correct, game_over and won.
+    """
+
+    @abstractmethod
+    def record_guess(self, event):
+        """Record one guess event; must not block on storage"""
+
+    @abstractmethod
+    def get_day_stats(self, game_number):
+        """Aggregate stats for one daily game"""
+
+    @abstractmethod
+    def get_player_stats(self, player_id, current_game_number=None):
+        """
+        Games played, wins, streaks and guess distribution for one player
+
+        The current streak only counts while the player's latest result is for the current
+        game or the one before it (when current_game_number is given).
+        """
+
+    def flush(self, timeout=None):
+        """Wait until every event recorded so far has been written"""
+
+    def close(self):
+        """Flush and release resources"""
+
+
+class BatchedProgressStore(ProgressStore):
+    """
+    Base for stores that write in batches from a background thread
+
+    record_guess only puts the event on an in-process queue. A writer thread drains the
+    queue and hands batches of up to batch_size events to _write_batch, waiting at most
+    flush_interval seconds to fill a batch, so requests never wait on storage.
+    """
+
+    def __init__(self, batch_size=500, flush_interval=1.0, max_queue_size=100000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue_size = max_queue_size
+        self.logger = logging.getLogger(__name__)
+
+        self._closed = False
+        self._start_writer()
+        register_after_fork(self)
+
+    def record_guess(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.logger.warning("Progress queue is full, dropping guess event")
+
+    def flush(self, timeout=None):
+        """Wait until the writer has processed everything queued so far"""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join()
+
+    @abstractmethod
+    def _write_batch(self, events):
+        """Persist a batch of events in one transaction"""
+
+    def _start_writer(self):
+        self._queue = queue.Queue(maxsize=self.max_queue_size)
+        self._writer = threading.Thread(target=self._run_writer, daemon=True, name='progress-writer')
+        self._writer.start()
+
+    def _after_fork(self):
+        """Start a writer of our own in a forked worker; events queued in the parent are written there"""
+        if not self._closed:
+            self._start_writer()
+
+    def _run_writer(self):
+        while True:
+            item = self._queue.get()
+            batch, markers, stop = [], [], False
+
+            # Collect a batch until it is full, the interval passes, or a flush/close arrives
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is None:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    markers.append(item)
+                else:
+                    batch.append(item)
+
+                if stop or markers or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+
+            if batch:
+                try:
+                    self._write_batch(batch)
+                except Exception as e:
+                    self.logger.error(f"Error writing {len(batch)} guess events: {str(e)}")
+
+            for marker in markers:
+                marker.set()
+            if stop:
+                return
+
+
+class SQLiteProgressStore(BatchedProgressStore):
+    """
+    Reference ProgressStore backed by a local SQLite database in WAL mode
+
+    Raw guesses go to guess_events and finished games to player_results. Per-day totals
+    (day_stats) and win distributions (day_distribution) are updated incrementally in the
+    same transaction, so reading a day's stats never scans the raw events. A player's
+    game counts towards the wins and losses once, however often its end is recorded.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS guess_events (
+            id INTEGER PRIMARY KEY,
+            game_number INTEGER NOT NULL,
+            player_id TEXT NOT NULL,
+            guess_number INTEGER NOT NULL,
+            country TEXT NOT NULL,
+            correct INTEGER NOT NULL,
+            created_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS player_results (
+            player_id TEXT NOT NULL,
+            game_number INTEGER NOT NULL,
+            won INTEGER NOT NULL,
+            guesses INTEGER NOT NULL,
+            PRIMARY KEY (player_id, game_number)
+        );
+        CREATE TABLE IF NOT EXISTS day_stats (
+            game_number INTEGER PRIMARY KEY,
+            players INTEGER NOT NULL DEFAULT 0,
+            guesses INTEGER NOT NULL DEFAULT 0,
+            wins INTEGER NOT NULL DEFAULT 0,
+            losses INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS day_distribution (
+            game_number INTEGER NOT NULL,
+            guesses INTEGER NOT NULL,
+            wins INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (game_number, guesses)
+        );
+    """
+
+    def __init__(self, path, **kwargs):
+        """
+        Args:
+            path: SQLite database file (created if missing)
+            **kwargs: Batching options for BatchedProgressStore
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        connection = self._connect()
+        try:
+            # Switching the journal mode needs an exclusive lock and doesn't wait on the busy
+            # timeout; when several workers start together, one of them switching it is enough
+            if connection.execute('PRAGMA journal_mode').fetchone()[0] != 'wal':
+                try:
+                    connection.execute('PRAGMA journal_mode=WAL')
+                except sqlite3.OperationalError:
+                    pass
+            with connection:
+                connection.executescript(self.SCHEMA)
+        finally:
+            connection.close()
+
+        self._local = threading.local()
+        super().__init__(**kwargs)
+
+    def _after_fork(self):
+        # SQLite connections must not be used across a fork
+        self._local = threading.local()
+        super()._after_fork()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    def _connection(self):
+        """One connection per thread"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+        return connection
+
+    def _write_batch(self, events):
+        now = time.time()
+        days = {}
+        distribution = {}
+
+        for event in events:
+            day = days.setdefault(event['game_number'], [0, 0, 0, 0])
+            day[0] += event['guess_number'] == 1
+            day[1] += 1
+
+        connection = self._connection()
+        with connection:
+            connection.executemany(
+                "INSERT INTO guess_events (game_number, player_id, guess_number, country, correct, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(e['game_number'], e['player_id'], e['guess_number'], e['country'], int(e['correct']), now)
+                 for e in events]
+            )
+            # A replayed or resubmitted game end is ignored by player_results, so only the
+            # results actually inserted count towards the day's wins, losses and distribution
+            for event in events:
+                if not event['game_over']:
+                    continue
+                inserted = connection.execute(
+                    "INSERT OR IGNORE INTO player_results (player_id, game_number, won, guesses) VALUES (?, ?, ?, ?)",
+                    (event['player_id'], event['game_number'], int(event['won']), event['guess_number'])
+                ).rowcount
+                if not inserted:
+                    continue
+                days[event['game_number']][2 if event['won'] else 3] += 1
+                if event['won']:
+                    key = (event['game_number'], event['guess_number'])
+                    distribution[key] = distribution.get(key, 0) + 1
+            connection.executemany(
+                "INSERT INTO day_stats (game_number, players, guesses, wins, losses) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (game_number) DO UPDATE SET players = players + excluded.players, "
+                "guesses = guesses + excluded.guesses, wins = wins + excluded.wins, losses = losses + excluded.losses",
+                [(game_number, *counts) for game_number, counts in days.items()]
+            )
+            connection.executemany(
+                "INSERT INTO day_distribution (game_number, guesses, wins) VALUES (?, ?, ?) "
+                "ON CONFLICT (game_number, guesses) DO UPDATE SET wins = wins + excluded.wins",
+                [(game_number, guesses, wins) for (game_number, guesses), wins in distribution.items()]
+            )
+
+    def get_day_stats(self, game_number):
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT players, guesses, wins, losses FROM day_stats WHERE game_number = ?", (game_number,)
+        ).fetchone()
+        players, guesses, wins, losses = row or (0, 0, 0, 0)
+
+        distribution = dict(connection.execute(
+            "SELECT guesses, wins FROM day_distribution WHERE game_number = ? ORDER BY guesses", (game_number,)
+        ).fetchall())
+
+        finished = wins + losses
+        return {
+            'game_number': game_number,
+            'players': players,
+            'guesses': guesses,
+            'finished': finished,
+            'wins': wins,
+            'losses': losses,
+            'solve_rate': wins / finished if finished else None,
+            'distribution': distribution
+        }
+
+    def get_player_stats(self, player_id, current_game_number=None):
+        rows = self._connection().execute(
+            "SELECT game_number, won, guesses FROM player_results WHERE player_id = ? ORDER BY game_number",
+            (player_id,)
+        ).fetchall()
+
+        current_streak = max_streak = 0
+        previous_game = None
+        distribution = {}
+        for game_number, won, guesses in rows:
+            if won:
+                # A streak continues only over consecutive daily games
+                current_streak = current_streak + 1 if previous_game == game_number - 1 else 1
+                distribution[guesses] = distribution.get(guesses, 0) + 1
+            else:
+                current_streak = 0
+            max_streak = max(max_streak, current_streak)
+            previous_game = game_number
+
+        # A streak lapses once a day goes by without a result
+        if current_game_number is not None and (previous_game is None or previous_game < current_game_number - 1):
+            current_streak = 0
+
+        wins = sum(distribution.values())
+        return {
+            'played': len(rows),
+            'wins': wins,
+            'win_rate': wins / len(rows) if rows else None,
+            'current_streak': current_streak,
+            'max_streak': max_streak,
+            'last_game_number': previous_game,
+            'distribution': distribution
+        }
+
+
+def create_progress_store(config):
+    """Build the ProgressStore selected by PROGRESS_STORE in the app config (None disables it)"""
+    backend = config.get('PROGRESS_STORE')
+    if not backend:
+        return None
+    if backend == 'sqlite':
+        return SQLiteProgressStore(
+            config['PROGRESS_DB_PATH'],
+            batch_size=config.get('PROGRESS_BATCH_SIZE', 500),
+            flush_interval=config.get('PROGRESS_FLUSH_INTERVAL', 1.0)
+        )
+    raise ValueError(f"Unknown progress store: {backend}")
@@ -0,0 +1,162 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+
+class PuzzleArtifactStore:
+    """
+    Prebuilt daily puzzle artifacts, one directory per date
+
+    Each <root>/<YYYY-MM-DD>/ directory holds puzzle.json (date, game number, target country
+    and the fingerprint of the data it was built from), the serialized Plotly treemap
+    (treemap_data.json, treemap_layout.json) and, unless it was skipped at build time,
+    treemap.png.
+    """
+
+    PUZZLE_FILE = 'puzzle.json'
+    DATA_FILE = 'treemap_data.json'
+    LAYOUT_FILE = 'treemap_layout.json'
+    PNG_FILE = 'treemap.png'
+
+    def __init__(self, root):
+        """
+        Args:
+            root: Directory holding the dated artifact directories
+        """
+        self.root = root
+        self.logger = logging.getLogger(__name__)
+
+    def path_for(self, date):
+        """Directory for the given date's artifact"""
+        return os.path.join(self.root, date.isoformat())
+
+    def png_path(self, date):
+        """Path of the given date's PNG, or None if it was not rendered"""
+        path = os.path.join(self.path_for(date), self.PNG_FILE)
+        return path if os.path.exists(path) else None
+
+    def load(self, date, target_country=None, data_fingerprint=None):
+        """
+        Load the artifact for a date
+
+        Args:
+            date: datetime.date of the puzzle
+            target_country: If given, artifacts built for a different country are ignored
+            data_fingerprint: If given, artifacts built from other data (before a delta or
+                re-ingest, see TradeData.get_data_fingerprint) are ignored
+
+        Returns:
+            Dict with the puzzle metadata plus 'treemap_data' and 'treemap_layout' JSON strings,
+            or None if there is no usable artifact
+        """
+        directory = self.path_for(date)
+        try:
+            with open(os.path.join(directory, self.PUZZLE_FILE)) as f:
+                puzzle = json.load(f)
+            with open(os.path.join(directory, self.DATA_FILE)) as f:
+                puzzle['treemap_data'] = f.read()
+            with open(os.path.join(directory, self.LAYOUT_FILE)) as f:
+                puzzle['treemap_layout'] = f.read()
+        except (OSError, ValueError):
+            return None
+
+        if target_country is not None and puzzle.get('target_country') != target_country:
+            self.logger.warning(f"Ignoring stale puzzle artifact for {date}: built for {puzzle.get('target_country')}")
+            return None
+        if data_fingerprint is not None and puzzle.get('data_fingerprint') != data_fingerprint:
+            self.logger.warning(f"Ignoring stale puzzle artifact for {date}: built from other data")
+            return None
+        return puzzle
+
+    def save(self, date, game_number, target_country, treemap_data, treemap_layout, png=None, overwrite=False,
+             data_fingerprint=None):
+        """
+        Write the artifact for a date
+
+        The files are written to a temporary directory that is renamed into place, so
+        readers never see a partly written artifact.
+
+        Returns:
+            True if the artifact was written, False if one already existed and overwrite is False
+        """
+        os.makedirs(self.root, exist_ok=True)
+        target = self.path_for(date)
+        if os.path.exists(target) and not overwrite:
+            return False
+
+        staging = tempfile.mkdtemp(dir=self.root, prefix='.tmp-')
+        try:
+            with open(os.path.join(staging, self.PUZZLE_FILE), 'w') as f:
+                json.dump({
+                    'date': date.isoformat(),
+                    'game_number': game_number,
+                    'target_country': target_country,
+                    'data_fingerprint': data_fingerprint
+                }, f)
+            with open(os.path.join(staging, self.DATA_FILE), 'w') as f:
+                f.write(treemap_data)
+            with open(os.path.join(staging, self.LAYOUT_FILE), 'w') as f:
+                f.write(treemap_layout)
+            if png is not None:
+                with open(os.path.join(staging, self.PNG_FILE), 'wb') as f:
+                    f.write(png)
+            os.chmod(staging, 0o755)
+
+            if os.path.exists(target):
+                # Move the old artifact aside first; a directory can't be renamed over a non-empty one
+                retired = tempfile.mkdtemp(dir=self.root, prefix='.old-')
+                os.rename(target, os.path.join(retired, 'artifact'))
+                os.rename(staging, target)
+                shutil.rmtree(retired, ignore_errors=True)
+            else:
+                os.rename(staging, target)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+            if os.path.exists(target) and not overwrite:
+                # Another process published the same date first
+                return False
+            raise
+        return True
+
+
+def build_puzzles(trade_data, game, artifacts, start_date, days, overwrite=False, render_png=True,
+                  treemap_mode='flat', other_threshold=0.0):
+    """
+    Render puzzle artifacts for a range of dates
+
+    Args:
+        trade_data: Instance of TradeData
+        game: Instance of TradleGame, used to pick each date's target country
+        artifacts: PuzzleArtifactStore to write to
+        start_date: First datetime.date to build
+        days: Number of consecutive dates to build
+        overwrite: Rebuild dates that already have an artifact (ones built from other data are
+            always rebuilt)
+        render_png: Also render the PNG share image
+        treemap_mode, other_threshold: Treemap mode and "Other" threshold, as for TradeTreemap
+
+    Returns:
+        List of (date, target_country, built) tuples
+    """
+    from app.services.trade_charts import TradeTreemap
+
+    data_fingerprint = trade_data.get_data_fingerprint()
+    results = []
+    for date, target_country, game_number in game.get_upcoming_puzzles(start_date, days):
+        if not overwrite and artifacts.load(date, target_country, data_fingerprint) is not None:
+            results.append((date, target_country, False))
+            continue
+
+        treemap_data, treemap_layout, png = TradeTreemap.render(
+            game.puzzle_data[target_country],
+            render_png=render_png,
+            mode=treemap_mode,
+            other_threshold=other_threshold,
+            commodity_codes=trade_data.get_commodity_codes()
+        )
+        artifacts.save(date, game_number, target_country, treemap_data, treemap_layout, png, overwrite=True,
+                       data_fingerprint=data_fingerprint)
+        results.append((date, target_country, True))
+    return results
@@ -0,0 +1,221 @@
+# app/services/share_images.py
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+
+from app.services.treemap_png import RENDERER_VERSION, render_treemap_png
+
+# How often a process waiting on another process's render checks for the image
+LOCK_POLL_INTERVAL = 0.05
+
+
+class ShareImageCache:
+    """
+    Treemap share images (PNG), rendered on demand into a content-addressed directory
+
+    An image is named by a hash of what it is drawn from (the treemap data, image size and
+    renderer version), so a puzzle whose data didn't change keeps its image across reloads
+    and restarts, and workers on a host share one copy. Images are rendered with the
+    Kaleido-free rasterizer in treemap_png. Concurrent requests for an image that isn't
+    cached yet wait for a single render instead of each rendering it: threads of a process
+    on a Future, other processes sharing the directory on a lock file next to the image.
+    When the directory grows past max_bytes, the least recently used images are removed.
+    """
+
+    def __init__(self, root, max_bytes=64 << 20, width=1200, height=630, render_timeout=30):
+        """
+        Args:
+            root: Cache directory (created on first write)
+            max_bytes: Size the cached images may take before the least recently used are evicted
+            width, height: Image size in pixels
+            render_timeout: Seconds a request waits for another request's render of the same
+                image; a lock file older than that is taken to be left by a crashed process
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.width = width
+        self.height = height
+        self.render_timeout = render_timeout
+        self.logger = logging.getLogger(__name__)
+
+        self._lock = threading.Lock()
+        # Image key -> Future of its PNG bytes, while it is being rendered
+        self._rendering = {}
+
+    def key(self, treemap_data):
+        """Content address of the image for a treemap's trace data JSON"""
+        digest = hashlib.sha256(f"{RENDERER_VERSION}:{self.width}x{self.height}:".encode('utf-8'))
+        digest.update(treemap_data.encode('utf-8'))
+        return digest.hexdigest()[:32]
+
+    def path_for(self, key):
+        """Path of a cached image; two-character subdirectories keep directories small"""
+        return os.path.join(self.root, key[:2], f"{key}.png")
+
+    def get(self, treemap_data):
+        """
+        The share image for a treemap, from the cache or rendered (once) on a miss
+
+        Args:
+            treemap_data: Plotly trace data JSON of the treemap
+
+        Returns:
+            Tuple of (key, PNG bytes); the key doubles as an ETag
+        """
+        key = self.key(treemap_data)
+        png = self._read(key)
+        if png is not None:
+            return key, png
+
+        with self._lock:
+            future = self._rendering.get(key)
+            rendering = future is None
+            if rendering:
+                future = self._rendering[key] = Future()
+
+        if not rendering:
+            return key, future.result(self.render_timeout)
+
+        try:
+            png = self._render_locked(key, treemap_data)
+            future.set_result(png)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._rendering[key]
+        return key, png
+
+    def _render_locked(self, key, treemap_data):
+        """
+        Render and publish an image while holding its lock file, or wait for the process that holds it
+
+        The lock file is created with O_EXCL, so only one process renders an image at a time;
+        the others poll for the published image. If the lock can't be taken in time, or not
+        at all (a read-only cache), the image is rendered anyway.
+        """
+        lock_path = self.path_for(key)[:-len('.png')] + '.lock'
+        deadline = time.monotonic() + self.render_timeout
+        while True:
+            try:
+                os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileExistsError:
+                png = self._read(key)
+                if png is not None:
+                    return png
+                if self._lock_abandoned(lock_path):
+                    self._remove_lock(lock_path)
+                    continue
+                if time.monotonic() < deadline:
+                    time.sleep(LOCK_POLL_INTERVAL)
+                    continue
+                self.logger.warning(f"Timed out waiting for another process to render share image {key}")
+            except OSError as e:
+                self.logger.warning(f"Could not lock share image {key}: {str(e)}")
+            else:
+                os.close(fd)
+                try:
+                    # Another process may have published it between the cache miss and the lock
+                    png = self._read(key)
+                    if png is None:
+                        png = render_treemap_png(treemap_data, self.width, self.height)
+                        self._write(key, png)
+                    return png
+                finally:
+                    self._remove_lock(lock_path)
+
+            png = render_treemap_png(treemap_data, self.width, self.height)
+            self._write(key, png)
+            return png
+
+    def _lock_abandoned(self, lock_path):
+        """Whether a lock file is older than any render should take"""
+        try:
+            return time.time() - os.stat(lock_path).st_mtime > self.render_timeout
+        except FileNotFoundError:
+            return False
+
+    @staticmethod
+    def _remove_lock(lock_path):
+        try:
+            os.remove(lock_path)
+        except FileNotFoundError:
+            pass
+
+    def _read(self, key):
+        path = self.path_for(key)
+        try:
+            with open(path, 'rb') as f:
+                png = f.read()
+        except FileNotFoundError:
+            return None
+        # The mtime tracks use, for eviction; another process may just have evicted the file
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return png
+
+    def _write(self, key, png):
+        """Publish an image under its key, then evict if the cache is over its size"""
+        path = self.path_for(key)
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.png')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(png)
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, path)
+        except OSError as e:
+            # The image is still served, just not cached
+            self.logger.warning(f"Could not cache share image {key}: {str(e)}")
+            return
+        self.evict(keep=path)
+
+    def evict(self, keep=None):
+        """
+        Remove the least recently used images until the cache fits in max_bytes
+
+        Args:
+            keep: Path of an image not to evict (the one just written)
+
+        Returns:
+            Number of images removed
+        """
+        entries = []
+        total = 0
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if not name.endswith('.png') or name.startswith('.tmp-'):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, path))
+                total += stat.st_size
+
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        if removed:
+            self.logger.info(f"Evicted {removed} share images from {self.root}")
+        return removed
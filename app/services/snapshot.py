@@ -0,0 +1,203 @@
+# app/services/snapshot.py
+
+import time
+import signal
+import logging
+import datetime
+import threading
+from collections import deque
+
+from flask import current_app, g
+
+from app.services.prefork import register_after_fork
+
+
+class DataSnapshot:
+    """
+    One version of the app's data: the trade data, the game built on it and its daily puzzles
+
+    A snapshot is never modified once published; reloading builds a new one. Requests take
+    the current snapshot once and use it throughout, so a reload mid-request can't mix data
+    from two versions.
+    """
+
+    __slots__ = ('version', 'trade_data', 'game', 'puzzle_artifacts', 'puzzles', 'loaded_at')
+
+    def __init__(self, version, trade_data, game, puzzle_artifacts, puzzles, loaded_at):
+        for name, value in zip(self.__slots__, (version, trade_data, game, puzzle_artifacts, puzzles, loaded_at)):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"DataSnapshot is immutable, can't set {name}")
+
+    def __repr__(self):
+        return f"DataSnapshot(version={self.version})"
+
+
+class SnapshotManager:
+    """
+    Holds the current DataSnapshot and replaces it when new data is published
+
+    A watcher thread checks every check_interval seconds whether a new processed data file
+    was renamed into place (by `flask apply-delta` or a rebuild), or wakes up on
+    reload_signal, then builds the next snapshot in the background, warms its indices and
+    today's treemap, and swaps the single current reference. Reload durations and request
+    latencies, split by whether a reload was running, are kept for stats().
+    """
+
+    def __init__(self, app, build_state, check_interval=5.0, reload_signal=None, latency_samples=10000):
+        """
+        Args:
+            app: The Flask app
+            build_state: Function of the app and whether it is a reload, returning
+                (trade_data, game, puzzle_artifacts, puzzles)
+            check_interval: Seconds between checks for a new data file (0 to only reload on the signal)
+            reload_signal: Optional signal name (e.g. 'SIGHUP') that triggers a reload
+            latency_samples: Latest request latencies kept per kind for stats()
+        """
+        self.app = app
+        self.build_state = build_state
+        self.check_interval = check_interval
+        self.logger = logging.getLogger(__name__)
+
+        self.reload_durations = deque(maxlen=20)
+        self.reload_errors = 0
+        self._latencies = {'steady': deque(maxlen=latency_samples), 'during_reload': deque(maxlen=latency_samples)}
+        # Odd while a reload is running; a request that sees it change overlapped a reload
+        self._generation = 0
+
+        # The first snapshot is left to warm up on first use (or in preload), like a cold start
+        self._current = self._build(1, warm=False)
+
+        self._reload_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        if reload_signal:
+            self._install_signal_handler(reload_signal)
+        if check_interval or reload_signal:
+            self._start_watcher()
+            register_after_fork(self)
+
+    def current(self):
+        """The current snapshot"""
+        return self._current
+
+    def request_reload(self):
+        """Ask the watcher to rebuild the snapshot now, whether or not the data file changed"""
+        self._wake.set()
+
+    def reload(self):
+        """Build the next snapshot from the current data and swap it in; returns the new snapshot"""
+        with self._reload_lock:
+            self._generation += 1
+            start = time.perf_counter()
+            try:
+                snapshot = self._build(self._current.version + 1)
+            finally:
+                self._generation += 1
+            duration = time.perf_counter() - start
+
+            previous, self._current = self._current, snapshot
+            previous.puzzles.stop()
+
+        self.reload_durations.append((snapshot.version, duration))
+        self.logger.info(f"Reloaded trade data as snapshot {snapshot.version} in {duration:.2f}s")
+        return snapshot
+
+    def stop(self):
+        """Stop the watcher thread"""
+        self._stopped.set()
+        self._wake.set()
+
+    def request_started(self):
+        """Token for request_finished, taken when a request starts"""
+        return time.perf_counter(), self._generation
+
+    def request_finished(self, token):
+        """Record a request's latency, as during a reload if one was running at any point"""
+        start, generation = token
+        kind = 'during_reload' if generation % 2 or generation != self._generation else 'steady'
+        self._latencies[kind].append(time.perf_counter() - start)
+
+    def stats(self):
+        """Snapshot version, reload durations and request latency percentiles for this process"""
+        snapshot = self._current
+        durations = list(self.reload_durations)
+        return {
+            'version': snapshot.version,
+            'loaded_at': snapshot.loaded_at.isoformat(),
+            'reloading': bool(self._generation % 2),
+            'reloads': {
+                'count': snapshot.version - 1,
+                'errors': self.reload_errors,
+                'last_seconds': durations[-1][1] if durations else None,
+                'recent': [{'version': version, 'seconds': seconds} for version, seconds in durations]
+            },
+            'latency': {kind: _percentiles(samples) for kind, samples in self._latencies.items()}
+        }
+
+    def _build(self, version, warm=True):
+        """Build a snapshot, warming everything its first requests would otherwise build"""
+        # Only the first build may ingest the inputs; later ones load the published file as is
+        trade_data, game, puzzle_artifacts, puzzles = self.build_state(self.app, reload=version > 1)
+        if warm:
+            trade_data.get_countries_payload()
+            trade_data.get_search_index()
+            treemap = puzzles.current().treemap
+            treemap.wait_until_ready(treemap.render_timeout)
+        return DataSnapshot(version, trade_data, game, puzzle_artifacts, puzzles,
+                            datetime.datetime.now(datetime.timezone.utc))
+
+    def _install_signal_handler(self, name):
+        try:
+            signal.signal(getattr(signal, name), lambda signum, frame: self._wake.set())
+        except (AttributeError, ValueError) as e:
+            # Unknown signal, or not called from the main thread
+            self.logger.warning(f"Can't reload trade data on {name}: {str(e)}")
+
+    def _start_watcher(self):
+        threading.Thread(target=self._run_watcher, daemon=True, name='snapshot-watcher').start()
+
+    def _after_fork(self):
+        """Restart the watcher in a forked worker, with locks the parent's threads can't be holding"""
+        stopped = self._stopped.is_set()
+        self._reload_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        if stopped:
+            self._stopped.set()
+        else:
+            self._start_watcher()
+
+    def _run_watcher(self):
+        while not self._stopped.is_set():
+            woken = self._wake.wait(self.check_interval or None)
+            if self._stopped.is_set():
+                return
+            self._wake.clear()
+            try:
+                if woken or self._current.trade_data.has_newer_data():
+                    self.reload()
+            except Exception as e:
+                self.reload_errors += 1
+                self.logger.error(f"Error reloading trade data, keeping snapshot {self._current.version}: {str(e)}")
+
+
+def current_snapshot():
+    """The snapshot the current Flask request uses, taken on first use so it stays the same throughout"""
+    snapshot = g.get('snapshot')
+    if snapshot is None:
+        snapshot = g.snapshot = current_app.snapshots.current()
+    return snapshot
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    if not samples:
+        return {'count': 0, 'p50_ms': None, 'p99_ms': None, 'max_ms': None}
+    return {
+        'count': len(samples),
+        'p50_ms': samples[len(samples) // 2] * 1000,
+        'p99_ms': samples[max(0, int(len(samples) * 0.99) - 1)] * 1000,
+        'max_ms': samples[-1] * 1000
+    }
@@ -1,95 +1,162 @@
-import plotly
-import plotly.express
-import json
-import pandas
-import os
+import logging
+import threading
+
+from app.services.prefork import register_after_fork
+from app.services.treemap_png import render_treemap_png
+from app.services.treemap_payload import TREEMAP_MODES, treemap_json
 
 class TradeTreemap:
     """Class for generating country export treemaps for the Tradle game"""
     
-    def __init__(self, trade_data, game):
+    def __init__(self, trade_data, game, artifacts=None, render_timeout=30, date=None, mode='flat',
+                 other_threshold=0.0):
         """
         Initialize with a trade data to source the data
         
         Args:
             trade_data: Instance of TradeData
+            game: Instance of TradleGame providing today's target country
+            artifacts: Optional PuzzleArtifactStore with prebuilt puzzles. When given, today's
+                artifact is loaded if present and built from the loaded data; otherwise the
+                treemap is rendered in a background thread and saved as an artifact, replacing
+                a stale one. Without it the treemap is rendered synchronously.
+            render_timeout: Seconds to wait for a background render when the treemap is read
+            date: Puzzle date to render (defaults to the game's current puzzle)
+            mode: One of TREEMAP_MODES
+            other_threshold: In 'hs' mode, tiles under this percentage of the total are merged
+                into an "Other" tile within their group
         """
+        if mode not in TREEMAP_MODES:
+            raise ValueError(f"Unknown treemap mode: {mode}")
+        
         self.trade_data = trade_data
-        self.target_country = game.target_country
+        if date is None:
+            self.puzzle_date = game.puzzle_date
+            self.target_country = game.target_country
+            self.game_number = game.game_number
+        else:
+            self.puzzle_date = date
+            self.target_country, self.game_number = game.get_puzzle_for_date(date)
+        self.artifacts = artifacts
+        self.data_fingerprint = trade_data.get_data_fingerprint() if artifacts is not None else None
+        self.render_timeout = render_timeout
+        self.logger = logging.getLogger(__name__)
+        self.figure_options = {
+            'mode': mode,
+            'other_threshold': other_threshold,
+            'commodity_codes': trade_data.get_commodity_codes()
+        }
+    
+        # Get the target's data for the puzzle's year and flow
+        self.country_data = game.puzzle_data.get(self.target_country)
+        
+        self._treemap_data = None
+        self._treemap_layout = None
+        self._render_error = None
+        self._ready = threading.Event()
+        
+        if artifacts is None:
+            # Create the treemap in place
+            self._treemap_data, self._treemap_layout = self._create_treemap(self.country_data)
+            self._ready.set()
+            return
+        
+        artifact = artifacts.load(self.puzzle_date, self.target_country, self.data_fingerprint)
+        if artifact is not None:
+            self._treemap_data = artifact['treemap_data']
+            self._treemap_layout = artifact['treemap_layout']
+            self._ready.set()
+        else:
+            self.logger.warning(f"No puzzle artifact for {self.puzzle_date}, rendering in the background")
+            threading.Thread(target=self._render_in_background, daemon=True).start()
+            register_after_fork(self)
     
-        # Get export data from the trade data
-        self.country_data = self.trade_data.get_country_data(self.target_country)
+    @property
+    def treemap_data(self):
+        """Serialized Plotly trace data, waiting for a background render if one is running"""
+        self._wait_until_ready()
+        return self._treemap_data
+    
+    @property
+    def treemap_layout(self):
+        """Serialized Plotly layout, waiting for a background render if one is running"""
+        self._wait_until_ready()
+        return self._treemap_layout
+    
+    def wait_until_ready(self, timeout=None):
+        """Block until the treemap has rendered (or failed to); returns False on timeout"""
+        return self._ready.wait(timeout)
+    
+    def _wait_until_ready(self, timeout=None):
+        if not self._ready.wait(self.render_timeout if timeout is None else timeout):
+            raise RuntimeError(f"Treemap for {self.target_country} is still rendering")
+        if self._render_error is not None:
+            raise RuntimeError(f"Treemap for {self.target_country} failed to render") from self._render_error
+    
+    def _after_fork(self):
+        """A render running in the parent doesn't survive a fork, so restart it in the worker"""
+        if not self._ready.is_set():
+            self._ready = threading.Event()
+            threading.Thread(target=self._render_in_background, daemon=True).start()
+    
+    def _render_in_background(self):
+        """Render today's treemap when no artifact was prebuilt, then save it as one"""
+        try:
+            self._treemap_data, self._treemap_layout = treemap_json(self.country_data, **self.figure_options)
+        except Exception as e:
+            self.logger.error(f"Error rendering treemap for {self.target_country}: {str(e)}")
+            self._render_error = e
+            return
+        finally:
+            self._ready.set()
+        
+        # The page can be served now; the PNG is only needed for the saved artifact
+        png = None
+        try:
+            png = self._render_png(self._treemap_data, self._treemap_layout)
+        except Exception as e:
+            self.logger.warning(f"Skipping treemap PNG for {self.puzzle_date}: {str(e)}")
         
-        # Create and return the treemap
-        self.treemap_data, self.treemap_layout = self._create_treemap(self.country_data)
+        try:
+            self.artifacts.save(
+                self.puzzle_date, self.game_number, self.target_country,
+                self._treemap_data, self._treemap_layout, png,
+                overwrite=True, data_fingerprint=self.data_fingerprint
+            )
+        except OSError as e:
+            self.logger.warning(f"Could not save puzzle artifact for {self.puzzle_date}: {str(e)}")
     
-    def _prepare_data_for_treemap(self, country_data):
+    @classmethod
+    def render(cls, country_data, render_png=True, mode='flat', other_threshold=0.0, commodity_codes=None):
         """
-        Transform trade data into a DataFrame suitable for a treemap
+        Render a country's treemap outside of a running app (used to prebuild puzzles)
         
         Args:
-            trade_data: Trade data from TradeDataManager
+            country_data: Country data from TradeData.get_country_data
+            render_png: Also render the PNG share image
+            mode, other_threshold: As for TradeTreemap
+            commodity_codes: Dict of commodity name -> HS code, from TradeData.get_commodity_codes
             
         Returns:
-            Pandas DataFrame with categories, products, values, etc.
+            Tuple of (data JSON, layout JSON, PNG bytes or None)
         """
-        
-        commodities = []
-        values = []
-        percentages = []
-        
-        # Process your trade data structure
-        for commodity_name in country_data['exports'].keys():
-            commodities.append(commodity_name)
-            values.append(country_data['exports'].get(commodity_name, 0))
-            percentages.append(country_data['export_percentages'].get(commodity_name, 0))
-        
-        return pandas.DataFrame({
-            'commodity': commodities,
-            'value': values,
-            'percentage': percentages
-        })
+        data_json, layout_json = treemap_json(country_data, mode, other_threshold, commodity_codes)
+        png = cls._render_png(data_json, layout_json) if render_png else None
+        return data_json, layout_json, png
     
     def _create_treemap(self, country_data):
         """
-        Create a treemap visualization from a prepared DataFrame
+        Create the treemap for a country
         
         Args:
-            df: DataFrame with trade data
+            country_data: Country data from TradeData.get_country_data
             
         Returns:
-            JSON string of Plotly figure
+            Tuple of (data JSON, layout JSON)
         """
-        # Transform the trade data into a format suitable for the treemap
-        df = self._prepare_data_for_treemap(country_data)
-        
-        fig = plotly.express.treemap(
-            df,
-            path=['commodity'],
-            values='value',
-            color='percentage',
-            color_continuous_scale='viridis_r',
-            hover_data=['percentage']
-        )
-        
-        fig.update_layout(
-            margin=dict(t=50, l=25, r=25, b=25),
-            font=dict(size=14)
-        )
-        
-        self._save_png(fig)
-        
-        data_json = json.dumps(fig.data, cls=plotly.utils.PlotlyJSONEncoder)
-        layout_json = json.dumps(fig.layout, cls=plotly.utils.PlotlyJSONEncoder)
-        
-        return data_json, layout_json
+        return treemap_json(country_data, **self.figure_options)
     
-    def _save_png(self, figure):
-        
-        images_dir = os.path.join('app', 'static', 'images')
-        
-        if not os.path.exists(images_dir):
-            os.mkdir(images_dir)
-            
-        figure.write_image(os.path.join(images_dir, "treemap.png"))
-        
\ No newline at end of file
+    @staticmethod
+    def _render_png(data_json, layout_json):
+        """Rasterize the treemap to PNG bytes (the share image, without a browser)"""
+        return render_treemap_png(data_json)
@@ -1,32 +1,84 @@
 import pandas as pd
+import numpy as np
 import os
+import glob
 import json
 import logging
+import hashlib
+import tempfile
+import multiprocessing
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+from app.services.hs_nomenclature import hs_ancestors, hs_code, hs_sort_key
+from app.services.processed_data_store import DEFAULT_FLOW, ProcessedDataStore, select_slices
 
 class TradeDataLoader:
     """
     Loads and processes trade data from CSV into a game-friendly format for Tradle
     """
-    def __init__(self, csv_path, country_metadata_path=None):
+    ENGINES = ('vectorized', 'streaming', 'legacy')
+    
+    # Columns and types read by the streaming engine; everything else in the CSV is skipped
+    STREAMING_DTYPES = {
+        'refYear': 'float64',
+        'reporterCode': 'int64',
+        'reporterISO': 'category',
+        'reporterDesc': 'category',
+        'flowDesc': 'category',
+        'classificationCode': 'category',
+        'cmdCode': 'category',
+        'cmdDesc': 'category',
+        'fobvalue': 'float64',
+        'primaryValue': 'float64'
+    }
+    
+    # Bump whenever process_data changes its output so existing caches are rebuilt
+    SCHEMA_VERSION = 3
+    
+    def __init__(self, csv_path, country_metadata_path=None, engine='vectorized', chunk_size=250000, workers=None):
         """
         Initialize the data loader
         
         Parameters:
-        - csv_path: Path to the CSV file with trade data
+        - csv_path: Path to the CSV file with trade data, or a directory or glob pattern of
+          CSV partitions (e.g. one per reporter/year), which are always ingested by streaming
         - country_metadata_path: Optional path to JSON with country metadata (coordinates, etc.)
+        - engine: 'vectorized' for the columnar ingest, 'streaming' to aggregate the CSV in
+          chunks with bounded memory, 'legacy' for the original row-by-row loop
+        - chunk_size: Rows per chunk for the streaming engine
+        - workers: Processes aggregating partitions in parallel (defaults to the CPU count)
         """
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown ingest engine: {engine}")
+        
         self.csv_path = csv_path
         self.country_metadata_path = country_metadata_path
+        self.engine = engine
+        self.chunk_size = chunk_size
+        self.workers = workers or os.cpu_count() or 1
         self.logger = logging.getLogger(__name__)
         self.raw_data = None
         self.country_metadata = None
         self.countries_data = {}
+        # (country, year, flow) -> data in the countries_data shape; None for the legacy engine
+        self.slices_data = None
+        # Commodity name -> normalised HS code (None when it isn't one); empty for the legacy engine
+        self.commodity_codes = {}
+        # Delta files applied on top of the ingested CSV, as {'path', 'sha256'} dicts
+        self.applied_deltas = []
         
     def load_data(self):
         """Load trade data from CSV and process it"""
         try:
             self.logger.info(f"Loading trade data from {self.csv_path}")
+            self.applied_deltas = []
+            if self.engine == 'streaming' or self.is_partitioned():
+                self._load_data_streaming()
+                self.logger.info(f"Processed {len(self.countries_data)} countries")
+                return
+            
             self.raw_data = pd.read_csv(self.csv_path, encoding_errors='ignore')
             
             # Load country metadata if available
@@ -40,7 +92,413 @@ class TradeDataLoader:
             raise
             
     def process_data(self):
-        """Transform raw CSV data into game-friendly format specifically for your data structure"""
+        """Transform raw CSV data into game-friendly format using the selected engine"""
+        if self.engine == 'streaming':
+            raise ValueError("The streaming engine processes the CSV as it reads it; use load_data")
+        if self.engine == 'legacy':
+            self._process_data_legacy()
+        else:
+            self._process_data_vectorized()
+        self.logger.info(f"Processed {len(self.countries_data)} countries")
+        
+    def _process_data_vectorized(self):
+        """
+        Columnar ingest, keyed by (country, year, flow)
+        
+        Sums use np.bincount, which accumulates in row order like the legacy loop, so for
+        single-year export data the aggregated values and totals match it bit for bit.
+        """
+        df = self.raw_data
+        
+        # Use the FOB value where present, otherwise fall back to the primary value
+        values = df['fobvalue'].where(df['fobvalue'].notna(), df['primaryValue'])
+        
+        # Skip rows with missing essential data
+        valid = (df['reporterDesc'].notna() & df['cmdDesc'].notna() & values.notna()
+                 & df['refYear'].notna() & df['flowDesc'].notna()).to_numpy()
+        df = df[valid]
+        values = values.to_numpy(dtype='float64')[valid]
+        
+        if df.empty:
+            self.countries_data, self.slices_data = {}, {}
+            return
+        
+        # Number slices and commodities in order of first appearance (the legacy dict insertion order)
+        slice_idx, slices = pd.MultiIndex.from_arrays([
+            df['reporterDesc'],
+            df['refYear'].astype('int64'),
+            df['flowDesc'],
+            df['classificationCode'].fillna('')
+        ]).factorize()
+        commodity_idx, commodities = pd.factorize(df['cmdDesc'])
+        n_commodities = len(commodities)
+        
+        # A commodity's HS code is taken from its first row
+        first_rows = df.drop_duplicates('cmdDesc')
+        self.commodity_codes = dict(zip(first_rows['cmdDesc'].tolist(), map(hs_code, first_rows['cmdCode'].tolist())))
+        
+        # Aggregate values per (slice, commodity) pair
+        pair_idx, pair_keys = pd.factorize(slice_idx.astype('int64') * n_commodities + commodity_idx)
+        pair_values = np.bincount(pair_idx, weights=values, minlength=len(pair_keys))
+        
+        # Country attributes are taken from each country's last valid row
+        last_rows = df.drop_duplicates('reporterDesc', keep='last').set_index('reporterDesc')
+        coordinates = last_rows['latlng'].str.strip('[]').str.split(',', expand=True).astype(float).to_numpy()
+        attributes = dict(zip(last_rows.index.tolist(), zip(
+            last_rows['reporterISO'].tolist(),
+            last_rows['reporterCode'].tolist(),
+            last_rows['region'].tolist(),
+            last_rows['subregion'].tolist(),
+            coordinates[:, 0].tolist(),
+            coordinates[:, 1].tolist()
+        )))
+        
+        self._set_slices(
+            [(country, int(year), flow, classification) for country, year, flow, classification in slices],
+            list(commodities), pair_keys // n_commodities, pair_keys % n_commodities, pair_values, attributes
+        )
+    
+    def is_partitioned(self):
+        """Whether csv_path names a directory or glob pattern of CSV partitions"""
+        return os.path.isdir(self.csv_path) or any(c in self.csv_path for c in '*?[')
+    
+    def input_files(self):
+        """The trade data CSV files to ingest, in a stable (sorted) order"""
+        if not self.is_partitioned():
+            return [self.csv_path]
+        pattern = os.path.join(self.csv_path, '*.csv') if os.path.isdir(self.csv_path) else self.csv_path
+        files = sorted(glob.glob(pattern))
+        if not files:
+            raise FileNotFoundError(f"No trade data files match {self.csv_path}")
+        return files
+    
+    def _load_data_streaming(self):
+        """
+        Aggregate the input CSVs chunk by chunk and merge the partial sums
+        
+        Each file is reduced by aggregate_csv to per-(slice, commodity) sums; with several
+        partitions they are aggregated in a process pool. Partials are merged in file order
+        whatever order the workers finish in, with slices, commodities and pairs numbered
+        in order of first appearance, so the result only depends on the inputs. For a single
+        file it is identical to the vectorized engine's.
+        """
+        metadata = self._load_metadata_lookup()
+        known_isos = list(metadata) if metadata is not None else None
+        files = self.input_files()
+        
+        slice_ids, commodity_ids, pair_ids = {}, {}, {}
+        pair_values = np.zeros(0)
+        commodity_codes = {}
+        # Country -> (ISO code, reporter code) of its last valid row
+        last_rows = {}
+        
+        for partial in self._aggregate_files(files, known_isos):
+            slice_map = _global_ids(partial['slices'], slice_ids)
+            commodity_map = _global_ids(partial['commodities'], commodity_ids)
+            for commodity, code in zip(partial['commodities'], partial['commodity_codes']):
+                commodity_codes.setdefault(commodity, code)
+            
+            local_pairs = partial['pair_keys']
+            keys = (slice_map[local_pairs >> 32] << 32) | commodity_map[local_pairs & 0xFFFFFFFF]
+            ids = _global_ids(keys.tolist(), pair_ids)
+            if len(pair_ids) > len(pair_values):
+                pair_values = np.concatenate((pair_values, np.zeros(len(pair_ids) - len(pair_values))))
+            np.add.at(pair_values, ids, partial['pair_values'])
+            
+            # Later files win, as later rows do within a file
+            last_rows.update(zip(partial['countries'], partial['last_rows']))
+        
+        pair_keys = np.fromiter(pair_ids.keys(), dtype='int64', count=len(pair_ids))
+        attributes = {}
+        for country, (iso, code) in last_rows.items():
+            region, subregion, lat, lng = metadata[iso] if metadata is not None else ('', '', 0, 0)
+            attributes[country] = (iso, code, region, subregion, lat, lng)
+        
+        self.commodity_codes = commodity_codes
+        self._set_slices(
+            list(slice_ids), list(commodity_ids),
+            pair_keys >> 32, pair_keys & 0xFFFFFFFF, pair_values, attributes
+        )
+    
+    def _aggregate_files(self, files, known_isos):
+        """
+        aggregate_csv of each file, yielded in file order
+        
+        Several files are aggregated in a pool of spawned processes. If the pool breaks
+        (e.g. a worker can't re-import the script that started the app), the files it
+        hadn't returned yet are aggregated in this process instead.
+        """
+        done = 0
+        workers = min(self.workers, len(files))
+        if workers > 1:
+            self.logger.info(f"Aggregating {len(files)} trade data files with {workers} processes")
+            # Spawned rather than forked, as the app may already be running threads
+            executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            try:
+                for partial in executor.map(aggregate_csv, files, repeat(known_isos), repeat(self.chunk_size)):
+                    done += 1
+                    yield partial
+            except BrokenProcessPool as e:
+                self.logger.warning(f"Ingest worker pool failed, aggregating the remaining files serially: {str(e)}")
+            finally:
+                executor.shutdown()
+        
+        for path in files[done:]:
+            yield aggregate_csv(path, known_isos, self.chunk_size)
+    
+    def _load_metadata_lookup(self):
+        """Country metadata as a dict of ISO code -> (region, subregion, lat, lng), or None"""
+        if not self.country_metadata_path or not os.path.exists(self.country_metadata_path):
+            return None
+        
+        self.country_metadata = pd.read_csv(self.country_metadata_path)
+        lookup = {}
+        for iso, region, subregion, latlng in zip(
+            self.country_metadata['country_iso'].tolist(),
+            self.country_metadata['region'].tolist(),
+            self.country_metadata['subregion'].tolist(),
+            self.country_metadata['latlng'].tolist()
+        ):
+            if isinstance(latlng, str):
+                lat, lng = (float(coord) for coord in latlng.strip('[]').split(','))
+            else:
+                lat = lng = float('nan')
+            lookup[iso] = (region, subregion, lat, lng)
+        return lookup
+    
+    def apply_delta(self, delta_path):
+        """
+        Upsert the rows of a delta CSV (e.g. a revised Comtrade release) into the processed data
+        
+        The delta has the trade data CSV's columns. Its values, summed per (country, year,
+        flow, commodity), replace the current ones; commodities and countries it doesn't
+        mention are kept. Only the slices the delta touches have their totals, percentages
+        and top exports recomputed, every other country's data is reused as is. Call
+        save_processed_data afterwards to publish the result.
+        
+        Parameters:
+        - delta_path: Delta CSV file
+        
+        Returns:
+        - List of the (country, year, flow) slices that changed
+        """
+        current = self.slices_data
+        if current is None:
+            if not hasattr(self.countries_data, 'slice_keys'):
+                raise ValueError("Deltas need trade data split by year and flow; use the vectorized or streaming engine")
+            store = self.countries_data
+            current = {key: store.record(i) for i, key in enumerate(store.slice_keys)}
+        
+        metadata = self._load_metadata_lookup()
+        partial = aggregate_csv(delta_path, list(metadata) if metadata is not None else None, self.chunk_size)
+        slices = partial['slices']
+        best = self._latest_classifications(slices)
+        
+        # Delta values per slice, in order of first appearance
+        updates = {}
+        for key, value in zip(partial['pair_keys'].tolist(), partial['pair_values'].tolist()):
+            slice_id = key >> 32
+            country, year, flow, _ = slices[slice_id]
+            if best[(country, year, flow)] == slice_id:
+                updates.setdefault((country, year, flow), {})[partial['commodities'][key & 0xFFFFFFFF]] = value
+        
+        last_rows = dict(zip(partial['countries'], partial['last_rows']))
+        # Commodities new to the data bring their HS codes along
+        commodity_codes = dict(zip(partial['commodities'], partial['commodity_codes']))
+        commodity_codes.update(self.commodity_codes)
+        country_data = {key[0]: data for key, data in current.items()}
+        commodity_ids = {}
+        pair_slice, pair_commodity, pair_values = [], [], []
+        attributes = []
+        for i, (key, values) in enumerate(updates.items()):
+            data = current.get(key)
+            merged = dict(data['exports']) if data is not None else {}
+            merged.update(values)
+            for commodity, value in merged.items():
+                pair_slice.append(i)
+                pair_commodity.append(commodity_ids.setdefault(commodity, len(commodity_ids)))
+                pair_values.append(value)
+            
+            # A country keeps its attributes; a new one takes them from its last delta row
+            known = country_data.get(key[0])
+            if known is not None:
+                attributes.append((known['iso'], known['country_code'], known['continent'], known['subregion'],
+                                   known['coordinates']['lat'], known['coordinates']['lng']))
+            else:
+                iso, code = last_rows[key[0]]
+                region, subregion, lat, lng = metadata[iso] if metadata is not None else ('', '', 0, 0)
+                attributes.append((iso, code, region, subregion, lat, lng))
+        
+        rebuilt = self._build_countries_data(
+            list(updates), list(commodity_ids),
+            np.asarray(pair_slice, dtype='int64'), np.asarray(pair_commodity, dtype='int64'),
+            np.asarray(pair_values, dtype='float64'), attributes, commodity_codes
+        )
+        
+        self.commodity_codes = commodity_codes
+        self.slices_data = {key: rebuilt.get(key, data) for key, data in current.items()}
+        self.slices_data.update((key, data) for key, data in rebuilt.items() if key not in current)
+        keys = list(self.slices_data)
+        self.countries_data = {
+            country: self.slices_data[keys[i]] for country, i in select_slices(keys, None, DEFAULT_FLOW).items()
+        }
+        self.applied_deltas = self.applied_deltas + [{'path': delta_path, 'sha256': self._hash_file(delta_path)}]
+        
+        self.logger.info(f"Applied {delta_path}: {len(rebuilt)} slices updated")
+        return list(rebuilt)
+    
+    @staticmethod
+    def _latest_classifications(slices):
+        """
+        (country, year, flow) -> index of its slice in the most recent HS revision
+        
+        A reporter's figures for one year and flow can come in more than one revision;
+        keeping only the latest avoids counting them twice.
+        """
+        best = {}
+        for i, (country, year, flow, classification) in enumerate(slices):
+            current = best.get((country, year, flow))
+            if current is None or classification > slices[current][3]:
+                best[(country, year, flow)] = i
+        return best
+    
+    def _set_slices(self, slices, commodities, pair_slice, pair_commodity, pair_values, attributes):
+        """
+        Build slices_data and countries_data from aggregated (slice, commodity) pairs
+        
+        Only each reporter's most recent HS revision is kept per year and flow. countries_data
+        is the default view: each country's latest year of exports.
+        
+        Parameters:
+        - slices: (country, year, flow, classification) per slice id, in order of first appearance
+        - commodities: Names indexed by the pair commodity ids
+        - pair_slice, pair_commodity, pair_values: Aggregated pairs in order of first appearance
+        - attributes: Dict of country -> (ISO code, reporter code, region, subregion, lat, lng)
+        """
+        best = self._latest_classifications(slices)
+        
+        kept = np.zeros(len(slices), dtype=bool)
+        kept[list(best.values())] = True
+        renumber = np.cumsum(kept) - 1
+        mask = kept[pair_slice]
+        
+        keys = [slices[i][:3] for i in np.flatnonzero(kept).tolist()]
+        self.slices_data = self._build_countries_data(
+            keys, commodities,
+            renumber[pair_slice[mask]], pair_commodity[mask], pair_values[mask],
+            [attributes[country] for country, _, _ in keys],
+            self.commodity_codes
+        )
+        
+        self.countries_data = {
+            country: self.slices_data[keys[i]] for country, i in select_slices(keys, None, DEFAULT_FLOW).items()
+        }
+    
+    @staticmethod
+    def _build_countries_data(keys, commodities, pair_group, pair_commodity, pair_values, attributes,
+                              commodity_codes=None):
+        """
+        Build a dict of data in the countries_data shape from aggregated (group, commodity) pairs
+        
+        With commodity codes, each group also gets 'hs_aggregates': its values summed up
+        the HS hierarchy (see _hs_aggregates).
+        
+        Parameters:
+        - keys: Dict key for each group id (a country name, or a (country, year, flow) slice)
+        - commodities: Names indexed by the pair commodity ids
+        - pair_group, pair_commodity, pair_values: Aggregated pairs in order of first appearance
+        - attributes: Per group (ISO code, reporter code, region, subregion, lat, lng)
+        - commodity_codes: Optional dict of commodity name -> HS code
+        """
+        n_groups = len(keys)
+        
+        # Sort by group, then by value descending; ties keep first-appearance order like sorted()
+        order = np.lexsort((np.arange(len(pair_values)), -pair_values, pair_group))
+        pair_group = pair_group[order]
+        pair_commodity = pair_commodity[order]
+        pair_values = pair_values[order]
+        
+        # Totals accumulate in descending value order, as sum() does over the sorted exports dict
+        totals = np.bincount(pair_group, weights=pair_values, minlength=n_groups)
+        percentages = pair_values / totals[pair_group] * 100
+        
+        # Contiguous run of the sorted pairs for each group
+        bounds = np.concatenate(([0], np.cumsum(np.bincount(pair_group, minlength=n_groups))))
+        
+        commodity_names = np.asarray(commodities, dtype=object)[pair_commodity].tolist()
+        value_list = pair_values.tolist()
+        percentage_list = percentages.tolist()
+        
+        hs_nodes, hs_bounds, hs_values = TradeDataLoader._hs_aggregates(
+            commodities, commodity_codes or {}, pair_group, pair_commodity, pair_values, n_groups
+        )
+        
+        processed_data = {}
+        for i, (key, (iso, code, region, subregion, lat, lng), total) in enumerate(zip(
+            keys, attributes, totals.tolist()
+        )):
+            start, end = bounds[i], bounds[i + 1]
+            names = commodity_names[start:end]
+            
+            data = {
+                'exports': dict(zip(names, value_list[start:end])),
+                'coordinates': {'lat': lat, 'lng': lng},
+                'region': '',
+                'subregion': subregion,
+                'country_iso': '',
+                'country_code': code,
+                'iso': iso,
+                'continent': region
+            }
+            if total > 0:
+                data['export_percentages'] = dict(zip(names, percentage_list[start:end]))
+            data['top_exports'] = names[:5]
+            data['total_exports'] = total
+            start, end = hs_bounds[i], hs_bounds[i + 1]
+            if end > start:
+                data['hs_aggregates'] = dict(zip(hs_nodes[start:end], hs_values[start:end]))
+            
+            processed_data[key] = data
+        
+        return processed_data
+        
+    @staticmethod
+    def _hs_aggregates(commodities, commodity_codes, pair_group, pair_commodity, pair_values, n_groups):
+        """
+        Sum each group's values up the HS hierarchy: sections, and the chapters and headings
+        above its commodities' own level
+        
+        Commodities are the leaves; with chapter-level data (HS2) that leaves one node per
+        section, with heading-level data (HS4) a node per section and chapter. Commodities
+        without an HS code are left out.
+        
+        Returns:
+        - Tuple of (node code per entry, list of n_groups + 1 bounds of each group's entries,
+          value per entry); each group's entries are in depth-first HS order
+        """
+        ancestors = [hs_ancestors(code) if code else [] for code in map(commodity_codes.get, commodities)]
+        nodes = sorted({node for path in ancestors for node in path}, key=hs_sort_key)
+        if not nodes or not len(pair_values):
+            return [], [0] * (n_groups + 1), []
+        
+        # Commodity id -> node index at each depth, -1 below a commodity's own level
+        node_ids = {node: i for i, node in enumerate(nodes)}
+        depth = max(len(path) for path in ancestors)
+        commodity_nodes = np.full((len(commodities), depth), -1, dtype='int64')
+        for i, path in enumerate(ancestors):
+            commodity_nodes[i, :len(path)] = [node_ids[node] for node in path]
+        
+        pair_nodes = commodity_nodes[pair_commodity].ravel()
+        has_node = pair_nodes >= 0
+        keys = (np.repeat(pair_group, depth) * len(nodes) + pair_nodes)[has_node]
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        sums = np.bincount(inverse, weights=np.repeat(pair_values, depth)[has_node], minlength=len(unique_keys))
+        
+        bounds = np.searchsorted(unique_keys // len(nodes), np.arange(n_groups + 1)).tolist()
+        return np.asarray(nodes, dtype=object)[unique_keys % len(nodes)].tolist(), bounds, sums.tolist()
+    
+    def _process_data_legacy(self):
+        """Original row-by-row implementation, kept for validating the vectorized engine"""
         # Initialize data structure
         processed_data = defaultdict(lambda: {
             'exports': {},
@@ -111,19 +569,270 @@ class TradeDataLoader:
             data['total_exports'] = total_exports
         
         self.countries_data = dict(processed_data)
-        self.logger.info(f"Processed {len(self.countries_data)} countries")
+        self.slices_data = None
+        self.commodity_codes = {}
+    
+    def input_fingerprint(self, with_hashes=True):
+        """
+        Describe the inputs the processed data was built from
+        
+        Parameters:
+        - with_hashes: Include a SHA-256 of each input file (skipped for quick size/mtime checks)
+        """
+        inputs = {}
+        for name, path in self._input_paths().items():
+            if not path or not os.path.exists(path):
+                inputs[name] = None
+                continue
+            stat = os.stat(path)
+            inputs[name] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+            if with_hashes:
+                inputs[name]['sha256'] = self._hash_file(path)
+        return {'schema_version': self.SCHEMA_VERSION, 'inputs': inputs}
+    
+    def data_fingerprint(self):
+        """
+        Short content hash of the loaded data, for tagging what was derived from it
+        
+        Covers the schema version, the SHA-256 of each input and of each applied delta, but
+        not sizes or mtimes, so rebuilding from unchanged inputs keeps the same hash. Data
+        loaded from a processed file is described by the fingerprint in its header; data
+        ingested here by the current inputs.
+        """
+        fingerprint = getattr(self.countries_data, 'fingerprint', None)
+        if not fingerprint:
+            fingerprint = dict(self.input_fingerprint(), deltas=self.applied_deltas)
+        content = {
+            'schema_version': fingerprint.get('schema_version'),
+            'inputs': {name: info and info.get('sha256') for name, info in fingerprint['inputs'].items()},
+            'deltas': [delta['sha256'] for delta in fingerprint.get('deltas', [])]
+        }
+        return hashlib.sha256(json.dumps(content, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+    
+    def is_processed_data_current(self, input_path):
+        """
+        Check whether a processed data file was built from the current inputs
+        
+        Size and mtime are compared first; the content hash is only computed when an
+        input's mtime changed but its size did not. JSON files carry no fingerprint and
+        are always treated as stale.
+        """
+        if not os.path.exists(input_path) or input_path.endswith('.json'):
+            return False
+        
+        try:
+            stored = ProcessedDataStore.read_header(input_path).get('fingerprint')
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Unreadable processed data at {input_path}: {str(e)}")
+            return False
+        
+        current = self.input_fingerprint(with_hashes=False)
+        if not stored or stored.get('schema_version') != current['schema_version']:
+            return False
+        
+        # A partition added or removed changes the set of inputs
+        if set(current['inputs']) != set(stored['inputs']):
+            return False
+        
+        paths = self._input_paths()
+        for name, info in current['inputs'].items():
+            stored_info = stored['inputs'].get(name)
+            if info is None or stored_info is None:
+                if info != stored_info:
+                    return False
+            elif info['size'] != stored_info['size']:
+                return False
+            elif info['mtime_ns'] != stored_info['mtime_ns']:
+                if self._hash_file(paths[name]) != stored_info['sha256']:
+                    return False
+        return True
     
     def save_processed_data(self, output_path):
-        """Save processed data to JSON file for faster loading"""
-        with open(output_path, 'w') as f:
-            json.dump(self.countries_data, f)
+        """
+        Save processed data for faster loading
+        
+        Paths ending in .json are written as a JSON blob; anything else uses the
+        memory-mappable binary layout of ProcessedDataStore, tagged with the input
+        fingerprint. The file is written to a temporary name and renamed into place,
+        so concurrent readers only ever see a complete file.
+        """
+        directory = os.path.dirname(output_path) or '.'
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix=os.path.basename(output_path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                if output_path.endswith('.json'):
+                    # CountryRecords and their commodity views are Mappings
+                    f.write(json.dumps(dict(self.countries_data), default=dict).encode('utf-8'))
+                else:
+                    slices = self.slices_data
+                    if slices is None and isinstance(self.countries_data, ProcessedDataStore):
+                        store = self.countries_data
+                        slices = {key: store.record(i) for i, key in enumerate(store.slice_keys)}
+                    fingerprint = self.input_fingerprint()
+                    fingerprint['deltas'] = self.applied_deltas
+                    ProcessedDataStore.write(f, self.countries_data, fingerprint=fingerprint, slices=slices,
+                                             commodity_codes=self.commodity_codes)
+                f.flush()
+                os.fsync(f.fileno())
+            # mkstemp creates the file owner-only; workers may run as another user
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, output_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
         self.logger.info(f"Saved processed data to {output_path}")
     
     def load_processed_data(self, input_path):
-        """Load pre-processed data from JSON file"""
+        """Load pre-processed data from a JSON file or a memory-mapped binary file"""
         if os.path.exists(input_path):
-            with open(input_path, 'r') as f:
-                self.countries_data = json.load(f)
+            if input_path.endswith('.json'):
+                with open(input_path, 'r') as f:
+                    self.countries_data = json.load(f)
+                self.slices_data = None
+                self.commodity_codes = {}
+                self.applied_deltas = []
+            else:
+                # The store holds every slice itself
+                self.countries_data = ProcessedDataStore(input_path)
+                self.slices_data = None
+                self.commodity_codes = self.countries_data.commodity_codes
+                self.applied_deltas = (self.countries_data.fingerprint or {}).get('deltas', [])
             self.logger.info(f"Loaded pre-processed data from {input_path}")
             return True
         return False
+    
+    def _input_paths(self):
+        """Input name -> path, with one 'trade_data:<path>' entry per partition when partitioned"""
+        if self.is_partitioned():
+            try:
+                paths = {f'trade_data:{path}': path for path in self.input_files()}
+            except FileNotFoundError:
+                paths = {}
+        else:
+            paths = {'trade_data': self.csv_path}
+        paths['country_metadata'] = self.country_metadata_path
+        return paths
+    
+    @staticmethod
+    def _hash_file(path, chunk_size=1 << 20):
+        """SHA-256 of a file, read in chunks"""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+
+def aggregate_csv(csv_path, known_isos=None, chunk_size=250000):
+    """
+    Aggregate one trade data CSV into per-(slice, commodity) sums, reading it in chunks
+    
+    A slice is one reporter's data for a year, flow and HS classification. Only the needed
+    columns are parsed, with explicit dtypes and the string columns as categoricals, so
+    memory is bounded by the chunk size and the number of distinct pairs rather than the
+    file size. Values are accumulated with np.add.at in row order, which sums exactly like
+    np.bincount over the whole file. Runs in ingest worker processes.
+    
+    Parameters:
+    - csv_path: Trade data CSV
+    - known_isos: Optional list of ISO codes with metadata; rows for other reporters are skipped
+    - chunk_size: Rows per chunk
+    
+    Returns:
+    - Dict with 'slices' ((country, year, flow, classification) in order of first appearance),
+      'commodities' (names in order of first appearance), 'commodity_codes' (the HS code
+      of each commodity's first row), 'pair_keys' (slice id << 32 |
+      commodity id, in order of first appearance), 'pair_values' (their sums), and
+      'countries' and 'last_rows' ((ISO code, reporter code) of each country's last valid row)
+    """
+    country_ids, flow_ids, classification_ids = {}, {}, {}
+    slice_ids, commodity_ids, pair_ids = {}, {}, {}
+    pair_values = np.zeros(0)
+    commodity_codes = {}
+    last_rows = {}
+    
+    chunks = pd.read_csv(
+        csv_path,
+        usecols=list(TradeDataLoader.STREAMING_DTYPES),
+        dtype=TradeDataLoader.STREAMING_DTYPES,
+        chunksize=chunk_size,
+        encoding_errors='ignore'
+    )
+    for chunk in chunks:
+        values = chunk['fobvalue'].where(chunk['fobvalue'].notna(), chunk['primaryValue'])
+        valid = (chunk['reporterDesc'].notna() & chunk['cmdDesc'].notna() & values.notna()
+                 & chunk['refYear'].notna() & chunk['flowDesc'].notna())
+        if known_isos is not None:
+            valid &= chunk['reporterISO'].isin(known_isos)
+        valid = valid.to_numpy()
+        if not valid.any():
+            continue
+        chunk = chunk[valid]
+        values = values.to_numpy(dtype='float64')[valid]
+        
+        country = _category_ids(chunk['reporterDesc'], country_ids)
+        commodity = _category_ids(chunk['cmdDesc'], commodity_ids)
+        if len(commodity_codes) < len(commodity_ids):
+            first_rows = chunk.drop_duplicates('cmdDesc')
+            for name, code in zip(first_rows['cmdDesc'].tolist(), first_rows['cmdCode'].tolist()):
+                if name not in commodity_codes:
+                    commodity_codes[name] = hs_code(code)
+        
+        # Chunk-local slices in order of appearance, then their ids across chunks
+        local_slice_idx, local_slices = pd.MultiIndex.from_arrays([
+            country,
+            chunk['refYear'].to_numpy(dtype='int64'),
+            _category_ids(chunk['flowDesc'], flow_ids),
+            _category_ids(chunk['classificationCode'], classification_ids)
+        ]).factorize()
+        slice_ = _global_ids(local_slices.tolist(), slice_ids)[local_slice_idx]
+        
+        # Chunk-local pairs in order of appearance, then their ids across chunks
+        local_idx, local_pairs = pd.factorize((slice_ << 32) | commodity)
+        local_to_global = _global_ids(local_pairs.tolist(), pair_ids)
+        if len(pair_ids) > len(pair_values):
+            pair_values = np.concatenate((pair_values, np.zeros(len(pair_ids) - len(pair_values))))
+        np.add.at(pair_values, local_to_global[local_idx], values)
+        
+        # Last valid row of each country in this chunk
+        reversed_ids, reversed_first = np.unique(country[::-1], return_index=True)
+        positions = len(country) - 1 - reversed_first
+        isos = chunk['reporterISO'].to_numpy()[positions].tolist()
+        codes = chunk['reporterCode'].to_numpy()[positions].tolist()
+        last_rows.update(zip(reversed_ids.tolist(), zip(isos, codes)))
+    
+    countries, flows, classifications = list(country_ids), list(flow_ids), list(classification_ids)
+    return {
+        'slices': [
+            (countries[country], year, flows[flow], classifications[classification])
+            for country, year, flow, classification in slice_ids
+        ],
+        'commodities': list(commodity_ids),
+        'commodity_codes': [commodity_codes[name] for name in commodity_ids],
+        'pair_keys': np.fromiter(pair_ids.keys(), dtype='int64', count=len(pair_ids)),
+        'pair_values': pair_values,
+        'countries': countries,
+        'last_rows': [last_rows[i] for i in range(len(countries))]
+    }
+
+
+def _category_ids(column, ids):
+    """
+    Map a categorical column to ids that are stable across chunks
+    
+    New categories get the next ids in order of first appearance within the column;
+    missing values are mapped to the id of ''.
+    """
+    codes = column.cat.codes.to_numpy()
+    categories = column.cat.categories
+    # The extra last slot is what a missing value's code (-1) indexes
+    lookup = np.empty(len(categories) + 1, dtype='int64')
+    for code in pd.unique(codes).tolist():
+        lookup[code] = ids.setdefault(categories[code] if code >= 0 else '', len(ids))
+    return lookup[codes]
+
+
+def _global_ids(keys, ids):
+    """Ids of keys in a growing key -> id dict, numbering new keys in order"""
+    return np.fromiter((ids.setdefault(key, len(ids)) for key in keys), dtype='int64', count=len(keys))
@@ -0,0 +1,62 @@
+# app/services/trade_similarity.py
+
+import numpy as np
+
+# Bytes of temporaries weighted_jaccard_similarity may hold at once
+JACCARD_BLOCK_BYTES = 64 << 20
+
+
+def export_profile_matrix(countries_data, countries):
+    """
+    Dense country x commodity matrix of export shares
+
+    Args:
+        countries_data: Mapping of country name -> country data
+        countries: Country names, one row each in this order
+
+    Returns:
+        Tuple of (N x C float64 array whose rows are each country's export_percentages / 100,
+        list of the C commodity names)
+    """
+    columns = {}
+    rows, cols, shares = [], [], []
+    for i, name in enumerate(countries):
+        percentages = countries_data[name].get('export_percentages', {})
+        for commodity, percentage in percentages.items():
+            rows.append(i)
+            cols.append(columns.setdefault(commodity, len(columns)))
+            shares.append(percentage)
+
+    profiles = np.zeros((len(countries), len(columns)))
+    profiles[rows, cols] = np.asarray(shares, dtype=float) / 100
+    return profiles, list(columns)
+
+
+def cosine_similarity(profiles):
+    """Cosine similarity between every pair of rows, in [0, 1] for non-negative profiles"""
+    norms = np.linalg.norm(profiles, axis=1)
+    unit = profiles / np.where(norms > 0, norms, 1)[:, None]
+    return np.clip(unit @ unit.T, 0, 1)
+
+
+def weighted_jaccard_similarity(profiles):
+    """
+    Weighted Jaccard similarity sum(min) / sum(max) between every pair of rows
+
+    Computed in blocks of rows so the N x N x C temporaries stay under JACCARD_BLOCK_BYTES.
+    """
+    n = len(profiles)
+    similarity = np.zeros((n, n))
+    block = max(1, JACCARD_BLOCK_BYTES // max(1, n * profiles.shape[1] * profiles.itemsize))
+    for start in range(0, n, block):
+        rows = profiles[start:start + block, None, :]
+        minimum = np.minimum(rows, profiles[None, :, :]).sum(axis=2)
+        maximum = np.maximum(rows, profiles[None, :, :]).sum(axis=2)
+        similarity[start:start + block] = np.divide(minimum, maximum, out=np.zeros_like(minimum), where=maximum > 0)
+    return similarity
+
+
+SIMILARITY_METRICS = {
+    'cosine': cosine_similarity,
+    'weighted_jaccard': weighted_jaccard_similarity
+}
@@ -0,0 +1,193 @@
+# app/services/treemap_payload.py
+
+import json
+
+from app.services.hs_nomenclature import SECTION_NAMES, hs_parent
+
+# 'flat': one tile per commodity; 'hs': commodities grouped under their HS section (and
+# chapter/heading when the data is finer than the chapter level)
+TREEMAP_MODES = ('flat', 'hs')
+
+# Plotly's viridis_r colorscale (plotly.colors.sequential.Viridis_r), evenly spaced stops
+VIRIDIS_R = ('#fde725', '#b5de2b', '#6ece58', '#35b779', '#1f9e89',
+             '#26828e', '#31688e', '#3e4989', '#482878', '#440154')
+LUT_SIZE = 256
+
+
+def _build_lut(stops, size):
+    """Colors at size evenly spaced points of a colorscale, interpolated in RGB like plotly.js"""
+    rgb = [tuple(int(stop[i:i + 2], 16) for i in (1, 3, 5)) for stop in stops]
+    lut = []
+    for k in range(size):
+        position = k / (size - 1) * (len(rgb) - 1)
+        i = min(int(position), len(rgb) - 2)
+        fraction = position - i
+        lut.append('#%02x%02x%02x' % tuple(
+            round(low + (high - low) * fraction) for low, high in zip(rgb[i], rgb[i + 1])
+        ))
+    return tuple(lut)
+
+
+VIRIDIS_R_LUT = _build_lut(VIRIDIS_R, LUT_SIZE)
+
+# Layout of the treemap: what plotly.express sets plus the parts of its default template a
+# treemap uses, so the chart looks the same without shipping the whole template
+LAYOUT = {
+    'margin': {'t': 50, 'l': 25, 'r': 25, 'b': 25},
+    'font': {'size': 14, 'color': '#2a3f5f'},
+    'paper_bgcolor': 'white',
+    'plot_bgcolor': 'white',
+    'hoverlabel': {'align': 'left'},
+    # Only the colorbar's (hidden) carrier trace is cartesian
+    'xaxis': {'visible': False},
+    'yaxis': {'visible': False}
+}
+
+
+def scale_colors(percentages):
+    """
+    Map percentages onto viridis_r through the lookup table, over their own min..max range
+
+    Returns:
+        Tuple of (hex color per percentage, min, max)
+    """
+    low, high = min(percentages), max(percentages)
+    if high > low:
+        scale = (LUT_SIZE - 1) / (high - low)
+        colors = [VIRIDIS_R_LUT[round((p - low) * scale)] for p in percentages]
+    else:
+        # plotly.js puts a single value in the middle of the scale
+        colors = [VIRIDIS_R_LUT[LUT_SIZE // 2]] * len(percentages)
+    return colors, low, high
+
+
+def flat_tiles(country_data):
+    """
+    Tiles of the flat treemap: one per commodity, largest first
+
+    Returns:
+        Tuple of lists (ids, labels, parents, values, percentages); ids is None as labels
+        are unique
+    """
+    exports = country_data['exports']
+    labels = list(exports)
+    values = list(exports.values())
+    if 'export_percentages' in country_data:
+        export_percentages = country_data['export_percentages']
+        percentages = [export_percentages.get(commodity, 0) for commodity in labels]
+    else:
+        percentages = [0] * len(labels)
+    return None, labels, [''] * len(labels), values, percentages
+
+
+def hs_tiles(country_data, commodity_codes, other_threshold=0.0):
+    """
+    Tiles of the HS grouped treemap, parents before their children
+
+    Group values are the HS aggregates computed at ingest, so nothing is summed here.
+    Tiles below other_threshold percent of the total are folded into an "Other" tile
+    under their parent; the children of a folded tile are dropped with it.
+
+    Args:
+        country_data: Country data with 'hs_aggregates'
+        commodity_codes: Dict of commodity name -> HS code
+        other_threshold: Percentage of the total under which tiles are merged
+
+    Returns:
+        Tuple of lists (ids, labels, parents, values, percentages)
+    """
+    total = country_data['total_exports']
+    minimum = total * other_threshold / 100
+    # Chapters and headings are labelled by the commodity with that code, when there is one
+    code_labels = {code: commodity for commodity, code in commodity_codes.items() if code}
+
+    ids, labels, parents, values = [], [], [], []
+    folded = set()
+    others = {}
+
+    def add(node_id, label, parent, value):
+        if parent in folded:
+            folded.add(node_id)
+        elif value < minimum:
+            folded.add(node_id)
+            others[parent] = others.get(parent, 0) + value
+        else:
+            ids.append(node_id)
+            labels.append(label)
+            parents.append(parent)
+            values.append(value)
+
+    for node, value in country_data['hs_aggregates'].items():
+        label = f"{node} {SECTION_NAMES[node]}" if node in SECTION_NAMES else code_labels.get(node, f"HS {node}")
+        add(node, label, hs_parent(node), value)
+    for commodity, value in country_data['exports'].items():
+        code = commodity_codes.get(commodity)
+        add(code or commodity, commodity, hs_parent(code) if code else '', value)
+
+    for parent, value in others.items():
+        ids.append(f"{parent}/Other")
+        labels.append("Other")
+        parents.append(parent)
+        values.append(value)
+
+    percentages = [value / total * 100 if total else 0 for value in values]
+    return ids, labels, parents, values, percentages
+
+
+def treemap_json(country_data, mode='flat', other_threshold=0.0, commodity_codes=None):
+    """
+    Plotly trace data and layout JSON for a country's treemap, without building a figure
+
+    Emits only what the chart needs: the treemap trace with tile colors already looked up
+    in VIRIDIS_R_LUT, and a coloraxis for the colorbar, carried by an empty scatter trace.
+    Data without HS aggregates (legacy engine, JSON cache) is always drawn flat.
+
+    Args:
+        country_data: Country data from TradeData.get_country_data
+        mode: One of TREEMAP_MODES
+        other_threshold: In 'hs' mode, the percentage of the total under which tiles are
+            merged into an "Other" tile within their group
+        commodity_codes: Dict of commodity name -> HS code, from TradeData.get_commodity_codes
+
+    Returns:
+        Tuple of (data JSON, layout JSON) strings
+    """
+    if mode == 'hs' and commodity_codes and 'hs_aggregates' in country_data:
+        ids, labels, parents, values, percentages = hs_tiles(country_data, commodity_codes, other_threshold)
+    else:
+        ids, labels, parents, values, percentages = flat_tiles(country_data)
+
+    colors, low, high = scale_colors(percentages) if percentages else ([], 0, 0)
+    trace = {'type': 'treemap', 'branchvalues': 'total'}
+    if ids is not None:
+        trace['ids'] = ids
+    trace.update({
+        'labels': labels,
+        'parents': parents,
+        'values': values,
+        'marker': {'colors': colors},
+        # The color plotly.js gives the root when tiles are colored through a colorscale
+        'root': {'color': '#444'},
+        # Four significant digits are plenty for the hover label
+        'customdata': [float(f'{p:.4g}') for p in percentages],
+        'hovertemplate': 'labels=%{label}<br>value=%{value}<br>percentage=%{customdata}<extra></extra>'
+    })
+    colorbar_trace = {
+        'type': 'scatter',
+        'x': [None],
+        'y': [None],
+        'mode': 'markers',
+        'showlegend': False,
+        'hoverinfo': 'skip',
+        'marker': {'color': [low], 'coloraxis': 'coloraxis'}
+    }
+
+    layout = dict(LAYOUT, coloraxis={
+        'cmin': low,
+        'cmax': high,
+        'colorscale': [[i / (len(VIRIDIS_R) - 1), color] for i, color in enumerate(VIRIDIS_R)],
+        'colorbar': {'title': {'text': 'percentage'}, 'outlinewidth': 0, 'ticks': ''}
+    })
+
+    separators = (',', ':')
+    return json.dumps([trace, colorbar_trace], separators=separators), json.dumps(layout, separators=separators)
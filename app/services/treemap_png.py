@@ -0,0 +1,263 @@
+# app/services/treemap_png.py
+
+import json
+import struct
+import unicodedata
+import zlib
+
+import numpy as np
+
+from app.services.treemap_payload import VIRIDIS_R_LUT
+
+# Bump when the drawing changes, so cached images are rendered again
+RENDERER_VERSION = 2
+
+BACKGROUND = (255, 255, 255)
+# plotly.js's root color and tile borders (the paper color), as in the interactive chart
+ROOT_COLOR = (0x44, 0x44, 0x44)
+LINE_COLOR = (255, 255, 255)
+BORDER = 1
+# Space inside a group tile around its children; the top is where plotly.js puts the group's label
+GROUP_PADDING = (12, 3, 3, 3)
+MARGIN = 10
+COLORBAR_WIDTH = 24
+
+# 5x8 bitmap font for printable ASCII (' ' to '~'): five column bytes per glyph, least
+# significant bit at the top, as in the classic GLCD font
+FONT_HEX = (
+    '000000000000005f00000007000700147f147f14242a7f2a12231308646236495620500008070300'
+    '001c2241000041221c002a1c7f1c2a08083e08080080703000080808080800006060002010080402'
+    '3e5149453e00427f400072494949462141494d331814127f1027454545393c4a4949314121110907'
+    '3649494936464949291e000014000000403400000008142241141414141400412214080201590906'
+    '3e415d594e7c1211127c7f494949363e414141227f4141413e7f494949417f090909013e41415173'
+    '7f0808087f00417f41002040413f017f081422417f404040407f021c027f7f0408107f3e4141413e'
+    '7f090909063e4151215e7f09192946264949493203017f01033f4040403f1f2040201f3f4038403f'
+    '631408146303047804036159494d43007f4141410204081020004141417f04020102044040404040'
+    '000307080020545478407f284444383844444428384444287f385454541800087e090218a4a49c78'
+    '7f0804047800447d40002040403d007f1028440000417f40007c0478047c7c080404783844444438'
+    'fc1824241818242418fc7c08040408485454542404043f44243c4040207c1c2040201c3c4030403c'
+    '44281028444c9090907c4464544c440008364100000077000000413608000201020402'
+)
+GLYPH_WIDTH, GLYPH_HEIGHT = 5, 8
+_FONT_BYTES = bytes.fromhex(''.join(FONT_HEX))
+GLYPHS = {
+    chr(32 + c): np.unpackbits(
+        np.frombuffer(_FONT_BYTES[c * GLYPH_WIDTH:(c + 1) * GLYPH_WIDTH], dtype=np.uint8)[:, None],
+        axis=1, bitorder='little'
+    ).T.astype(bool)
+    for c in range(len(_FONT_BYTES) // GLYPH_WIDTH)
+}
+# Tile labels: leaves at twice the glyph size, group headers (in the group's top padding) at 1x
+LABEL_SCALE = 2
+LABEL_PADDING = 4
+DARK_TEXT = (0x2a, 0x3f, 0x5f)
+LIGHT_TEXT = (255, 255, 255)
+
+
+def squarify(values, x, y, width, height):
+    """
+    Squarified treemap layout (Bruls, Huizing and van Wijk) of values in a rectangle
+
+    Values are placed in the order given, which should be largest first; each row is
+    extended while that keeps its worst aspect ratio from getting worse.
+
+    Returns:
+        List of (x, y, width, height) per value, as floats
+    """
+    total = sum(values)
+    if total <= 0 or width <= 0 or height <= 0:
+        return [(x, y, 0.0, 0.0)] * len(values)
+    areas = [value * width * height / total for value in values]
+
+    def worst(row_sum, row_max, row_min, side):
+        return max(row_max * side * side / (row_sum * row_sum), row_sum * row_sum / (side * side * row_min))
+
+    rects = []
+    i = 0
+    while i < len(areas):
+        side = min(width, height)
+        row_sum = row_max = row_min = areas[i]
+        j = i + 1
+        while j < len(areas):
+            area = areas[j]
+            if area <= 0 or worst(row_sum + area, max(row_max, area), min(row_min, area), side) > worst(
+                    row_sum, row_max, row_min, side):
+                break
+            row_sum += area
+            row_max = max(row_max, area)
+            row_min = min(row_min, area)
+            j += 1
+
+        # Lay the row along the shorter side and continue in the space left
+        if width >= height:
+            row_width = row_sum / height if height else 0
+            offset = y
+            for area in areas[i:j]:
+                rects.append((x, offset, row_width, area / row_width if row_width else 0))
+                offset += rects[-1][3]
+            x += row_width
+            width -= row_width
+        else:
+            row_height = row_sum / width if width else 0
+            offset = x
+            for area in areas[i:j]:
+                rects.append((offset, y, area / row_height if row_height else 0, row_height))
+                offset += rects[-1][2]
+            y += row_height
+            height -= row_height
+        i = j
+    return rects
+
+
+def _hex_rgb(color):
+    return tuple(int(color[i:i + 2], 16) for i in (1, 3, 5))
+
+
+def _fill(pixels, rect, color):
+    x, y, width, height = rect
+    x0, y0, x1, y1 = round(x), round(y), round(x + width), round(y + height)
+    if x1 > x0 and y1 > y0:
+        pixels[y0:y1, x0:x1] = color
+
+
+def _ascii(text):
+    """Text reduced to the font's characters: accents dropped, anything else as '?'"""
+    text = unicodedata.normalize('NFKD', str(text))
+    return ''.join(c if c in GLYPHS else '?' for c in text if not unicodedata.combining(c))
+
+
+def _draw_text(pixels, x, y, text, color, scale=1):
+    """Draw a line of text with its top left corner at (x, y), clipped to the image"""
+    height, width, _ = pixels.shape
+    advance = (GLYPH_WIDTH + 1) * scale
+    for k, char in enumerate(text):
+        mask = GLYPHS[char]
+        if scale > 1:
+            mask = mask.repeat(scale, axis=0).repeat(scale, axis=1)
+        x0, y0 = x + k * advance, y
+        x1, y1 = min(x0 + mask.shape[1], width), min(y0 + mask.shape[0], height)
+        if x0 >= width or y0 >= height or x1 <= x0 or y1 <= y0:
+            continue
+        pixels[y0:y1, x0:x1][mask[:y1 - y0, :x1 - x0]] = color
+
+
+def _wrap(text, columns, rows):
+    """Word-wrap text into at most rows lines of columns characters, cutting the last with '..'"""
+    lines = []
+    for word in text.split():
+        if lines and len(lines[-1]) + 1 + len(word) <= columns:
+            lines[-1] += ' ' + word
+        else:
+            lines.append(word)
+    if len(lines) > rows:
+        lines = lines[:rows]
+        lines[-1] = lines[-1][:columns - 2] + '..'
+    return [line if len(line) <= columns else line[:columns - 2] + '..' for line in lines]
+
+
+def _label_color(color):
+    """Dark text on light tiles and white on dark ones, like plotly.js's contrast text"""
+    r, g, b = color
+    return DARK_TEXT if 0.299 * r + 0.587 * g + 0.114 * b > 150 else LIGHT_TEXT
+
+
+def _draw_label(pixels, text, tile, color, scale, rows=None):
+    """Label a tile at its top left, wrapped to the lines that fit; too small a tile gets none"""
+    x, y, width, height = tile
+    advance, line_height = (GLYPH_WIDTH + 1) * scale, (GLYPH_HEIGHT + 1) * scale
+    columns = int((width - 2 * LABEL_PADDING) // advance)
+    fit_rows = int((height - LABEL_PADDING / 2) // line_height)
+    rows = min(rows, fit_rows) if rows is not None else fit_rows
+    if columns < 3 or rows < 1:
+        return
+    for n, line in enumerate(_wrap(_ascii(text), columns, rows)):
+        _draw_text(pixels, round(x + LABEL_PADDING), round(y + LABEL_PADDING / 2 + n * line_height),
+                   line, _label_color(color), scale)
+
+
+def _draw_tiles(pixels, trace, rect):
+    """
+    Draw a treemap trace's tiles into rect, nesting children inside their group's tile
+
+    Tiles are labelled where the label fits: leaves with their wrapped label, groups with
+    one line in the padding above their children.
+    """
+    names = trace.get('ids') or trace['labels']
+    labels = trace['labels']
+    values = trace['values']
+    colors = trace['marker']['colors']
+
+    children = {}
+    for i, parent in enumerate(trace['parents']):
+        children.setdefault(parent, []).append(i)
+
+    def draw(parent, area):
+        tiles = sorted(children.get(parent, ()), key=lambda i: -values[i])
+        tiles = [i for i in tiles if values[i] > 0]
+        for i, (x, y, width, height) in zip(tiles, squarify([values[i] for i in tiles], *area)):
+            _fill(pixels, (x, y, width, height), LINE_COLOR)
+            tile = (x + BORDER, y + BORDER, width - 2 * BORDER, height - 2 * BORDER)
+            color = _hex_rgb(colors[i])
+            _fill(pixels, tile, color)
+            if names[i] in children:
+                top, right, bottom, left = GROUP_PADDING
+                _draw_label(pixels, labels[i], (tile[0], tile[1], tile[2], top), color, 1, rows=1)
+                draw(names[i], (tile[0] + left, tile[1] + top,
+                                tile[2] - left - right, tile[3] - top - bottom))
+            else:
+                _draw_label(pixels, labels[i], tile, color, LABEL_SCALE)
+
+    draw('', rect)
+
+
+def encode_png(pixels):
+    """Encode an H x W x 3 uint8 array as an 8-bit RGB PNG"""
+    height, width, _ = pixels.shape
+    # Each scanline starts with its filter type, 0 (none); flat tiles compress well without one
+    scanlines = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    scanlines[:, 1:] = pixels.reshape(height, -1)
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    return b''.join((
+        b'\x89PNG\r\n\x1a\n',
+        chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)),
+        chunk(b'IDAT', zlib.compress(scanlines.tobytes(), 6)),
+        chunk(b'IEND', b'')
+    ))
+
+
+def render_treemap_png(treemap_data, width=1200, height=630):
+    """
+    Rasterize a treemap to PNG without a browser
+
+    Lays out the tiles of the treemap trace in treemap_data (as made by
+    treemap_payload.treemap_json) with the squarified algorithm and fills them with their
+    colors, next to a viridis_r colorbar. Tiles large enough are labelled with a built-in
+    bitmap font (ASCII only, accents dropped).
+
+    Args:
+        treemap_data: Plotly trace data JSON string
+        width, height: Image size in pixels
+
+    Returns:
+        PNG bytes
+    """
+    trace = next(trace for trace in json.loads(treemap_data) if trace['type'] == 'treemap')
+
+    pixels = np.empty((height, width, 3), dtype=np.uint8)
+    pixels[:] = BACKGROUND
+
+    # Colorbar on the right, darkest (largest share) at the top like the chart's
+    bar_left = width - MARGIN - COLORBAR_WIDTH
+    bar_height = height - 2 * MARGIN
+    lut = np.array([_hex_rgb(color) for color in VIRIDIS_R_LUT], dtype=np.uint8)
+    rows = np.linspace(len(lut) - 1, 0, bar_height).round().astype(int)
+    pixels[MARGIN:MARGIN + bar_height, bar_left:bar_left + COLORBAR_WIDTH] = lut[rows][:, None, :]
+
+    area = (MARGIN, MARGIN, bar_left - 2 * MARGIN, height - 2 * MARGIN)
+    _fill(pixels, area, ROOT_COLOR)
+    _draw_tiles(pixels, trace, area)
+
+    return encode_png(pixels)
@@ -25,12 +25,16 @@ document.addEventListener('DOMContentLoaded', function() {
         const directionCell = document.createElement('td');
         directionCell.textContent = result.direction;
 
+        const proximityCell = document.createElement('td');
+        proximityCell.textContent = result.trade_proximity + '%';
+
         
         // Add all cells to the row
         row.appendChild(guessCell);
         row.appendChild(correctCell);
         row.appendChild(distanceCell);
         row.appendChild(directionCell);
+        row.appendChild(proximityCell);
         
         // Add the row to the table
         tbody.appendChild(row);
@@ -65,10 +69,21 @@ document.addEventListener('DOMContentLoaded', function() {
     });
 
     // Add logic to load chart
-    Plotly.newPlot('exports-treemap', treemap_data, treemap_layout);
+    function drawTreemap(data, layout) {
+        Plotly.newPlot('exports-treemap', data, layout);
+        
+        // Hide loading indicator once chart is loaded
+        document.getElementById('chart-loading').style.display = 'none';
+    }
     
-    // Hide loading indicator once chart is loaded
-    document.getElementById('chart-loading').style.display = 'none';
+    if (typeof treemap_url !== 'undefined') {
+        fetch(treemap_url)
+            .then(response => response.json())
+            .then(treemap => drawTreemap(treemap.data, treemap.layout))
+            .catch(error => console.error('Error loading treemap:', error));
+    } else {
+        drawTreemap(treemap_data, treemap_layout);
+    }
 
     function submitGuess() {
         const country = countryInput.value.trim();
@@ -86,20 +101,34 @@ document.addEventListener('DOMContentLoaded', function() {
             headers: {
                 'Content-Type': 'application/json',
             },
-            body: JSON.stringify({ guess: country })
+            body: JSON.stringify({ guess: country, session: localStorage.getItem('tradle_session') })
         })
         .then(response => response.json())
         .then(result => {
+            if (result.error) {
+                // An ambiguous guess comes back with the countries it could mean
+                resultMessage.textContent = result.candidates
+                    ? `${result.error}. Did you mean ${result.candidates.join(', ')}?`
+                    : result.error;
+                return;
+            }
+            resultMessage.textContent = '';
+            
+            // The signed session token carries this player's guesses
+            localStorage.setItem('tradle_session', result.session);
+            
             // Add the result to the table
             addResultRow(result);
             
             // Clear the form input
-            document.getElementById('guess-input').value = '';
+            countryInput.value = '';
             
             // If the guess was correct, show a winning message
             if (result.correct) {
                 alert('Congratulations! You guessed correctly!');
                 // Or show a more sophisticated winning message
+            } else if (result.game_over) {
+                resultMessage.textContent = 'Out of guesses! The answer was ' + result.answer + '.';
             }
         })
         .catch(error => console.error('Error submitting guess:', error))
@@ -138,13 +167,27 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // Filter countries based on input
     function filterCountries() {
-        const input = countryInput.value.toLowerCase();
+        const input = countryInput.value.trim();
         
-        countryDropdown.innerHTML = '';
+        if (!input) {
+            showAllCountries();
+            return;
+        }
         
-        const filteredCountries = countries.filter(country => 
-            country.toLowerCase().includes(input)
-        );
+        // Prefix, code, alias and typo matching happens on the server
+        fetch('/api/countries/search?q=' + encodeURIComponent(input))
+            .then(response => response.json())
+            .then(filteredCountries => {
+                // Ignore responses for input the user has since changed
+                if (countryInput.value.trim() === input) {
+                    showFilteredCountries(filteredCountries);
+                }
+            })
+            .catch(error => console.error('Error searching countries:', error));
+    }
+    
+    function showFilteredCountries(filteredCountries) {
+        countryDropdown.innerHTML = '';
         
         if (filteredCountries.length > 0) {
             filteredCountries.forEach(country => {
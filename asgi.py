@@ -0,0 +1,22 @@
+# In asgi.py
+import os
+from app.asgi import create_asgi_app
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Get config from environment or use default
+config_name = os.environ.get('FLASK_CONFIG', 'default')
+app = create_asgi_app(config_name)
+
+if __name__ == '__main__':
+    import uvicorn
+    
+    # Each worker opens the memory-mapped processed data, so the data is shared through the page cache
+    uvicorn.run(
+        'asgi:app',
+        host=os.environ.get('HOST', '127.0.0.1'),
+        port=int(os.environ.get('PORT', 8000)),
+        workers=int(os.environ.get('WEB_CONCURRENCY', 1))
+    )
@@ -0,0 +1,23 @@
+# gunicorn.conf.py
+import gc
+import os
+
+bind = os.environ.get('BIND', '127.0.0.1:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', 4))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')  # or 'uvicorn.workers.UvicornWorker' with asgi:app
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+wsgi_app = os.environ.get('GUNICORN_APP', 'run:app')
+
+# Load the app once in the master so workers share its data copy-on-write instead of each building their own
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() in ('1', 'true', 'yes')
+
+if preload_app:
+    # Don't collect while the app loads, so long-lived objects aren't interleaved with freed holes
+    gc.disable()
+
+
+def when_ready(server):
+    """Runs in the master once the app is loaded, before any worker is forked"""
+    if preload_app:
+        from app.services.prefork import preload
+        preload(server.app.wsgi())
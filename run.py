@@ -8,7 +8,11 @@ load_dotenv()
 
 # Get config from environment or use default
 config_name = os.environ.get('FLASK_CONFIG', 'default')
-app = create_app(config_name)
+
+# The ingest worker processes are spawned and re-import this script as __mp_main__; they
+# must not build the app (and ingest) themselves. Importers such as gunicorn (run:app) still get it.
+if __name__ != '__mp_main__':
+    app = create_app(config_name)
 
 if __name__ == '__main__':
     app.run()
\ No newline at end of file
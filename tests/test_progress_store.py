@@ -0,0 +1,44 @@
+# tests/test_progress_store.py
+
+import pytest
+
+from app.services.progress_store import SQLiteProgressStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteProgressStore(str(tmp_path / 'progress.sqlite3'), flush_interval=0.01)
+    yield store
+    store.close()
+
+
+def record_win(store, game_number, player_id='ab12'):
+    store.record_guess({
+        'game_number': game_number,
+        'player_id': player_id,
+        'guess_number': 1,
+        'country': 'France',
+        'correct': True,
+        'game_over': True,
+        'won': True
+    })
+
+
+def test_streak_counts_consecutive_wins_up_to_yesterday(store):
+    for game_number in (10, 11, 12):
+        record_win(store, game_number)
+    store.flush()
+
+    assert store.get_player_stats('ab12', current_game_number=12)['current_streak'] == 3
+    assert store.get_player_stats('ab12', current_game_number=13)['current_streak'] == 3
+
+
+def test_streak_lapses_after_a_missed_day(store):
+    for game_number in (10, 11, 12):
+        record_win(store, game_number)
+    store.flush()
+
+    stats = store.get_player_stats('ab12', current_game_number=597)
+    assert stats['current_streak'] == 0
+    assert stats['max_streak'] == 3
+    assert stats['wins'] == 3